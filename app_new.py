@@ -1,18 +1,25 @@
-import gradio as gr
 import os
+# Gradio 在构建界面时才加载，识别工作进程重新导入本文件时不会加载
+from utils.lazy_import import lazy_module
+gr = lazy_module('gradio')
 
 # 导入功能模块
-from modules.video_extractor import extract_segment
+from modules.video_extractor import extract_segment, extract_segments
 from modules.video_cropper import (
     crop_video_with_tracking, 
     crop_with_person_tracking, 
     create_crop_preview_image,
-    calculate_crop_box
+    relative_crop_box
 )
-from modules.subtitle_generator import generate_subtitles
+from modules.subtitle_generator import generate_subtitles, SUBTITLE_MODES
+from modules.transcription import preload_whisper_from_env
+from modules.asr_backends import default_backend
+from modules.edit_pipeline import add_trim, add_crop, add_subtitles, export_edit
 
 # 导入工具函数
-from utils.ffmpeg_utils import get_video_info
+from utils.job_scheduler import streamed, PRIORITY_HIGH, PRIORITY_LOW
+from utils.lazy_import import warm_up_from_env
+from utils.media_probe import MediaProbeError
 
 # --- 辅助函数 ---
 def update_crop_preview(video_path, aspect_ratio, center_x, center_y, scale):
@@ -23,27 +30,30 @@ def update_crop_preview(video_path, aspect_ratio, center_x, center_y, scale):
     return create_crop_preview_image(video_path, aspect_ratio, center_x, center_y, scale, scale)
 
 def get_crop_parameters(video_path, aspect_ratio, center_x, center_y, scale):
-    """获取裁切参数"""
+    """获取裁切参数（相对坐标），返回 (裁切框, 错误信息)；无法读取视频信息时裁切框为 None"""
     if not video_path or not os.path.exists(video_path):
-        return 0.5, 0.5, 0.8, 0.8
+        return (0.5, 0.5, 0.8, 0.8), ""
     
-    video_info = get_video_info(video_path)
-    crop_box = calculate_crop_box(
-        video_info['width'], 
-        video_info['height'], 
-        aspect_ratio, 
-        center_x, 
-        center_y, 
-        scale
-    )
-    
-    # 转换为相对坐标
-    crop_x = crop_box['x'] / video_info['width']
-    crop_y = crop_box['y'] / video_info['height']
-    crop_width = crop_box['width'] / video_info['width']
-    crop_height = crop_box['height'] / video_info['height']
-    
-    return crop_x, crop_y, crop_width, crop_height
+    try:
+        # 转换为相对坐标
+        return relative_crop_box(video_path, aspect_ratio, center_x, center_y, scale), ""
+    except MediaProbeError as e:
+        print(f"获取裁切参数失败: {e}")
+        return None, f"❌ 无法读取视频信息: {e}"
+
+def crop_with_parameters(crop_fn, video_path, aspect_ratio, center_x, center_y, scale):
+    """按界面参数计算裁切框后执行裁切，读取视频信息失败时返回错误状态"""
+    crop, error_msg = get_crop_parameters(video_path, aspect_ratio, center_x, center_y, scale)
+    if crop is None:
+        return None, error_msg
+    return crop_fn(video_path, aspect_ratio, *crop)
+
+def add_crop_with_parameters(spec, video_path, aspect_ratio, center_x, center_y, scale):
+    """把界面上的裁切框加入编辑规格，读取视频信息失败时返回错误状态"""
+    crop, error_msg = get_crop_parameters(video_path, aspect_ratio, center_x, center_y, scale)
+    if crop is None:
+        return spec, error_msg
+    return add_crop(spec, video_path, aspect_ratio, crop)
 
 def select_video_source(extracted_video, direct_video):
     """选择视频源"""
@@ -74,309 +84,449 @@ def update_video_display(extracted_video):
         return None, True  # 不显示视频，显示上传按钮
 
 # --- Gradio 界面 ---
-with gr.Blocks(title="智能视频剪辑工具") as demo:
-    gr.Markdown("## 🚀 智能视频剪辑工具 — 支持人物跟踪和字幕生成")
-    gr.Markdown("**功能：** 视频片段提取 + 智能裁切 + 人物跟踪 + 字幕生成")
-    
-    # 存储提取的视频路径和字幕文件路径
-    extracted_video = gr.State()
-    subtitle_file_path = gr.State()
-    
-    with gr.Tabs():
-        # 第一个标签页：视频片段提取
-        with gr.TabItem("🎬 视频片段提取"):
-            with gr.Row():
-                with gr.Column():
-                    video_input = gr.Video(label="上传视频 (<=3GB)")
-                    
-                    # 时间选择区域
-                    with gr.Group():
-                        gr.Markdown("### ⏰ 时间选择")
+def create_interface():
+    """
+    构建 Gradio 界面。放在函数中而不是模块顶层：并行识别用 spawn 启动的工作进程
+    会以 __mp_main__ 重新导入本文件，顶层只有导入和函数定义时不会重复构建界面。
+    """
+    with gr.Blocks(title="智能视频剪辑工具") as demo:
+        gr.Markdown("## 🚀 智能视频剪辑工具 — 支持人物跟踪和字幕生成")
+        gr.Markdown("**功能：** 视频片段提取 + 智能裁切 + 人物跟踪 + 字幕生成")
+        
+        # 存储提取的视频路径和字幕文件路径
+        extracted_video = gr.State()
+        subtitle_file_path = gr.State()
+        # 合并导出的编辑规格，各标签页可依次加入时间范围、裁切和字幕
+        edit_spec = gr.State()
+        
+        with gr.Tabs():
+            # 第一个标签页：视频片段提取
+            with gr.TabItem("🎬 视频片段提取"):
+                with gr.Row():
+                    with gr.Column():
+                        video_input = gr.Video(label="上传视频 (<=3GB)")
+                        
+                        # 时间选择区域
+                        with gr.Group():
+                            gr.Markdown("### ⏰ 时间选择")
+                            with gr.Row():
+                                start_time = gr.Textbox(label="开始时间 (MM:SS 或 HH:MM:SS)", placeholder="例如: 1:50")
+                                end_time = gr.Textbox(label="结束时间 (MM:SS 或 HH:MM:SS)", placeholder="例如: 4:00")
+                            
+                            # 时间轴选择提示
+                            gr.Markdown("**💡 提示：** 也可以在下方视频预览中点击时间轴来设置开始和结束时间")
+                            
+                            smart_cut = gr.Checkbox(
+                                label="智能切割",
+                                value=True,
+                                info="只重编码首尾不完整的 GOP，中间部分直接复制，长片段提取更快"
+                            )
+                        
                         with gr.Row():
-                            start_time = gr.Textbox(label="开始时间 (MM:SS 或 HH:MM:SS)", placeholder="例如: 1:50")
-                            end_time = gr.Textbox(label="结束时间 (MM:SS 或 HH:MM:SS)", placeholder="例如: 4:00")
+                            extract_btn = gr.Button("🚀 快速提取片段", variant="primary")
+                            cancel_extract_btn = gr.Button("⏹️ 取消", variant="stop")
+                            add_trim_btn = gr.Button("➕ 加入合并导出", variant="secondary")
                         
-                        # 时间轴选择提示
-                        gr.Markdown("**💡 提示：** 也可以在下方视频预览中点击时间轴来设置开始和结束时间")
+                        # 批量提取区域
+                        with gr.Group():
+                            gr.Markdown("### 📦 批量提取")
+                            batch_ranges = gr.Dataframe(
+                                headers=["开始时间", "结束时间", "名称"],
+                                datatype=["str", "str", "str"],
+                                row_count=(3, "dynamic"),
+                                col_count=(3, "fixed"),
+                                type="array",
+                                label="提取区间（每行一个片段，名称可留空）"
+                            )
+                            batch_extract_btn = gr.Button("📦 批量提取片段", variant="secondary")
+                            batch_files = gr.File(label="批量提取结果", file_count="multiple", interactive=False)
+                            batch_status = gr.Textbox(label="批量提取状态", interactive=False)
                     
-                    extract_btn = gr.Button("🚀 快速提取片段", variant="primary")
-                
-                with gr.Column():
-                    # 视频预览区域
-                    with gr.Group():
-                        gr.Markdown("### 📹 视频预览")
-                        preview = gr.Video(label="预览片段", interactive=True)
+                    with gr.Column():
+                        # 视频预览区域
+                        with gr.Group():
+                            gr.Markdown("### 📹 视频预览")
+                            preview = gr.Video(label="预览片段", interactive=True)
+                            
+                            # 下载按钮
+                            download_btn = gr.Button("⬇️ 下载视频片段", variant="secondary", visible=False)
                         
-                        # 下载按钮
-                        download_btn = gr.Button("⬇️ 下载视频片段", variant="secondary", visible=False)
-                    
-                    error_msg = gr.Textbox(label="状态信息", interactive=False, visible=True)
-                    info_text = gr.Markdown("""
-                    **使用说明：**
-                    1. 上传视频文件
-                    2. 选择时间范围：
-                       - 手动输入开始和结束时间
-                       - 或在视频预览中点击时间轴
-                    3. 点击"快速提取片段"
-                    4. 等待处理完成
-                    5. 点击"下载视频片段"保存文件
-                    
-                    **时间格式支持：**
-                    - `MM:SS` (如: 1:50, 4:00)
-                    - `HH:MM:SS` (如: 1:30:45)
-                    """)
-            
-            extract_btn.click(fn=extract_segment,
-                             inputs=[video_input, start_time, end_time],
-                             outputs=[preview, error_msg, extracted_video])
-            
-            # 当提取成功时显示下载按钮
-            extract_btn.click(
-                fn=lambda x: True if x else False,
-                inputs=[extracted_video],
-                outputs=[download_btn]
-            )
+                        error_msg = gr.Textbox(label="状态信息", interactive=False, visible=True)
+                        info_text = gr.Markdown("""
+                        **使用说明：**
+                        1. 上传视频文件
+                        2. 选择时间范围：
+                           - 手动输入开始和结束时间
+                           - 或在视频预览中点击时间轴
+                        3. 点击"快速提取片段"
+                        4. 等待处理完成
+                        5. 点击"下载视频片段"保存文件
+                        
+                        **时间格式支持：**
+                        - `MM:SS` (如: 1:50, 4:00)
+                        - `HH:MM:SS` (如: 1:30:45)
+                        """)
+                
+                extract_event = extract_btn.click(fn=streamed('ffmpeg', extract_segment, 1, 3, gr.update, PRIORITY_HIGH),
+                                                  inputs=[video_input, start_time, end_time, smart_cut],
+                                                  outputs=[preview, error_msg, extracted_video])
+                
+                # 提取完成后再根据结果显示下载按钮
+                extract_event.then(
+                    fn=lambda x: True if x else False,
+                    inputs=[extracted_video],
+                    outputs=[download_btn]
+                )
+                
+                # 批量提取按钮
+                batch_event = batch_extract_btn.click(fn=streamed('ffmpeg', extract_segments, 1, 2, gr.update, PRIORITY_LOW),
+                                                     inputs=[video_input, batch_ranges],
+                                                     outputs=[batch_files, batch_status])
+                
+                # 取消按钮：终止正在运行的 FFmpeg 进程并清理未完成的输出
+                cancel_extract_btn.click(fn=None, cancels=[extract_event, batch_event])
+                
+                # 下载按钮功能
+                download_btn.click(
+                    fn=download_video_segment,
+                    inputs=[extracted_video],
+                    outputs=[download_btn, error_msg]
+                )
             
-            # 下载按钮功能
-            download_btn.click(
-                fn=download_video_segment,
-                inputs=[extracted_video],
-                outputs=[download_btn, error_msg]
-            )
-        
-        # 第二个标签页：智能裁切
-        with gr.TabItem("✂️ 智能视频裁切"):
-            with gr.Row():
-                with gr.Column():
-                    # 视频输入区域
-                    with gr.Group():
-                        gr.Markdown("### 📹 视频输入")
-                        # 统一的视频预览区域
-                        crop_video_display = gr.Video(label="视频预览", interactive=True)
+            # 第二个标签页：智能裁切
+            with gr.TabItem("✂️ 智能视频裁切"):
+                with gr.Row():
+                    with gr.Column():
+                        # 视频输入区域
+                        with gr.Group():
+                            gr.Markdown("### 📹 视频输入")
+                            # 统一的视频预览区域
+                            crop_video_display = gr.Video(label="视频预览", interactive=True)
+                            
+                            # 条件显示的上传按钮
+                            upload_btn = gr.Button("📁 上传视频文件", variant="secondary", visible=True)
                         
-                        # 条件显示的上传按钮
-                        upload_btn = gr.Button("📁 上传视频文件", variant="secondary", visible=True)
-                    
-                    # 裁切设置
-                    with gr.Group():
-                        gr.Markdown("### ⚙️ 裁切设置")
-                        aspect_ratio = gr.Radio(
-                            choices=["3:4", "1:1"],
-                            label="选择固定比例框",
-                            value="3:4"
-                        )
-                    
-                    # 裁切框控制
-                    with gr.Row():
-                        center_x = gr.Slider(0, 1, 0.5, label="框中心 X 位置", step=0.01)
-                        center_y = gr.Slider(0, 1, 0.5, label="框中心 Y 位置", step=0.01)
-                    
-                    scale = gr.Slider(0.1, 1, 0.8, label="框缩放大小", step=0.01)
+                        # 裁切设置
+                        with gr.Group():
+                            gr.Markdown("### ⚙️ 裁切设置")
+                            aspect_ratio = gr.Radio(
+                                choices=["3:4", "1:1"],
+                                label="选择固定比例框",
+                                value="3:4"
+                            )
+                        
+                        # 裁切框控制
+                        with gr.Row():
+                            center_x = gr.Slider(0, 1, 0.5, label="框中心 X 位置", step=0.01)
+                            center_y = gr.Slider(0, 1, 0.5, label="框中心 Y 位置", step=0.01)
+                        
+                        scale = gr.Slider(0.1, 1, 0.8, label="框缩放大小", step=0.01)
+                        
+                        with gr.Row():
+                            update_preview_btn = gr.Button("🔄 更新预览", variant="secondary")
+                            manual_crop_btn = gr.Button("✂️ 手动裁切", variant="primary")
+                            auto_track_btn = gr.Button("🎯 人物跟踪裁切", variant="secondary")
+                            cancel_crop_btn = gr.Button("⏹️ 取消", variant="stop")
+                        
+                        add_crop_btn = gr.Button("➕ 加入合并导出", variant="secondary")
                     
-                    with gr.Row():
-                        update_preview_btn = gr.Button("🔄 更新预览", variant="secondary")
-                        manual_crop_btn = gr.Button("✂️ 手动裁切", variant="primary")
-                        auto_track_btn = gr.Button("🎯 人物跟踪裁切", variant="secondary")
+                    with gr.Column():
+                        # 裁切预览图像
+                        crop_preview_image = gr.Image(label="裁切框预览", type="filepath")
+                        crop_preview = gr.Video(label="裁切结果预览")
+                        crop_error_msg = gr.Textbox(label="裁切状态", interactive=False, visible=True)
+                        crop_info = gr.Markdown("""
+                        **裁切功能说明：**
+                        
+                        **视频输入方式：**
+                        - **方式一**：在"视频片段提取"标签页提取视频片段，自动传递到此页面
+                        - **方式二**：直接在此页面上传视频文件
+                        
+                        **使用步骤：**
+                        1. 选择视频输入方式：
+                           - 从第一步提取的视频片段会自动显示
+                           - 或点击"上传视频文件"按钮上传新视频
+                        2. 选择固定比例框 (3:4 或 1:1)
+                        3. 调整框的位置和大小，框住要跟踪的人物
+                        4. 点击"更新预览"查看裁切框
+                        5. 选择裁切方式：
+                           - **手动裁切**：固定位置裁切
+                           - **人物跟踪裁切**：动态跟踪人物移动
+                        
+                        **裁切框操作：**
+                        - 拖动滑块调整裁切框位置和大小
+                        - 裁切框会保持选择的比例
+                        - 确保框内包含要跟踪的人物
+                        
+                        **人物跟踪功能：**
+                        - 自动检测框内的人物
+                        - 实时跟踪人物移动
+                        - 裁切框会跟随人物移动
+                        - 保持人物在画面中心
+                        
+                        **3:4 比例：** 适合竖屏短视频
+                        **1:1 比例：** 适合方形视频
+                        
+                        **💡 提示：** 视频预览区域会智能显示当前可用的视频
+                        """)
                 
-                with gr.Column():
-                    # 裁切预览图像
-                    crop_preview_image = gr.Image(label="裁切框预览", type="filepath")
-                    crop_preview = gr.Video(label="裁切结果预览")
-                    crop_error_msg = gr.Textbox(label="裁切状态", interactive=False, visible=True)
-                    crop_info = gr.Markdown("""
-                    **裁切功能说明：**
-                    
-                    **视频输入方式：**
-                    - **方式一**：在"视频片段提取"标签页提取视频片段，自动传递到此页面
-                    - **方式二**：直接在此页面上传视频文件
-                    
-                    **使用步骤：**
-                    1. 选择视频输入方式：
-                       - 从第一步提取的视频片段会自动显示
-                       - 或点击"上传视频文件"按钮上传新视频
-                    2. 选择固定比例框 (3:4 或 1:1)
-                    3. 调整框的位置和大小，框住要跟踪的人物
-                    4. 点击"更新预览"查看裁切框
-                    5. 选择裁切方式：
-                       - **手动裁切**：固定位置裁切
-                       - **人物跟踪裁切**：动态跟踪人物移动
-                    
-                    **裁切框操作：**
-                    - 拖动滑块调整裁切框位置和大小
-                    - 裁切框会保持选择的比例
-                    - 确保框内包含要跟踪的人物
-                    
-                    **人物跟踪功能：**
-                    - 自动检测框内的人物
-                    - 实时跟踪人物移动
-                    - 裁切框会跟随人物移动
-                    - 保持人物在画面中心
-                    
-                    **3:4 比例：** 适合竖屏短视频
-                    **1:1 比例：** 适合方形视频
-                    
-                    **💡 提示：** 视频预览区域会智能显示当前可用的视频
-                    """)
-            
-            # 当提取的视频更新时，更新裁切界面的视频显示和上传按钮状态
-            extracted_video.change(
-                fn=update_video_display,
-                inputs=[extracted_video],
-                outputs=[crop_video_display, upload_btn]
-            )
-            
-            # 当上传按钮被点击时，允许用户上传视频
-            upload_btn.click(
-                fn=lambda x: x,
-                inputs=[upload_btn],
-                outputs=[crop_video_display]
-            )
-            
-            # 当比例改变时，更新预览
-            aspect_ratio.change(
-                fn=lambda video, ratio, cx, cy, s: update_crop_preview(video, ratio, cx, cy, s),
-                inputs=[crop_video_display, aspect_ratio, center_x, center_y, scale],
-                outputs=[crop_preview_image]
-            )
-            
-            # 当位置或缩放改变时，更新预览
-            center_x.change(
-                fn=lambda video, ratio, cx, cy, s: update_crop_preview(video, ratio, cx, cy, s),
-                inputs=[crop_video_display, aspect_ratio, center_x, center_y, scale],
-                outputs=[crop_preview_image]
-            )
-            
-            center_y.change(
-                fn=lambda video, ratio, cx, cy, s: update_crop_preview(video, ratio, cx, cy, s),
-                inputs=[crop_video_display, aspect_ratio, center_x, center_y, scale],
-                outputs=[crop_preview_image]
-            )
-            
-            scale.change(
-                fn=lambda video, ratio, cx, cy, s: update_crop_preview(video, ratio, cx, cy, s),
-                inputs=[crop_video_display, aspect_ratio, center_x, center_y, scale],
-                outputs=[crop_preview_image]
-            )
-            
-            # 更新预览按钮
-            update_preview_btn.click(
-                fn=lambda video, ratio, cx, cy, s: update_crop_preview(video, ratio, cx, cy, s),
-                inputs=[crop_video_display, aspect_ratio, center_x, center_y, scale],
-                outputs=[crop_preview_image]
-            )
-            
-            # 手动裁切按钮
-            manual_crop_btn.click(
-                fn=lambda video, ratio, cx, cy, s: crop_video_with_tracking(
-                    video, ratio, *get_crop_parameters(video, ratio, cx, cy, s)
-                ),
-                inputs=[crop_video_display, aspect_ratio, center_x, center_y, scale],
-                outputs=[crop_preview, crop_error_msg]
-            )
+                # 当提取的视频更新时，更新裁切界面的视频显示和上传按钮状态
+                extracted_video.change(
+                    fn=update_video_display,
+                    inputs=[extracted_video],
+                    outputs=[crop_video_display, upload_btn]
+                )
+                
+                # 当上传按钮被点击时，允许用户上传视频
+                upload_btn.click(
+                    fn=lambda x: x,
+                    inputs=[upload_btn],
+                    outputs=[crop_video_display]
+                )
+                
+                # 当比例改变时，更新预览
+                aspect_ratio.change(
+                    fn=lambda video, ratio, cx, cy, s: update_crop_preview(video, ratio, cx, cy, s),
+                    inputs=[crop_video_display, aspect_ratio, center_x, center_y, scale],
+                    outputs=[crop_preview_image]
+                )
+                
+                # 当位置或缩放改变时，更新预览
+                center_x.change(
+                    fn=lambda video, ratio, cx, cy, s: update_crop_preview(video, ratio, cx, cy, s),
+                    inputs=[crop_video_display, aspect_ratio, center_x, center_y, scale],
+                    outputs=[crop_preview_image]
+                )
+                
+                center_y.change(
+                    fn=lambda video, ratio, cx, cy, s: update_crop_preview(video, ratio, cx, cy, s),
+                    inputs=[crop_video_display, aspect_ratio, center_x, center_y, scale],
+                    outputs=[crop_preview_image]
+                )
+                
+                scale.change(
+                    fn=lambda video, ratio, cx, cy, s: update_crop_preview(video, ratio, cx, cy, s),
+                    inputs=[crop_video_display, aspect_ratio, center_x, center_y, scale],
+                    outputs=[crop_preview_image]
+                )
+                
+                # 更新预览按钮
+                update_preview_btn.click(
+                    fn=lambda video, ratio, cx, cy, s: update_crop_preview(video, ratio, cx, cy, s),
+                    inputs=[crop_video_display, aspect_ratio, center_x, center_y, scale],
+                    outputs=[crop_preview_image]
+                )
+                
+                # 手动裁切按钮
+                manual_crop_event = manual_crop_btn.click(
+                    fn=streamed('ffmpeg', lambda video, ratio, cx, cy, s: crop_with_parameters(
+                        crop_video_with_tracking, video, ratio, cx, cy, s
+                    ), 1, 2, gr.update),
+                    inputs=[crop_video_display, aspect_ratio, center_x, center_y, scale],
+                    outputs=[crop_preview, crop_error_msg]
+                )
+                
+                # 人物跟踪裁切按钮
+                auto_track_event = auto_track_btn.click(
+                    fn=streamed('tracking', lambda video, ratio, cx, cy, s: crop_with_parameters(
+                        crop_with_person_tracking, video, ratio, cx, cy, s
+                    ), 1, 2, gr.update),
+                    inputs=[crop_video_display, aspect_ratio, center_x, center_y, scale],
+                    outputs=[crop_preview, crop_error_msg]
+                )
+                
+                # 取消裁切
+                cancel_crop_btn.click(fn=None, cancels=[manual_crop_event, auto_track_event])
             
-            # 人物跟踪裁切按钮
-            auto_track_btn.click(
-                fn=lambda video, ratio, cx, cy, s: crop_with_person_tracking(
-                    video, ratio, *get_crop_parameters(video, ratio, cx, cy, s)
-                ),
-                inputs=[crop_video_display, aspect_ratio, center_x, center_y, scale],
-                outputs=[crop_preview, crop_error_msg]
-            )
-        
-        # 第三个标签页：字幕生成
-        with gr.TabItem("📝 字幕生成"):
-            with gr.Row():
-                with gr.Column():
-                    # 视频输入区域
-                    with gr.Group():
-                        gr.Markdown("### 📹 视频输入")
-                        subtitle_video_input = gr.Video(label="上传视频文件", interactive=True)
-                    
-                    # 字幕设置
-                    with gr.Group():
-                        gr.Markdown("### ⚙️ 字幕设置")
-                        model_size = gr.Radio(
-                            choices=["tiny", "base", "small", "medium", "large"],
-                            label="Whisper模型大小",
-                            value="base",
-                            info="模型越大，识别越准确，但处理时间越长"
-                        )
+            # 第三个标签页：字幕生成
+            with gr.TabItem("📝 字幕生成"):
+                with gr.Row():
+                    with gr.Column():
+                        # 视频输入区域
+                        with gr.Group():
+                            gr.Markdown("### 📹 视频输入")
+                            subtitle_video_input = gr.Video(label="上传视频文件", interactive=True)
+                            subtitle_file_input = gr.File(
+                                label="导入字幕文件（可选）",
+                                file_types=[".srt", ".vtt", ".ass"],
+                                type="filepath"
+                            )
                         
-                        translate_subtitles = gr.Checkbox(
-                            label="翻译为中文",
-                            value=True,
-                            info="自动将英文字幕翻译为中文"
-                        )
+                        # 字幕设置
+                        with gr.Group():
+                            gr.Markdown("### ⚙️ 字幕设置")
+                            model_size = gr.Radio(
+                                choices=["tiny", "base", "small", "medium", "large"],
+                                label="Whisper模型大小",
+                                value="base",
+                                info="模型越大，识别越准确，但处理时间越长"
+                            )
+                            
+                            asr_backend = gr.Radio(
+                                choices=["whisper", "faster-whisper"],
+                                label="识别引擎",
+                                value=default_backend(),
+                                info="faster-whisper 使用 int8 量化模型，纯 CPU 服务器上更快（需安装 faster-whisper）"
+                            )
+                            
+                            translate_subtitles = gr.Checkbox(
+                                label="翻译为中文",
+                                value=True,
+                                info="自动将英文字幕翻译为中文"
+                            )
+                            
+                            embed_subtitles = gr.Checkbox(
+                                label="嵌入字幕到视频",
+                                value=False,
+                                info="将生成的字幕直接嵌入到视频中（推荐）"
+                            )
+                            
+                            subtitle_mode = gr.Radio(
+                                choices=list(SUBTITLE_MODES),
+                                label="嵌入方式",
+                                value=list(SUBTITLE_MODES)[0],
+                                info="软字幕轨道直接复制音视频流，播放器中可开关；需要字幕始终显示在画面上时选择烧录"
+                            )
                         
-                        embed_subtitles = gr.Checkbox(
-                            label="嵌入字幕到视频",
-                            value=False,
-                            info="将生成的字幕直接嵌入到视频中（推荐）"
-                        )
+                        with gr.Row():
+                            generate_subtitle_btn = gr.Button("🎯 生成字幕", variant="primary")
+                            cancel_subtitle_btn = gr.Button("⏹️ 取消", variant="stop")
+                            add_subtitle_btn = gr.Button("➕ 加入合并导出", variant="secondary")
                     
-                    generate_subtitle_btn = gr.Button("🎯 生成字幕", variant="primary")
+                    with gr.Column():
+                        # 字幕预览和下载
+                        with gr.Group():
+                            gr.Markdown("### 📄 字幕预览")
+                            subtitle_preview = gr.Textbox(
+                                label="字幕内容预览",
+                                lines=15,
+                                interactive=False,
+                                placeholder="字幕生成后将在此显示..."
+                            )
+                            
+                            download_subtitle_btn = gr.Button("⬇️ 下载字幕文件", variant="secondary", visible=False)
+                        
+                        subtitle_error_msg = gr.Textbox(label="处理状态", interactive=False, visible=True)
+                        subtitle_info = gr.Markdown("""
+                        **字幕生成功能说明：**
+                        
+                        **功能特点：**
+                        - 🎤 **语音识别**：使用OpenAI Whisper进行高精度语音识别
+                        - 🌍 **多语言支持**：支持英文等多种语言的语音识别
+                        - 🔄 **自动翻译**：将英文字幕自动翻译为中文
+                        - 📝 **SRT格式**：生成标准SRT字幕文件
+                        - 📂 **导入字幕**：可导入已有的 SRT/WebVTT/ASS 字幕，跳过识别，转换为 SRT 或嵌入视频
+                        
+                        **使用步骤：**
+                        1. 上传包含语音的视频文件
+                        2. 选择Whisper模型大小（推荐base或small）
+                        3. 选择是否需要中文翻译
+                        4. 点击"生成字幕"
+                        5. 等待处理完成
+                        6. 下载字幕文件
+                        
+                        **模型大小说明：**
+                        - **tiny**: 最快，适合测试
+                        - **base**: 平衡速度和准确性（推荐）
+                        - **small**: 更准确，处理时间较长
+                        - **medium**: 高准确性，处理时间长
+                        - **large**: 最高准确性，处理时间最长
+                        
+                        **💡 提示：** 首次使用需要下载Whisper模型，请耐心等待
+                        """)
+                
+                # 字幕生成按钮事件：识别过程中逐段显示已识别的字幕、进度和剩余时间
+                subtitle_event = generate_subtitle_btn.click(
+                    fn=streamed('whisper', generate_subtitles, 1, 3, gr.update, preview_index=0),
+                    inputs=[subtitle_video_input, model_size, translate_subtitles, embed_subtitles, asr_backend,
+                            subtitle_mode, subtitle_file_input],
+                    outputs=[subtitle_preview, subtitle_error_msg, subtitle_file_path]
+                )
                 
-                with gr.Column():
-                    # 字幕预览和下载
-                    with gr.Group():
-                        gr.Markdown("### 📄 字幕预览")
-                        subtitle_preview = gr.Textbox(
-                            label="字幕内容预览",
-                            lines=15,
-                            interactive=False,
-                            placeholder="字幕生成后将在此显示..."
-                        )
+                # 当字幕生成成功时显示下载按钮
+                subtitle_event.then(
+                    fn=lambda x: True if x else False,
+                    inputs=[subtitle_file_path],
+                    outputs=[download_subtitle_btn]
+                )
+                
+                # 取消字幕生成
+                cancel_subtitle_btn.click(fn=None, cancels=[subtitle_event])
+                
+                # 下载字幕按钮事件
+                download_subtitle_btn.click(
+                    fn=download_subtitle_file,
+                    inputs=[subtitle_file_path],
+                    outputs=[download_subtitle_btn]
+                )
+            
+            # 第四个标签页：合并导出
+            with gr.TabItem("🎬 合并导出"):
+                with gr.Row():
+                    with gr.Column():
+                        with gr.Group():
+                            gr.Markdown("### 🧩 编辑步骤")
+                            edit_summary = gr.Markdown("尚未添加编辑步骤")
                         
-                        download_subtitle_btn = gr.Button("⬇️ 下载字幕文件", variant="secondary", visible=False)
-                    
-                    subtitle_error_msg = gr.Textbox(label="处理状态", interactive=False, visible=True)
-                    subtitle_info = gr.Markdown("""
-                    **字幕生成功能说明：**
-                    
-                    **功能特点：**
-                    - 🎤 **语音识别**：使用OpenAI Whisper进行高精度语音识别
-                    - 🌍 **多语言支持**：支持英文等多种语言的语音识别
-                    - 🔄 **自动翻译**：将英文字幕自动翻译为中文
-                    - 📝 **SRT格式**：生成标准SRT字幕文件
-                    
-                    **使用步骤：**
-                    1. 上传包含语音的视频文件
-                    2. 选择Whisper模型大小（推荐base或small）
-                    3. 选择是否需要中文翻译
-                    4. 点击"生成字幕"
-                    5. 等待处理完成
-                    6. 下载字幕文件
-                    
-                    **模型大小说明：**
-                    - **tiny**: 最快，适合测试
-                    - **base**: 平衡速度和准确性（推荐）
-                    - **small**: 更准确，处理时间较长
-                    - **medium**: 高准确性，处理时间长
-                    - **large**: 最高准确性，处理时间最长
+                        with gr.Row():
+                            export_edit_btn = gr.Button("🎬 一次性导出", variant="primary")
+                            cancel_edit_btn = gr.Button("⏹️ 取消", variant="stop")
+                            clear_edit_btn = gr.Button("🗑️ 清空步骤", variant="secondary")
+                        
+                        edit_info = gr.Markdown("""
+                        **合并导出说明：**
+                        - 在前面各标签页点击"加入合并导出"，把时间范围、裁切框和字幕依次加入
+                        - 所有步骤编译为一条 FFmpeg 滤镜链，只解码和编码一次
+                        - 避免提取、裁切、字幕嵌入分别生成中间视频造成的多次重编码画质损失
+                        """)
                     
-                    **💡 提示：** 首次使用需要下载Whisper模型，请耐心等待
-                    """)
-            
-            # 字幕生成按钮事件
-            generate_subtitle_btn.click(
-                fn=lambda video, model, translate, embed: generate_subtitles(video, model, translate, embed),
-                inputs=[subtitle_video_input, model_size, translate_subtitles, embed_subtitles],
-                outputs=[subtitle_preview, subtitle_error_msg, subtitle_file_path]
-            )
-            
-            # 当字幕生成成功时显示下载按钮
-            generate_subtitle_btn.click(
-                fn=lambda x: True if x else False,
-                inputs=[subtitle_file_path],
-                outputs=[download_subtitle_btn]
-            )
-            
-            # 下载字幕按钮事件
-            download_subtitle_btn.click(
-                fn=download_subtitle_file,
-                inputs=[subtitle_file_path],
-                outputs=[download_subtitle_btn]
-            )
+                    with gr.Column():
+                        edit_preview = gr.Video(label="导出结果预览")
+                        edit_error_msg = gr.Textbox(label="导出状态", interactive=False, visible=True)
+                
+                # 各标签页的"加入合并导出"按钮
+                add_trim_btn.click(
+                    fn=lambda spec, video, start, end: add_trim(spec, video, start, end),
+                    inputs=[edit_spec, video_input, start_time, end_time],
+                    outputs=[edit_spec, edit_summary]
+                )
+                
+                add_crop_btn.click(
+                    fn=add_crop_with_parameters,
+                    inputs=[edit_spec, crop_video_display, aspect_ratio, center_x, center_y, scale],
+                    outputs=[edit_spec, edit_summary]
+                )
+                
+                add_subtitle_btn.click(
+                    fn=lambda spec, video, srt: add_subtitles(spec, video, srt),
+                    inputs=[edit_spec, subtitle_video_input, subtitle_preview],
+                    outputs=[edit_spec, edit_summary]
+                )
+                
+                export_edit_event = export_edit_btn.click(
+                    fn=streamed('ffmpeg', export_edit, 1, 2, gr.update),
+                    inputs=[edit_spec],
+                    outputs=[edit_preview, edit_error_msg]
+                )
+                
+                cancel_edit_btn.click(fn=None, cancels=[export_edit_event])
+                
+                clear_edit_btn.click(
+                    fn=lambda: (None, "尚未添加编辑步骤"),
+                    inputs=[],
+                    outputs=[edit_spec, edit_summary]
+                )
+    return demo
+
+def main():
+    demo = create_interface()
+    # 并发由任务调度器按资源类别控制，Gradio 本身不再串行化事件
+    demo.queue(default_concurrency_limit=None).launch(share=False, prevent_thread_lock=True)
+    # 界面可用后再按需在后台预热重量级依赖（VIDEOCUT_WARMUP=crop,subtitle 或 all）
+    warm_up_from_env()
+    # 预加载默认的 Whisper 模型（VIDEOCUT_WHISPER_PRELOAD=base 等）
+    preload_whisper_from_env()
+    demo.block_thread() 
 
 if __name__ == "__main__":
-    demo.launch(share=False) 
\ No newline at end of file
+    main()
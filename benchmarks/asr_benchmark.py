@@ -0,0 +1,121 @@
+"""
+识别引擎基准测试：比较各引擎在测试片段上的实时率（RTF = 识别耗时 / 音频时长）和准确率。
+
+    python benchmarks/asr_benchmark.py clips/*.mp4                          # whisper 与 faster-whisper 对比
+    python benchmarks/asr_benchmark.py clips/*.mp4 --model small --json
+    python benchmarks/asr_benchmark.py a.mp4 --backends faster-whisper --repeat 3
+
+每个片段旁的同名 .txt 文件（如 a.mp4 -> a.txt）作为参考文本，计算词错误率（WER）；
+没有参考文本时以第一个引擎的结果为基准，报告其他引擎与它的差异率。
+模型加载耗时单独统计，不计入 RTF。
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from utils.audio_utils import decode_audio, WHISPER_SAMPLE_RATE
+from modules.asr_backends import BACKENDS, get_backend
+
+def normalize_words(text: str) -> list:
+    """小写并去掉标点后按空白切分为单词"""
+    cleaned = ''.join(c.lower() if c.isalnum() or c.isspace() else ' ' for c in text)
+    return cleaned.split()
+
+def word_error_rate(reference: str, hypothesis: str) -> float:
+    """词错误率：单词级编辑距离 / 参考单词数"""
+    ref = normalize_words(reference)
+    hyp = normalize_words(hypothesis)
+    if not ref:
+        return 0.0 if not hyp else 1.0
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        current = [i] + [0] * len(hyp)
+        for j, hyp_word in enumerate(hyp, 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1,
+                             previous[j - 1] + (ref_word != hyp_word))
+        previous = current
+    return previous[-1] / len(ref)
+
+def load_reference(clip_path: str):
+    reference_path = os.path.splitext(clip_path)[0] + '.txt'
+    if os.path.exists(reference_path):
+        with open(reference_path, 'r', encoding='utf-8') as f:
+            return f.read()
+    return None
+
+def run_backend(name: str, model_size: str, clips: dict, repeat: int) -> dict:
+    """用一个引擎识别所有片段，返回加载耗时和各片段的耗时、文本"""
+    backend = get_backend(name)
+    started = time.perf_counter()
+    model = backend.load(model_size)
+    load_seconds = time.perf_counter() - started
+
+    results = {}
+    for clip_path, audio in clips.items():
+        best = None
+        text = ''
+        for _ in range(max(1, repeat)):
+            started = time.perf_counter()
+            text = backend.transcribe(model, audio, {})['text']
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        duration = len(audio) / WHISPER_SAMPLE_RATE
+        results[clip_path] = {'seconds': best, 'rtf': best / duration if duration else None, 'text': text}
+    return {'load_seconds': load_seconds, 'clips': results}
+
+def main():
+    parser = argparse.ArgumentParser(description="识别引擎的实时率和准确率对比")
+    parser.add_argument('clips', nargs='+', help="测试视频或音频文件")
+    parser.add_argument('--model', default='base', help="模型大小")
+    parser.add_argument('--backends', default=','.join(BACKENDS), help="参与对比的引擎，逗号分隔")
+    parser.add_argument('--repeat', type=int, default=1, help="每个片段识别次数，取耗时最小的一次")
+    parser.add_argument('--json', action='store_true', help="以 JSON 输出结果")
+    args = parser.parse_args()
+
+    clips = {path: decode_audio(path) for path in args.clips}
+    references = {path: load_reference(path) for path in args.clips}
+    backends = [name.strip() for name in args.backends.split(',') if name.strip()]
+
+    report = {}
+    for name in backends:
+        try:
+            report[name] = run_backend(name, args.model, clips, args.repeat)
+        except Exception as e:
+            report[name] = {'error': f"{type(e).__name__}: {e}"}
+
+    # 准确率：有参考文本时计算 WER，否则与第一个成功的引擎比较
+    baseline = next((name for name in backends if 'error' not in report[name]), None)
+    for name in backends:
+        if 'error' in report[name]:
+            continue
+        for clip_path, r in report[name]['clips'].items():
+            reference = references[clip_path]
+            if reference is not None:
+                r['wer'] = word_error_rate(reference, r['text'])
+            elif baseline and name != baseline:
+                r['diff_vs_' + baseline] = word_error_rate(report[baseline]['clips'][clip_path]['text'], r['text'])
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return
+
+    print(f"{'引擎':<16}{'加载(s)':>9}{'片段':>24}{'时长(s)':>9}{'识别(s)':>9}{'RTF':>8}{'WER/差异':>10}")
+    for name in backends:
+        r = report[name]
+        if 'error' in r:
+            print(f"{name:<16}（失败: {r['error']}）")
+            continue
+        for clip_path, c in r['clips'].items():
+            duration = len(clips[clip_path]) / WHISPER_SAMPLE_RATE
+            accuracy = c.get('wer', next((v for k, v in c.items() if k.startswith('diff_vs_')), None))
+            accuracy_text = f"{accuracy:.1%}" if accuracy is not None else '-'
+            print(f"{name:<16}{r['load_seconds']:>9.1f}{os.path.basename(clip_path)[-22:]:>24}"
+                  f"{duration:>9.1f}{c['seconds']:>9.2f}{c['rtf'] or 0:>8.3f}{accuracy_text:>10}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""
+启动基准测试：在独立的 Python 进程中分别导入各功能的依赖，报告导入耗时和常驻内存（RSS）。
+
+    python benchmarks/startup_benchmark.py            # 各功能 + 应用入口
+    python benchmarks/startup_benchmark.py --json     # 输出 JSON
+    python benchmarks/startup_benchmark.py --repeat 3 # 每项测量 3 次取最小值
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from utils.lazy_import import FEATURE_MODULES
+
+# 在子进程中执行的测量脚本：导入指定模块，输出耗时和导入前后的 RSS
+PROBE_SCRIPT = r'''
+import sys, time, json, importlib
+
+def rss_mb():
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return usage / (1024 * 1024) if sys.platform == 'darwin' else usage / 1024
+
+before = rss_mb()
+started = time.perf_counter()
+error = None
+try:
+    for name in sys.argv[1:]:
+        importlib.import_module(name)
+except Exception as e:
+    error = f"{type(e).__name__}: {e}"
+elapsed = time.perf_counter() - started
+print(json.dumps({'seconds': elapsed, 'rss_mb': rss_mb(), 'rss_delta_mb': rss_mb() - before, 'error': error}))
+'''
+
+def measure(modules: list) -> dict:
+    """在新进程中导入模块并返回测量结果"""
+    result = subprocess.run([sys.executable, '-c', PROBE_SCRIPT] + modules,
+                            capture_output=True, text=True, cwd=ROOT)
+    try:
+        return json.loads(result.stdout.strip().splitlines()[-1])
+    except (IndexError, ValueError):
+        return {'seconds': None, 'rss_mb': None, 'rss_delta_mb': None,
+                'error': result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "未知错误"}
+
+def main():
+    parser = argparse.ArgumentParser(description="各功能的导入耗时和内存占用")
+    parser.add_argument('--repeat', type=int, default=1, help="每项测量次数，取耗时最小的一次")
+    parser.add_argument('--json', action='store_true', help="以 JSON 输出结果")
+    args = parser.parse_args()
+
+    targets = dict(FEATURE_MODULES)
+    # 应用入口：构建界面但不启动服务，衡量冷启动时真正要付出的代价
+    targets['app'] = ['app']
+
+    results = {}
+    for feature, modules in targets.items():
+        runs = [measure(modules) for _ in range(max(1, args.repeat))]
+        ok_runs = [r for r in runs if r['error'] is None]
+        results[feature] = min(ok_runs, key=lambda r: r['seconds']) if ok_runs else runs[0]
+        results[feature]['modules'] = modules
+
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+        return
+
+    print(f"{'功能':<10}{'导入耗时(s)':>12}{'RSS(MB)':>10}{'新增RSS(MB)':>14}  模块")
+    for feature, r in results.items():
+        if r['error']:
+            print(f"{feature:<10}{'-':>12}{'-':>10}{'-':>14}  {', '.join(r['modules'])}（失败: {r['error']}）")
+        else:
+            print(f"{feature:<10}{r['seconds']:>12.2f}{r['rss_mb']:>10.1f}{r['rss_delta_mb']:>14.1f}  {', '.join(r['modules'])}")
+
+if __name__ == '__main__':
+    main()
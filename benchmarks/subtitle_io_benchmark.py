@@ -0,0 +1,93 @@
+"""
+字幕读写基准测试：生成大量字幕条目，比较各格式流式写入、逐条解析的耗时和峰值内存。
+
+    python benchmarks/subtitle_io_benchmark.py                  # 10 万条字幕
+    python benchmarks/subtitle_io_benchmark.py --cues 500000 --json
+
+同时测量旧的字符串拼接方式（先在内存中拼出完整 SRT 再写入）作为对照。
+峰值内存由 tracemalloc 统计，只包含 Python 对象分配。
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from utils.subtitle_io import Cue, SUBTITLE_FORMATS, WRITERS, iter_cues
+
+def generate_cues(count: int):
+    """逐条生成双语字幕，每条 2.5 秒"""
+    for i in range(count):
+        start = i * 2.5
+        yield Cue(start, start + 2.2, f"This is subtitle number {i}, spoken at {start:.1f} seconds.\n这是第 {i} 条字幕。")
+
+def legacy_srt(count: int, f):
+    """旧实现：逐条 += 拼接出完整字符串后一次写入"""
+    content = ""
+    for i, cue in enumerate(generate_cues(count), 1):
+        content += f"{i}\n"
+        content += f"{int(cue.start // 60):02d}:{cue.start % 60:05.2f} --> {int(cue.end // 60):02d}:{cue.end % 60:05.2f}\n"
+        content += f"{cue.text}\n\n"
+    f.write(content)
+
+def measure(func) -> dict:
+    """执行一次，返回耗时和 Python 峰值内存"""
+    tracemalloc.start()
+    started = time.perf_counter()
+    func()
+    seconds = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'seconds': seconds, 'peak_mb': peak / 1024 / 1024}
+
+def main():
+    parser = argparse.ArgumentParser(description="字幕读写的耗时和内存对比")
+    parser.add_argument('--cues', type=int, default=100000, help="字幕条数")
+    parser.add_argument('--json', action='store_true', help="以 JSON 输出结果")
+    args = parser.parse_args()
+
+    report = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        def write_legacy():
+            with open(os.path.join(tmp_dir, 'legacy.srt'), 'w', encoding='utf-8') as f:
+                legacy_srt(args.cues, f)
+        report['legacy srt (+=)'] = {'write': measure(write_legacy)}
+
+        for fmt in SUBTITLE_FORMATS:
+            path = os.path.join(tmp_dir, f"bench.{fmt}")
+
+            def write():
+                with open(path, 'w', encoding='utf-8') as f:
+                    WRITERS[fmt](generate_cues(args.cues), f)
+
+            parsed = []
+
+            def parse():
+                # 逐条解析后丢弃，只统计条数
+                with open(path, 'r', encoding='utf-8') as f:
+                    parsed.append(sum(1 for _ in iter_cues(f, fmt)))
+
+            entry = {'write': measure(write), 'size_mb': os.path.getsize(path) / 1024 / 1024}
+            entry['parse'] = measure(parse)
+            entry['parsed_cues'] = parsed[0]
+            report[fmt] = entry
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return
+
+    print(f"{args.cues} 条字幕")
+    print(f"{'格式':<18}{'写入(s)':>10}{'写入峰值(MB)':>14}{'解析(s)':>10}{'解析峰值(MB)':>14}{'文件(MB)':>10}")
+    for name, r in report.items():
+        parse = r.get('parse')
+        parse_text = f"{parse['seconds']:>10.2f}{parse['peak_mb']:>14.1f}" if parse else f"{'-':>10}{'-':>14}"
+        size_text = f"{r['size_mb']:>10.1f}" if 'size_mb' in r else f"{'-':>10}"
+        print(f"{name:<18}{r['write']['seconds']:>10.2f}{r['write']['peak_mb']:>14.1f}{parse_text}{size_text}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,260 @@
+"""
+命令行入口（不加载 Gradio），用法示例：
+
+    python -m cli extract input.mp4 --start 1:50 --end 4:00 -o clip.mp4
+    python -m cli crop input.mp4 --ratio 3:4 --center-x 0.4 -o cropped.mp4
+    python -m cli track input.mp4 --ratio 1:1 -o tracked.mp4
+    python -m cli subtitle input.mp4 --model small --embed -o output.mp4
+    python -m cli subtitle input.mp4 --embed --subtitle-mode burn -o burned.mp4
+    python -m cli subtitle input.mp4 --subtitles external.ass --embed -o output.mp4
+    python -m cli batch jobs.json -j 4 --report results.json
+    python -m cli clear-cache input.mp4          # 使该视频的识别结果缓存失效
+    python -m cli clear-cache --target all       # 清空识别结果缓存和渲染缓存
+
+批量清单支持 JSON（任务列表，或 {"jobs": [...]}）和 CSV（表头为任务字段名），
+每个任务包含 op（extract/crop/track/subtitle）、input 以及该操作的参数。
+Whisper、torch、OpenCV 只在执行需要它们的任务时才会导入。
+"""
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+
+# 各操作使用的调度器资源类别
+OPERATION_RESOURCES = {
+    'extract': 'ffmpeg',
+    'crop': 'ffmpeg',
+    'track': 'tracking',
+    'subtitle': 'whisper',
+}
+
+def _bool(value) -> bool:
+    """解析清单中的布尔值"""
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ('1', 'true', 'yes', 'y', 'on')
+
+def _float(value, default: float) -> float:
+    return default if value in (None, '') else float(value)
+
+def run_extract(job: dict):
+    from modules.video_extractor import extract_segment
+    output_path, error_msg, _ = extract_segment(job['input'], str(job['start']), str(job['end']),
+                                                _bool(job.get('smart_cut', True)))
+    return output_path, error_msg
+
+def _crop_box(job: dict) -> tuple:
+    from modules.video_cropper import relative_crop_box
+    return relative_crop_box(job['input'], job.get('ratio') or '3:4',
+                             _float(job.get('center_x'), 0.5),
+                             _float(job.get('center_y'), 0.5),
+                             _float(job.get('scale'), 0.8))
+
+def run_crop(job: dict):
+    from modules.video_cropper import crop_video_with_tracking
+    return crop_video_with_tracking(job['input'], job.get('ratio') or '3:4', *_crop_box(job))
+
+def run_track(job: dict):
+    from modules.video_cropper import crop_with_person_tracking
+    return crop_with_person_tracking(job['input'], job.get('ratio') or '3:4', *_crop_box(job))
+
+def run_subtitle(job: dict):
+    from modules.subtitle_generator import generate_subtitles
+    _, status, output_path = generate_subtitles(job['input'], job.get('model') or 'base',
+                                                _bool(job.get('translate', True)),
+                                                _bool(job.get('embed', False)),
+                                                job.get('backend') or None,
+                                                job.get('subtitle_mode') or 'soft',
+                                                job.get('subtitles') or None)
+    return output_path, "" if output_path else status
+
+OPERATIONS = {
+    'extract': run_extract,
+    'crop': run_crop,
+    'track': run_track,
+    'subtitle': run_subtitle,
+}
+
+def run_job(index: int, job: dict) -> dict:
+    """执行单个任务，返回结果记录（不抛出异常）"""
+    started = time.time()
+    record = {'index': index, 'op': job.get('op'), 'input': job.get('input'),
+              'status': 'error', 'output': None, 'error': None}
+    try:
+        operation = OPERATIONS.get(job.get('op'))
+        if operation is None:
+            raise ValueError(f"未知的操作: {job.get('op')}")
+        if not job.get('input') or not os.path.exists(job['input']):
+            raise ValueError(f"输入文件不存在: {job.get('input')}")
+
+        output_path, error_msg = operation(job)
+        if not output_path:
+            raise ValueError(error_msg or "输出文件未生成")
+
+        # 指定了输出路径时从缓存导出（同一文件系统上为硬链接）
+        if job.get('output'):
+            from utils.render_cache import render_cache
+            output_dir = os.path.dirname(os.path.abspath(job['output']))
+            os.makedirs(output_dir, exist_ok=True)
+            output_path = render_cache.export(output_path, job['output'])
+
+        record.update(status='ok', output=os.path.abspath(output_path))
+    except Exception as e:
+        record['error'] = str(e)
+        print(f"任务 {index} 执行失败: {e}")
+    record['elapsed'] = round(time.time() - started, 3)
+    return record
+
+def load_manifest(path: str) -> list:
+    """读取 JSON 或 CSV 格式的批量任务清单"""
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        if path.lower().endswith('.csv'):
+            jobs = [{k.strip(): v.strip() for k, v in row.items() if k and v is not None and v.strip() != ''}
+                    for row in csv.DictReader(f)]
+        else:
+            data = json.load(f)
+            jobs = data.get('jobs', []) if isinstance(data, dict) else data
+
+    # 清单中的相对路径以清单所在目录为基准
+    base_dir = os.path.dirname(os.path.abspath(path))
+    for job in jobs:
+        for key in ('input', 'output'):
+            if job.get(key) and not os.path.isabs(job[key]):
+                job[key] = os.path.join(base_dir, job[key])
+    return jobs
+
+def run_jobs(jobs: list, parallel: int = None) -> list:
+    """按资源类别并发执行任务，parallel 为 FFmpeg 和人物跟踪任务的并发数"""
+    from utils.job_scheduler import JobScheduler, default_limits
+
+    cpu_count = os.cpu_count() or 1
+    limits = default_limits(cpu_count)
+    if parallel:
+        limits['ffmpeg'] = limits['tracking'] = max(1, parallel)
+    scheduler = JobScheduler(limits=limits, cpu_count=cpu_count)
+
+    futures = []
+    for index, job in enumerate(jobs):
+        resource = OPERATION_RESOURCES.get(job.get('op'), 'ffmpeg')
+        futures.append(scheduler.submit(resource, run_job, index, job))
+
+    results = []
+    for future in futures:
+        record = future.result()
+        mark = '✅' if record['status'] == 'ok' else '❌'
+        print(f"{mark} [{record['index']}] {record['op']} {record['input']} -> {record['output'] or record['error']}")
+        results.append(record)
+    return results
+
+def write_report(results: list, report_path: str, elapsed: float):
+    """写出机器可读的结果报告"""
+    report = {
+        'total': len(results),
+        'succeeded': sum(1 for r in results if r['status'] == 'ok'),
+        'failed': sum(1 for r in results if r['status'] != 'ok'),
+        'elapsed': round(elapsed, 3),
+        'results': results,
+    }
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"结果报告已写入: {report_path}")
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='python -m cli', description="视频剪辑工具命令行")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    def add_common(sub):
+        sub.add_argument('input', help="输入视频文件")
+        sub.add_argument('-o', '--output', help="输出文件路径（默认留在渲染缓存中）")
+        sub.add_argument('--report', help="把结果写入 JSON 报告")
+
+    extract = subparsers.add_parser('extract', help="提取视频片段")
+    add_common(extract)
+    extract.add_argument('--start', required=True, help="开始时间 (MM:SS 或 HH:MM:SS)")
+    extract.add_argument('--end', required=True, help="结束时间 (MM:SS 或 HH:MM:SS)")
+    extract.add_argument('--no-smart-cut', dest='smart_cut', action='store_false', help="完整重编码，不使用智能切割")
+
+    for name, help_text in (('crop', "固定位置裁切"), ('track', "人物跟踪裁切")):
+        sub = subparsers.add_parser(name, help=help_text)
+        add_common(sub)
+        sub.add_argument('--ratio', default='3:4', help="裁切比例，如 3:4、1:1、9:16")
+        sub.add_argument('--center-x', type=float, default=0.5, help="框中心 X 位置 (0~1)")
+        sub.add_argument('--center-y', type=float, default=0.5, help="框中心 Y 位置 (0~1)")
+        sub.add_argument('--scale', type=float, default=0.8, help="框缩放大小 (0.1~1)")
+
+    subtitle = subparsers.add_parser('subtitle', help="生成字幕")
+    add_common(subtitle)
+    subtitle.add_argument('--model', default='base', help="Whisper 模型大小")
+    subtitle.add_argument('--backend', default=None, choices=('whisper', 'faster-whisper'),
+                          help="识别引擎（默认 whisper，faster-whisper 在 CPU 上以 int8 推理）")
+    subtitle.add_argument('--no-translate', dest='translate', action='store_false', help="不翻译为中文")
+    subtitle.add_argument('--embed', action='store_true', help="把字幕嵌入视频")
+    subtitle.add_argument('--subtitle-mode', choices=('soft', 'burn'), default='soft',
+                          help="嵌入方式：soft 封装为字幕轨道（不重编码，默认），burn 烧录到画面")
+    subtitle.add_argument('--subtitles', default=None,
+                          help="导入已有的字幕文件（SRT/WebVTT/ASS），不做语音识别，可转换为 SRT 或嵌入视频")
+
+    batch = subparsers.add_parser('batch', help="执行 JSON/CSV 清单中的批量任务")
+    batch.add_argument('manifest', help="任务清单文件 (.json 或 .csv)")
+    batch.add_argument('-j', '--jobs', type=int, default=None, help="FFmpeg/人物跟踪任务并发数")
+    batch.add_argument('--report', default=None, help="结果报告路径（默认为清单旁的 *.results.json）")
+
+    clear = subparsers.add_parser('clear-cache', help="清理识别结果缓存或渲染缓存")
+    clear.add_argument('inputs', nargs='*', help="只使这些视频的识别结果失效（不指定时清空整个缓存）")
+    clear.add_argument('--target', choices=('transcripts', 'renders', 'all'), default='transcripts',
+                       help="要清理的缓存（默认 transcripts）")
+
+    return parser
+
+def clear_cache(inputs: list, target: str) -> int:
+    """清理缓存；指定视频时按音频指纹使对应的识别结果失效"""
+    from utils.transcript_cache import transcript_cache, audio_fingerprint
+
+    if inputs:
+        if target != 'transcripts':
+            print("指定视频时只清理识别结果缓存")
+        from utils.audio_utils import decode_audio
+        failed = False
+        for path in inputs:
+            try:
+                removed = transcript_cache.invalidate(audio_fingerprint(decode_audio(path)))
+                print(f"{path}: 删除 {removed} 条识别结果缓存")
+            except Exception as e:
+                print(f"{path}: 清理失败: {e}")
+                failed = True
+        return 1 if failed else 0
+
+    if target in ('transcripts', 'all'):
+        print(f"已清空识别结果缓存（{transcript_cache.invalidate()} 条）")
+    if target in ('renders', 'all'):
+        from utils.render_cache import render_cache
+        render_cache.clear()
+        print("已清空渲染缓存")
+    return 0
+
+def main(argv: list = None) -> int:
+    args = build_parser().parse_args(argv)
+    started = time.time()
+
+    if args.command == 'clear-cache':
+        return clear_cache(args.inputs, args.target)
+
+    if args.command == 'batch':
+        jobs = load_manifest(args.manifest)
+        print(f"共 {len(jobs)} 个任务")
+        results = run_jobs(jobs, args.jobs)
+        report_path = args.report or os.path.splitext(args.manifest)[0] + '.results.json'
+    else:
+        job = {key: value for key, value in vars(args).items() if key not in ('command', 'report')}
+        job['op'] = args.command
+        results = run_jobs([job])
+        report_path = args.report
+
+    if report_path:
+        write_report(results, report_path, time.time() - started)
+    return 0 if all(r['status'] == 'ok' for r in results) else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
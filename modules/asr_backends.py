@@ -0,0 +1,144 @@
+import os
+import ssl
+from abc import ABC, abstractmethod
+from utils.model_registry import model_memory_bytes
+
+# 默认使用的识别引擎，可通过环境变量调整
+ASR_BACKEND_ENV = 'VIDEOCUT_ASR_BACKEND'
+DEFAULT_BACKEND = 'whisper'
+
+# faster-whisper 的计算精度：int8（默认，CPU 上最快）、int8_float32、float32 等
+FASTER_WHISPER_COMPUTE_ENV = 'VIDEOCUT_FASTER_WHISPER_COMPUTE'
+DEFAULT_COMPUTE_TYPE = 'int8'
+
+# openai-whisper fp32 权重的大致内存占用（MB）
+WHISPER_MEMORY_MB = {
+    'tiny': 150,
+    'base': 290,
+    'small': 970,
+    'medium': 3000,
+    'large': 6000,
+}
+
+# int8 权重的大致内存占用（MB），约为 fp32 的四分之一
+FASTER_WHISPER_MEMORY_MB = {
+    'tiny': 45,
+    'base': 80,
+    'small': 260,
+    'medium': 800,
+    'large': 1600,
+}
+
+def normalize_result(segments, language) -> dict:
+    """统一各引擎的识别结果：{'text', 'segments': [{'start', 'end', 'text'}], 'language'}"""
+    segments = [{'start': float(s['start']), 'end': float(s['end']), 'text': s['text']} for s in segments]
+    return {
+        'text': ''.join(s['text'] for s in segments).strip(),
+        'segments': segments,
+        'language': language,
+    }
+
+class ASRBackend(ABC):
+    """
+    语音识别引擎接口：load 加载模型，transcribe 识别 16kHz 单声道音频数组（或音频文件路径）。
+    子类必须实现这两个方法，缺少时在创建实例时就会报错。
+    """
+
+    name = ''
+    # 模型大小 -> 加载后的大致内存占用（MB）
+    memory_mb = {}
+
+    @abstractmethod
+    def load(self, model_size: str, threads: int = None):
+        """加载模型；threads 为推理线程数，None 表示由引擎决定"""
+
+    @abstractmethod
+    def transcribe(self, model, audio, options: dict) -> dict:
+        """识别音频，返回 normalize_result 的结构"""
+
+    def gpu_available(self) -> bool:
+        """引擎会使用 GPU 时返回 True，此时不再拆分到多个进程"""
+        return False
+
+    def estimate_memory(self, model_size: str) -> int:
+        """加载前估算模型的内存占用（字节），未知的模型返回 0"""
+        return self.memory_mb.get(model_size.split('-')[0].split('.')[0], 0) * 1024 * 1024
+
+class WhisperBackend(ASRBackend):
+    """openai-whisper（PyTorch），有 GPU 时使用 GPU"""
+
+    name = 'whisper'
+    memory_mb = WHISPER_MEMORY_MB
+
+    def load(self, model_size: str, threads: int = None):
+        # Whisper 和 torch 加载很慢，只在真正需要识别时才导入
+        import whisper
+        if threads:
+            import torch
+            torch.set_num_threads(threads)
+        # 设置SSL验证为False来解决证书问题
+        ssl._create_default_https_context = ssl._create_unverified_context
+        return whisper.load_model(model_size)
+
+    def transcribe(self, model, audio, options: dict) -> dict:
+        result = model.transcribe(audio, **options)
+        return normalize_result(result['segments'], result.get('language'))
+
+    def gpu_available(self) -> bool:
+        try:
+            import torch
+            return torch.cuda.is_available()
+        except Exception:
+            return False
+
+class FasterWhisperModel:
+    """faster-whisper 模型及其估算的内存占用"""
+
+    def __init__(self, model, memory_bytes: int):
+        self.model = model
+        self.memory_bytes = memory_bytes
+
+class FasterWhisperBackend(ASRBackend):
+    """faster-whisper（CTranslate2），在 CPU 上以 int8 量化权重推理"""
+
+    name = 'faster-whisper'
+    memory_mb = FASTER_WHISPER_MEMORY_MB
+
+    def load(self, model_size: str, threads: int = None):
+        try:
+            from faster_whisper import WhisperModel
+        except ImportError:
+            raise ValueError("未安装 faster-whisper，请先执行: pip install faster-whisper")
+        compute_type = os.environ.get(FASTER_WHISPER_COMPUTE_ENV, DEFAULT_COMPUTE_TYPE)
+        model = WhisperModel(model_size, device='cpu', compute_type=compute_type, cpu_threads=threads or 0)
+        return FasterWhisperModel(model, self.estimate_memory(model_size))
+
+    def transcribe(self, model, audio, options: dict) -> dict:
+        segments, info = model.model.transcribe(audio, **options)
+        # segments 是生成器，遍历时才真正解码
+        return normalize_result(
+            ({'start': s.start, 'end': s.end, 'text': s.text} for s in segments),
+            info.language
+        )
+
+BACKENDS = {
+    backend.name: backend
+    for backend in (WhisperBackend(), FasterWhisperBackend())
+}
+
+def estimate_model_memory(model) -> int:
+    """估算已加载模型占用的内存（字节）"""
+    if isinstance(model, FasterWhisperModel):
+        return model.memory_bytes
+    return model_memory_bytes(model)
+
+def default_backend() -> str:
+    """环境变量 VIDEOCUT_ASR_BACKEND 指定的默认引擎"""
+    return os.environ.get(ASR_BACKEND_ENV, '').strip() or DEFAULT_BACKEND
+
+def get_backend(name: str = None) -> ASRBackend:
+    """按名称获取识别引擎，name 为空时使用默认引擎"""
+    name = name or default_backend()
+    if name not in BACKENDS:
+        raise ValueError(f"不支持的识别引擎: {name}（可选: {', '.join(BACKENDS)}）")
+    return BACKENDS[name]
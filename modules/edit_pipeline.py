@@ -0,0 +1,270 @@
+import os
+import hashlib
+from dataclasses import dataclass, replace
+from typing import Optional, Tuple
+from utils.time_utils import time_to_seconds, seconds_to_ffmpeg_time
+from utils.ffmpeg_utils import run_ffmpeg_command
+from utils.chunked_encoder import encode_chunked
+from utils.media_probe import probe_media
+from utils.render_cache import render_cache
+from utils.cache_utils import get_cache_dir, file_identity
+from utils.provenance import record_clip, clip_ancestors, content_fingerprint
+from utils.subtitle_io import parse_subtitles, subtitles_to_string
+
+# 需要加黑边补齐的目标比例（宽, 高）
+PAD_ASPECT_RATIOS = {
+    '9:16': (9, 16),
+}
+
+@dataclass(frozen=True)
+class EditSpec:
+    """
+    一次导出所需的全部编辑操作：时间范围、裁切框、目标比例（黑边）和字幕文件。
+    编译为单个 FFmpeg 滤镜图，只解码和编码一次。
+    """
+    input_path: str
+    start: Optional[float] = None
+    end: Optional[float] = None
+    # 相对坐标 (x, y, 宽, 高)，取值 0~1
+    crop: Optional[Tuple[float, float, float, float]] = None
+    aspect_ratio: Optional[str] = None
+    subtitle_path: Optional[str] = None
+    # 字幕时间 0 对应的源视频时间（字幕由提取后的片段生成时为片段起点）
+    subtitle_offset: float = 0.0
+
+    def with_trim(self, start: float, end: float) -> 'EditSpec':
+        return replace(self, start=start, end=end)
+
+    def with_crop(self, aspect_ratio: str, crop: tuple) -> 'EditSpec':
+        return replace(self, aspect_ratio=aspect_ratio, crop=tuple(crop))
+
+    def with_subtitles(self, subtitle_path: str, offset: float = 0.0) -> 'EditSpec':
+        return replace(self, subtitle_path=subtitle_path, subtitle_offset=offset)
+
+    @property
+    def trimmed(self) -> bool:
+        return self.start is not None and self.end is not None
+
+    def describe(self) -> str:
+        """供界面显示的编辑步骤摘要"""
+        lines = [f"**源视频：** {os.path.basename(self.input_path)}"]
+        if self.trimmed:
+            lines.append(f"- ⏰ 时间范围：{seconds_to_ffmpeg_time(self.start)} - {seconds_to_ffmpeg_time(self.end)}")
+        if self.crop:
+            x, y, w, h = self.crop
+            lines.append(f"- ✂️ 裁切：{self.aspect_ratio}（x={x:.2f}, y={y:.2f}, 宽={w:.2f}, 高={h:.2f}）")
+            if self.aspect_ratio in PAD_ASPECT_RATIOS:
+                lines.append(f"- ⬛ 加黑边补齐为 {self.aspect_ratio}")
+        if self.subtitle_path:
+            lines.append(f"- 📝 字幕：{os.path.basename(self.subtitle_path)}")
+        return '\n'.join(lines)
+
+    def cache_params(self) -> dict:
+        """渲染缓存参数：字幕文件以其身份参与计算，内容变化后不会命中旧结果"""
+        subtitle = list(file_identity(self.subtitle_path)) if self.subtitle_path else None
+        return {
+            'start': self.start,
+            'end': self.end,
+            'crop': list(self.crop) if self.crop else None,
+            'aspect_ratio': self.aspect_ratio,
+            'subtitle': subtitle,
+            'subtitle_offset': self.subtitle_offset,
+        }
+
+def crop_box_pixels(video_width: int, video_height: int, crop_x: float, crop_y: float,
+                    crop_width: float, crop_height: float) -> tuple:
+    """相对坐标转换为像素裁切框 (宽, 高, x, y)，并确保不超出视频边界"""
+    crop_x_pixels = int(crop_x * video_width)
+    crop_y_pixels = int(crop_y * video_height)
+    crop_w_pixels = int(crop_width * video_width)
+    crop_h_pixels = int(crop_height * video_height)
+
+    crop_x_pixels = max(0, min(crop_x_pixels, video_width - crop_w_pixels))
+    crop_y_pixels = max(0, min(crop_y_pixels, video_height - crop_h_pixels))
+    crop_w_pixels = min(crop_w_pixels, video_width - crop_x_pixels)
+    crop_h_pixels = min(crop_h_pixels, video_height - crop_y_pixels)
+    return crop_w_pixels, crop_h_pixels, crop_x_pixels, crop_y_pixels
+
+def pad_box(width: int, height: int, aspect_ratio: str):
+    """按目标比例在上下加黑边后的画面 (宽, 高, x, y)；无需加黑边时返回 None"""
+    if aspect_ratio not in PAD_ASPECT_RATIOS:
+        return None
+    ratio_w, ratio_h = PAD_ASPECT_RATIOS[aspect_ratio]
+    target_height = int(width * ratio_h / ratio_w)
+    if target_height <= height:
+        return None
+    return width, target_height, 0, (target_height - height) // 2
+
+def escape_filter_path(path: str) -> str:
+    """转义滤镜参数中的文件路径"""
+    return path.replace('\\', '/').replace(':', '\\:').replace("'", "\\'")
+
+def build_video_filter(spec: EditSpec, width: int, height: int) -> str:
+    """把裁切、黑边和字幕编译为一条滤镜链，无需处理时返回 None"""
+    filters = []
+    if spec.crop:
+        crop_w, crop_h, crop_x, crop_y = crop_box_pixels(width, height, *spec.crop)
+        filters.append(f'crop={crop_w}:{crop_h}:{crop_x}:{crop_y}')
+        width, height = crop_w, crop_h
+
+    pad = pad_box(width, height, spec.aspect_ratio)
+    if pad:
+        filters.append('pad={}:{}:{}:{}:black'.format(*pad))
+
+    if spec.subtitle_path:
+        # 把时间戳平移到字幕的时间轴上，渲染后再归零
+        shift = (spec.start or 0.0) - spec.subtitle_offset
+        subtitle_filter = f"subtitles='{escape_filter_path(spec.subtitle_path)}'"
+        if abs(shift) > 1e-6:
+            filters.append(f'setpts=PTS+{shift:.6f}/TB')
+            filters.append(subtitle_filter)
+            filters.append('setpts=PTS-STARTPTS')
+        else:
+            filters.append(subtitle_filter)
+
+    return ','.join(filters) or None
+
+def build_trimmed_command(spec: EditSpec, video_filter: str, output_path: str) -> list:
+    """带时间范围的单次解码/编码命令"""
+    cmd = [
+        'ffmpeg', '-ss', seconds_to_ffmpeg_time(spec.start),
+        '-i', spec.input_path,
+        '-t', str(spec.end - spec.start),
+    ]
+    if video_filter:
+        cmd += ['-vf', video_filter]
+    cmd += [
+        '-c:v', 'libx264',
+        '-c:a', 'aac',
+        '-preset', 'ultrafast',
+        '-crf', '23',
+        '-avoid_negative_ts', 'make_zero',
+        '-y', output_path
+    ]
+    return cmd
+
+def render_edit_spec(spec: EditSpec) -> str:
+    """渲染编辑规格，返回渲染缓存中的输出路径；失败时抛出 ValueError"""
+    if not spec.input_path or not os.path.exists(spec.input_path):
+        raise ValueError("请先选择视频文件")
+    if spec.trimmed and spec.end <= spec.start:
+        raise ValueError("结束时间必须大于开始时间")
+
+    media_info = probe_media(spec.input_path)
+    video_filter = build_video_filter(spec, media_info.width, media_info.height)
+
+    def render(output_path):
+        if spec.trimmed:
+            return run_ffmpeg_command(build_trimmed_command(spec, video_filter, output_path), "合并导出命令")
+        # 整段处理时使用分段并行编码
+        return encode_chunked(spec.input_path, output_path, video_filter, "合并导出命令")
+
+    output_path = render_cache.render(spec.input_path, 'edit', spec.cache_params(), '.mp4', render)
+    if not output_path:
+        raise ValueError("输出文件未生成")
+    # 裁切和字幕不改变音频，记录时间范围即可复用源视频的识别结果
+    if spec.trimmed:
+        record_clip(output_path, spec.input_path, spec.start, spec.end)
+    else:
+        record_clip(output_path, spec.input_path)
+    return output_path
+
+def export_edit(spec: EditSpec):
+    """执行合并导出，返回输出路径和错误信息"""
+    try:
+        if spec is None:
+            raise ValueError("请先在各标签页中添加编辑步骤")
+        output_path = render_edit_spec(spec)
+        print(f"合并导出成功: {output_path}")
+        return output_path, ""
+    except Exception as e:
+        error_msg = f"合并导出时出错: {str(e)}"
+        print(error_msg)
+        return None, error_msg
+
+def save_subtitle_text(srt_content: str) -> str:
+    """
+    把字幕内容按内容哈希保存为文件，供滤镜读取。
+    内容先解析再重新写成标准 SRT，界面中手动编辑或粘贴的 WebVTT/ASS 字幕也能使用。
+    """
+    cues = parse_subtitles(srt_content)
+    if not cues:
+        raise ValueError("字幕内容中没有可识别的字幕条目")
+    srt_content = subtitles_to_string(cues, 'srt')
+    digest = hashlib.sha1(srt_content.encode('utf-8')).hexdigest()
+    path = os.path.join(get_cache_dir('edit_subtitles'), f"{digest}.srt")
+    if not os.path.exists(path):
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(srt_content)
+    return path
+
+def add_trim(spec: EditSpec, video_path: str, start_str: str, end_str: str):
+    """把时间范围加入编辑规格，返回新的规格和摘要"""
+    if not video_path or not os.path.exists(video_path):
+        return spec, "❌ 请先上传视频文件"
+    try:
+        start = time_to_seconds(start_str)
+        end = time_to_seconds(end_str)
+    except ValueError as e:
+        return spec, f"❌ {e}"
+    if end <= start:
+        return spec, "❌ 结束时间必须大于开始时间"
+    # 换了源视频时重新开始
+    if spec is None or spec.input_path != video_path:
+        spec = EditSpec(video_path)
+    spec = spec.with_trim(start, end)
+    return spec, spec.describe()
+
+def clip_offset(video_path: str, input_path: str):
+    """
+    video_path 的时间 0 在编辑源视频中的位置（秒），由来源记录确定：
+    内容相同（包括改名的副本）为 0，由源视频派生的片段为其在源视频中的起点；
+    两者没有派生关系时返回 None。
+    """
+    if os.path.abspath(video_path) == os.path.abspath(input_path):
+        return 0.0
+    try:
+        source = content_fingerprint(input_path)
+        if content_fingerprint(video_path) == source:
+            return 0.0
+        for fingerprint, start, _ in clip_ancestors(video_path):
+            if fingerprint == source:
+                return start
+    except OSError as e:
+        print(f"读取来源记录失败: {e}")
+    return None
+
+def subtitle_offset(subtitle_video: str, input_path: str) -> float:
+    """字幕所在视频的时间 0 在编辑源视频中的位置（秒），没有派生关系时抛出 ValueError"""
+    offset = clip_offset(subtitle_video, input_path)
+    if offset is None:
+        raise ValueError("字幕所在的视频不是当前编辑的源视频，也不是从它提取的片段，无法确定字幕时间")
+    return offset
+
+def add_crop(spec: EditSpec, video_path: str, aspect_ratio: str, crop: tuple):
+    """把裁切框（相对坐标）加入编辑规格；裁切框必须来自源视频或从它提取的片段"""
+    if not video_path or not os.path.exists(video_path):
+        return spec, "❌ 请先选择视频文件"
+    if spec is None:
+        spec = EditSpec(video_path)
+    elif clip_offset(video_path, spec.input_path) is None:
+        return spec, "❌ 裁切框所在的视频不是当前编辑的源视频，也不是从它提取的片段"
+    spec = spec.with_crop(aspect_ratio, crop)
+    return spec, spec.describe()
+
+def add_subtitles(spec: EditSpec, video_path: str, srt_content: str):
+    """把已生成的字幕加入编辑规格"""
+    if not srt_content:
+        return spec, "❌ 请先生成字幕"
+    if spec is None:
+        if not video_path or not os.path.exists(video_path):
+            return spec, "❌ 请先选择视频文件"
+        spec = EditSpec(video_path)
+    try:
+        # 字幕由源视频（或其副本）生成时与源时间轴一致，由提取的片段生成时从片段起点开始
+        offset = subtitle_offset(video_path, spec.input_path)
+        subtitle_path = save_subtitle_text(srt_content)
+    except ValueError as e:
+        return spec, f"❌ {e}"
+    spec = spec.with_subtitles(subtitle_path, offset)
+    return spec, spec.describe()
@@ -1,91 +1,179 @@
 import os
 import tempfile
-import subprocess
-import whisper
-import ssl
-from utils.time_utils import seconds_to_ass_time
+from utils.time_utils import seconds_to_srt_time
+from utils.subtitle_io import Cue, write_ass, write_subtitles, load_subtitles, subtitles_to_string
+from utils.chunked_encoder import encode_chunked
+from utils.cache_utils import file_identity
+from utils.render_cache import render_cache
 from utils.ffmpeg_utils import run_ffmpeg_command
+from utils.media_probe import probe_media
+from utils.media_index import get_media_index
+from utils.smart_render import (
+    SMART_CUT_CODECS, SMART_RENDER_VERSION, MP4_AUDIO_CODECS, plan_partial_render, render_smart_cut
+)
+from utils.job_scheduler import report_progress
+from modules.transcription import whisper_models, model_key, transcribe, transcribe_file, vad_enabled
+from modules.asr_backends import get_backend
+from modules.translation import translate_texts, model_overrides
+from modules.edit_pipeline import escape_filter_path
+
+# 字幕嵌入方式：soft 作为字幕轨道封装（流复制，不重编码），burn 烧录到画面（完整重编码）
+SUBTITLE_MODES = {
+    '软字幕轨道（不重编码，秒级完成）': 'soft',
+    '烧录到画面（需重新编码）': 'burn',
+}
+DEFAULT_SUBTITLE_MODE = 'soft'
+
+# 各容器使用的字幕轨道编码，其他容器按 MP4 处理
+SUBTITLE_TRACK_CODECS = {
+    '.mkv': 'ass',
+    '.mp4': 'mov_text',
+    '.mov': 'mov_text',
+    '.m4v': 'mov_text',
+}
+
+# 烧录字幕时需要重编码的帧超过该比例，就不再分段而是整段编码
+PARTIAL_BURN_MAX_RATIO = 0.8
+
+def burn_subtitles_partial(video_path: str, subtitle_filter: str, intervals: list, output_path: str) -> bool:
+    """
+    局部重编码烧录字幕：只重编码与字幕显示区间重叠的 GOP，其余 GOP 直接流复制后无缝拼接。
+    编码不支持、没有关键帧索引或字幕覆盖了大部分画面时返回 False，由调用方整段编码。
+    """
+    media_info = probe_media(video_path)
+    if media_info.codec not in SMART_CUT_CODECS:
+        print(f"视频编码 {media_info.codec} 不支持局部重编码，整段烧录字幕")
+        return False
+
+    index = get_media_index(video_path)
+    if index is None or not index.keyframe_times:
+        return False
+
+    frame_duration = 1.0 / media_info.fps if media_info.fps else 0.0
+    duration = max(media_info.duration, index.frame_times[-1] + frame_duration)
+    pieces = plan_partial_render(index.frame_times, index.keyframe_times, intervals, duration)
+    total = sum(piece['frames'] for piece in pieces)
+    encoded = sum(piece['frames'] for piece in pieces if piece['mode'] == 'encode')
+    if not total or encoded / total > PARTIAL_BURN_MAX_RATIO:
+        print(f"字幕覆盖 {encoded}/{total} 帧，整段烧录字幕")
+        return False
+
+    for piece in pieces:
+        if piece['mode'] == 'encode':
+            piece['filter'] = subtitle_filter
+    print(f"局部烧录字幕: 重编码 {encoded}/{total} 帧（{encoded / total:.0%}），共 {len(pieces)} 段")
+    # 画面只局部重编码，音频整段不变，能放进 MP4 时直接流复制
+    copy_audio = media_info.audio is None or media_info.audio.codec_name in MP4_AUDIO_CODECS
+    return render_smart_cut(video_path, pieces, output_path, 0.0, duration, media_info.video, copy_audio)
+
+def subtitle_cues(subtitles):
+    """把字幕条目转换为 Cue，双语字幕合并为原文、译文两行"""
+    for subtitle in subtitles:
+        text = f"{subtitle['en']}\n{subtitle['zh']}" if subtitle.get('zh') else subtitle['en']
+        yield Cue(subtitle['start'], subtitle['end'], text)
+
+def imported_subtitles(subtitle_path):
+    """读取外部字幕文件（SRT、WebVTT 或 ASS），转换为与识别结果相同的字幕条目，文本原样保留"""
+    return [{'start': cue.start, 'end': cue.end, 'en': cue.text} for cue in load_subtitles(subtitle_path)]
+
+def subtitle_mode_value(mode) -> str:
+    """把界面选项或命令行参数规范为 soft / burn"""
+    mode = SUBTITLE_MODES.get(mode, mode) or DEFAULT_SUBTITLE_MODE
+    if mode not in SUBTITLE_MODES.values():
+        raise ValueError(f"不支持的字幕嵌入方式: {mode}")
+    return mode
+
+def muxed_extension(video_path: str) -> str:
+    """软字幕输出的容器：MKV 保持 MKV（ASS 轨道），其余封装为 MP4（mov_text 轨道）"""
+    ext = os.path.splitext(video_path)[1].lower()
+    return ext if ext in SUBTITLE_TRACK_CODECS else '.mp4'
 
 class SubtitleGenerator:
-    def __init__(self):
+    def __init__(self, model_size="base", backend=None):
+        self.model_size = model_size
+        # 识别引擎：whisper 或 faster-whisper（CPU int8），为空时使用默认引擎
+        self.backend = get_backend(backend).name
         self.model = None
         # self.translator = Translator()  # 暂时注释掉翻译功能
     
-    def load_model(self, model_size="base"):
-        """加载Whisper模型"""
+    def load_model(self, model_size=None):
+        """加载Whisper模型（从共享注册表获取，已加载的模型不会重复加载）"""
         try:
-            if self.model is None:
-                print(f"正在加载Whisper模型: {model_size}")
-                # 设置SSL验证为False来解决证书问题
-                ssl._create_default_https_context = ssl._create_unverified_context
-                self.model = whisper.load_model(model_size)
-                print("Whisper模型加载完成")
+            if model_size:
+                self.model_size = model_size
+            self.model = whisper_models.get(model_key(self.model_size, self.backend))
             return True
         except Exception as e:
             print(f"加载Whisper模型失败: {e}")
             return False
     
     def extract_audio(self, video_path):
-        """从视频中提取音频"""
+        """从视频中解码音频，直接得到 16kHz 单声道 float32 数组（不生成 WAV 文件）"""
         try:
-            audio_path = video_path.replace('.mp4', '_audio.wav')
-            cmd = [
-                'ffmpeg', '-i', video_path,
-                '-vn',  # 不包含视频
-                '-acodec', 'pcm_s16le',  # 音频编码
-                '-ar', '16000',  # 采样率
-                '-ac', '1',  # 单声道
-                '-y', audio_path
-            ]
-            
-            result = subprocess.run(cmd, capture_output=True, text=True)
-            if result.returncode == 0:
-                return audio_path
-            else:
-                raise Exception(f"音频提取失败: {result.stderr}")
+            from utils.audio_utils import decode_audio, WHISPER_SAMPLE_RATE
+            audio = decode_audio(video_path)
+            print(f"音频解码完成: {len(audio) / WHISPER_SAMPLE_RATE:.1f} 秒")
+            return audio
         except Exception as e:
             print(f"音频提取错误: {e}")
             return None
     
-    def transcribe_audio(self, audio_path):
-        """使用Whisper进行语音识别"""
+    def transcribe_audio(self, audio, video_path=None, on_progress=None):
+        """
+        使用Whisper进行语音识别，audio 为音频数组（也可以是音频文件路径）。
+        提供 video_path 时，从已识别视频中提取的片段会复用父视频的识别结果；
+        提供 on_progress(已识别的句子, 百分比) 时每识别完一段就回调一次。
+        """
         try:
-            if not self.load_model():
-                return None
-            
-            print("开始语音识别...")
-            result = self.model.transcribe(audio_path)
+            print(f"开始语音识别（引擎: {self.backend}，模型: {self.model_size}）...")
+            # 长音频在静音处切分后并行识别
+            if isinstance(audio, str):
+                key = model_key(self.model_size, self.backend)
+                with whisper_models.use(key) as model:
+                    result = get_backend(self.backend).transcribe(model, audio, {})
+            elif video_path:
+                result = transcribe_file(video_path, audio, self.model_size, on_progress=on_progress,
+                                         backend=self.backend)
+            else:
+                result = transcribe(audio, self.model_size, on_progress=on_progress, backend=self.backend)
             print("语音识别完成")
             return result
         except Exception as e:
             print(f"语音识别错误: {e}")
             return None
     
-    def translate_text(self, text, target_lang='zh'):
+    def translate_text(self, text, target_lang='zh', source_lang='en'):
         """翻译文本"""
+        return self.translate_texts([text], target_lang, source_lang)[0]
+    
+    def translate_texts(self, texts, target_lang='zh', source_lang='en'):
+        """使用本地翻译模型批量翻译，翻译失败时返回原文"""
         try:
-            if not text or text.strip() == "":
-                return ""
-            
-            # 暂时返回原文，后续可以集成其他翻译服务
-            # translation = self.translator.translate(text, dest=target_lang)
-            # return translation.text
-            return f"[中文翻译] {text}"  # 临时占位符
+            return translate_texts(texts, source_lang or 'en', target_lang)
         except Exception as e:
             print(f"翻译错误: {e}")
-            return text  # 翻译失败时返回原文
+            return list(texts)  # 翻译失败时返回原文
     
-    def format_subtitles(self, segments, translate=True):
-        """格式化字幕"""
+    def format_subtitles(self, segments, translate=True, source_lang='en', target_lang='zh'):
+        """
+        格式化字幕，需要翻译时所有句子一次批量翻译。
+        识别出的语言就是目标语言，或译文与原文相同（如翻译失败）时不再重复显示一行。
+        """
+        translate = translate and (source_lang or 'en') != target_lang
+        translations = []
+        if translate:
+            translations = self.translate_texts([segment['text'].strip() for segment in segments],
+                                                target_lang, source_lang)
+        
         subtitles = []
-        for segment in segments:
+        for i, segment in enumerate(segments):
             start_time = segment['start']
             end_time = segment['end']
             text = segment['text'].strip()
             
             # 格式化时间
-            start_str = f"{int(start_time//60):02d}:{start_time%60:05.2f}"
-            end_str = f"{int(end_time//60):02d}:{end_time%60:05.2f}"
+            start_str = seconds_to_srt_time(start_time)
+            end_str = seconds_to_srt_time(end_time)
             
             subtitle_entry = {
                 'start': start_time,
@@ -95,8 +183,8 @@ class SubtitleGenerator:
                 'en': text
             }
             
-            if translate:
-                subtitle_entry['zh'] = self.translate_text(text)
+            if translate and translations[i] and translations[i] != text:
+                subtitle_entry['zh'] = translations[i]
             
             subtitles.append(subtitle_entry)
         
@@ -104,77 +192,30 @@ class SubtitleGenerator:
     
     def generate_srt(self, subtitles):
         """生成SRT格式字幕"""
-        srt_content = ""
-        for i, subtitle in enumerate(subtitles, 1):
-            srt_content += f"{i}\n"
-            srt_content += f"{subtitle['start_str']} --> {subtitle['end_str']}\n"
-            srt_content += f"{subtitle['en']}\n"
-            if 'zh' in subtitle:
-                srt_content += f"{subtitle['zh']}\n"
-            srt_content += "\n"
-        
-        return srt_content
-    
-    def generate_ass_subtitles(self, subtitles):
-        """生成ASS格式字幕文件，支持样式设置"""
-        ass_content = """[Script Info]
-Title: Generated Subtitles
-ScriptType: v4.00+
-WrapStyle: 1
-ScaledBorderAndShadow: yes
-YCbCr Matrix: TV.601
-
-[V4+ Styles]
-Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, Alignment, MarginL, MarginR, MarginV, Encoding
-Style: Default,Arial,24,&H00FFFFFF,&H000000FF,&H00000000,&H00000000,0,0,0,0,100,100,0,0,1,2,2,2,10,10,10,1
-
-[Events]
-Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
-"""
-        
-        for subtitle in subtitles:
-            start_time = seconds_to_ass_time(subtitle['start'])
-            end_time = seconds_to_ass_time(subtitle['end'])
-            
-            # 英文字幕
-            en_text = subtitle['en'].replace('\n', '\\N')
-            ass_content += f"Dialogue: 0,{start_time},{end_time},Default,,0,0,0,,{en_text}\n"
-            
-            # 中文字幕
-            if 'zh' in subtitle:
-                zh_text = subtitle['zh'].replace('\n', '\\N')
-                ass_content += f"Dialogue: 0,{start_time},{end_time},Default,,0,0,0,,{zh_text}\n"
-        
-        return ass_content
+        return subtitles_to_string(subtitle_cues(subtitles), 'srt')
     
     def embed_subtitles_to_video(self, video_path, subtitles, output_path=None):
         """将字幕嵌入到视频中"""
         try:
             if output_path is None:
-                output_path = video_path.replace('.mp4', '_with_subtitles.mp4')
-            
-            # 生成ASS字幕文件
-            ass_content = self.generate_ass_subtitles(subtitles)
-            ass_path = video_path.replace('.mp4', '_subtitles.ass')
+                output_path = os.path.splitext(video_path)[0] + '_with_subtitles.mp4'
             
-            with open(ass_path, 'w', encoding='utf-8') as f:
-                f.write(ass_content)
+            # 生成临时ASS字幕文件（不放在源视频旁边，避免与源文件重名）
+            ass_fd, ass_path = tempfile.mkstemp(suffix='.ass')
+            with os.fdopen(ass_fd, 'w', encoding='utf-8') as f:
+                write_ass(subtitle_cues(subtitles), f)
             
-            # 使用FFmpeg将字幕嵌入视频
-            cmd = [
-                'ffmpeg', '-i', video_path,
-                '-vf', f'ass={ass_path}',
-                '-c:v', 'libx264',
-                '-c:a', 'aac',
-                '-preset', 'ultrafast',
-                '-crf', '23',
-                '-y', output_path
-            ]
-            
-            success = run_ffmpeg_command(cmd, "字幕嵌入命令")
-            
-            # 清理临时ASS文件
-            if os.path.exists(ass_path):
+            try:
+                # 使用FFmpeg将字幕嵌入视频
+                # 优先只重编码显示字幕的 GOP；不适用时整段编码，
+                # 长视频在关键帧处分段并行编码，各段保持原始时间轴以对齐字幕
+                subtitle_filter = f"ass='{escape_filter_path(ass_path)}'"
+                intervals = [(subtitle['start'], subtitle['end']) for subtitle in subtitles]
+                success = burn_subtitles_partial(video_path, subtitle_filter, intervals, output_path)
+                if not success:
+                    success = encode_chunked(video_path, output_path, subtitle_filter, "字幕嵌入命令")
+            finally:
+                # 清理临时ASS文件
                 os.remove(ass_path)
             
             if success:
@@ -188,65 +229,153 @@ Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
             print(f"字幕嵌入错误: {e}")
             return None
 
-def generate_subtitles(video_path, model_size="base", translate=True, embed_subtitles=False):
-    """生成视频字幕的主函数"""
+    def mux_subtitles_to_video(self, video_path, subtitles, output_path):
+        """
+        把字幕作为字幕轨道封装进视频（MP4 为 mov_text，MKV 为 ASS），音视频流直接复制不重新编码。
+        双语字幕合并为一条两行的字幕，避免播放器同时显示两条重叠的字幕。
+        """
+        try:
+            ass_fd, ass_path = tempfile.mkstemp(suffix='.ass')
+            with os.fdopen(ass_fd, 'w', encoding='utf-8') as f:
+                write_ass(subtitle_cues(subtitles), f)
+            
+            codec = SUBTITLE_TRACK_CODECS.get(os.path.splitext(output_path)[1].lower(), 'mov_text')
+            cmd = [
+                'ffmpeg', '-i', video_path,
+                '-i', ass_path,
+                # 只保留原视频的音视频流，替换掉已有的字幕轨道
+                '-map', '0:v', '-map', '0:a?', '-map', '1:0',
+                '-c', 'copy',
+                '-c:s', codec,
+                '-disposition:s:0', 'default',
+                '-metadata:s:s:0', 'title=字幕',
+                '-y', output_path
+            ]
+            try:
+                success = run_ffmpeg_command(cmd, "字幕轨道封装命令")
+            finally:
+                os.remove(ass_path)
+            
+            if success:
+                print(f"字幕轨道封装成功: {output_path}")
+                return output_path
+            print("字幕轨道封装失败")
+            return None
+        except Exception as e:
+            print(f"字幕轨道封装错误: {e}")
+            return None
+
+def generate_subtitles(video_path, model_size="base", translate=True, embed_subtitles=False, backend=None,
+                       subtitle_mode=DEFAULT_SUBTITLE_MODE, subtitle_file=None):
+    """
+    生成视频字幕的主函数，返回字幕内容、状态信息和文件路径；backend 为识别引擎。
+    embed_subtitles 时按 subtitle_mode 嵌入：soft 封装为字幕轨道（流复制），burn 烧录到画面。
+    提供 subtitle_file（SRT、WebVTT 或 ASS）时直接使用该字幕，不做语音识别和翻译。
+    """
     try:
         if not video_path or not os.path.exists(video_path):
-            return None, "视频文件不存在"
+            return "", "视频文件不存在", None
+        subtitle_mode = subtitle_mode_value(subtitle_mode)
         
         print(f"开始为视频生成字幕: {video_path}")
         
         # 初始化字幕生成器
-        generator = SubtitleGenerator()
+        generator = SubtitleGenerator(model_size, backend)
+        state = {}
+        if subtitle_file:
+            print(f"导入字幕文件: {subtitle_file}")
+            state['subtitles'] = imported_subtitles(subtitle_file)
+            if not state['subtitles']:
+                return "", "字幕文件中没有可用的字幕", None
         
-        # 提取音频
-        print("正在提取音频...")
-        audio_path = generator.extract_audio(video_path)
-        if not audio_path:
-            return None, "音频提取失败"
+        def get_subtitles():
+            """只在缓存未命中时才进行语音识别，且同一次调用最多识别一次"""
+            if 'subtitles' not in state:
+                # 提取音频
+                print("正在提取音频...")
+                report_progress("正在提取音频")
+                audio = generator.extract_audio(video_path)
+                if audio is None:
+                    raise ValueError("音频提取失败")
+                
+                def show_partial(segments, percent):
+                    # 边识别边在界面上显示已完成部分的字幕（不含翻译）
+                    preview = generator.generate_srt(generator.format_subtitles(segments, translate=False))
+                    report_progress("语音识别", percent, preview=preview)
+                
+                # 语音识别
+                report_progress("正在加载模型并识别语音")
+                result = generator.transcribe_audio(audio, video_path, show_partial)
+                if not result:
+                    raise ValueError("语音识别失败")
+                
+                if 'vad_skip_ratio' in result:
+                    state['skip_ratio'] = result['vad_skip_ratio']
+                
+                # 格式化字幕
+                print("正在格式化字幕...")
+                report_progress("正在格式化字幕", 100)
+                state['subtitles'] = generator.format_subtitles(result['segments'], translate, result.get('language'))
+            return state['subtitles']
         
-        # 语音识别
-        result = generator.transcribe_audio(audio_path)
-        if not result:
-            return None, "语音识别失败"
+        def render_srt(out_path):
+            write_subtitles(subtitle_cues(get_subtitles()), out_path, 'srt')
+            return True
         
-        # 格式化字幕
-        print("正在格式化字幕...")
-        subtitles = generator.format_subtitles(result['segments'], translate)
+        # 字幕文件和嵌入字幕的视频都经过渲染缓存
+        # format 区分早期按 MM:SS.ss 写出的缓存，避免继续返回无效的 SRT
+        params = {'model_size': model_size, 'backend': generator.backend, 'translate': bool(translate), 'vad': vad_enabled(),
+                  'format': 'srt'}
+        if translate:
+            # 换用其他翻译模型后重新生成字幕
+            params['translation_models'] = sorted(model_overrides().items())
+        if subtitle_file:
+            # 导入的字幕与识别参数无关，按字幕文件本身区分缓存
+            params = {'subtitle_file': list(file_identity(subtitle_file)), 'format': 'srt'}
+        cached_srt = render_cache.render(video_path, 'subtitle_srt', params, '.srt', render_srt)
+        if not cached_srt:
+            return "", "字幕生成失败", None
         
-        # 生成SRT内容用于显示
-        srt_content = generator.generate_srt(subtitles)
+        with open(cached_srt, 'r', encoding='utf-8') as f:
+            srt_content = f.read()
+        subtitle_count = srt_content.count(' --> ')
+        # 本次实际做了语音识别时，在状态中显示跳过的非语音比例
+        vad_note = f"（跳过非语音 {state['skip_ratio']:.0%}）" if 'skip_ratio' in state else ""
         
         # 如果需要嵌入字幕到视频中
         if embed_subtitles:
             print("正在将字幕嵌入到视频中...")
-            output_video_path = generator.embed_subtitles_to_video(video_path, subtitles)
-            if output_video_path:
-                # 清理临时音频文件
-                if os.path.exists(audio_path):
-                    os.remove(audio_path)
+            report_progress("正在将字幕嵌入到视频中", preview=srt_content)
+            
+            if subtitle_mode == 'soft':
+                suffix = muxed_extension(video_path)
                 
+                def render_embedded(out_path):
+                    return generator.mux_subtitles_to_video(video_path, get_subtitles(), out_path) is not None
+                
+                cached_video = render_cache.render(video_path, 'subtitle_mux', params, suffix, render_embedded)
+            else:
+                suffix = '.mp4'
+                
+                def render_embedded(out_path):
+                    return generator.embed_subtitles_to_video(video_path, get_subtitles(), out_path) is not None
+                
+                cached_video = render_cache.render(video_path, 'subtitle_embed',
+                                                   dict(params, smart_render=SMART_RENDER_VERSION), suffix, render_embedded)
+            if cached_video:
+                output_video_path = render_cache.export(cached_video, os.path.splitext(video_path)[0] + '_with_subtitles' + suffix)
                 print(f"字幕嵌入完成: {output_video_path}")
-                return srt_content, f"字幕生成并嵌入成功！共生成 {len(subtitles)} 条字幕。输出视频：{os.path.basename(output_video_path)}", output_video_path
+                return srt_content, f"字幕生成并嵌入成功！共生成 {subtitle_count} 条字幕{vad_note}。输出视频：{os.path.basename(output_video_path)}", output_video_path
             else:
-                # 清理临时音频文件
-                if os.path.exists(audio_path):
-                    os.remove(audio_path)
-                return srt_content, f"字幕生成成功，但嵌入失败！共生成 {len(subtitles)} 条字幕", None
-        
-        # 保存SRT文件
-        srt_path = video_path.replace('.mp4', '_subtitles.srt')
-        with open(srt_path, 'w', encoding='utf-8') as f:
-            f.write(srt_content)
+                return srt_content, f"字幕生成成功，但嵌入失败！共生成 {subtitle_count} 条字幕{vad_note}", None
         
-        # 清理临时音频文件
-        if os.path.exists(audio_path):
-            os.remove(audio_path)
+        # 以原来的文件名导出SRT文件
+        srt_path = render_cache.export(cached_srt, os.path.splitext(video_path)[0] + '_subtitles.srt')
         
         print(f"字幕生成完成: {srt_path}")
-        return srt_content, f"字幕生成成功！共生成 {len(subtitles)} 条字幕。文件：{os.path.basename(srt_path)}", srt_path
+        return srt_content, f"字幕生成成功！共生成 {subtitle_count} 条字幕{vad_note}。文件：{os.path.basename(srt_path)}", srt_path
         
     except Exception as e:
         error_msg = f"字幕生成失败: {str(e)}"
         print(error_msg)
-        return "", error_msg, None 
\ No newline at end of file
+        return "", error_msg, None
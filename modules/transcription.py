@@ -0,0 +1,453 @@
+import os
+import re
+import time
+import threading
+import contextlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from utils.model_registry import ModelRegistry
+from utils.audio_utils import WHISPER_SAMPLE_RATE
+from utils.transcript_cache import transcript_cache, audio_fingerprint
+from utils.provenance import clip_ancestors, record_audio_fingerprint, lookup_audio_fingerprint
+from utils.job_scheduler import check_cancelled, report_progress, JobCancelled
+from modules.asr_backends import get_backend, estimate_model_memory
+
+# Whisper 模型内存预算（MB）和启动时预加载的模型，可通过环境变量调整
+WHISPER_MEMORY_BUDGET_ENV = 'VIDEOCUT_WHISPER_MEMORY_MB'
+DEFAULT_WHISPER_MEMORY_MB = 6 * 1024
+WHISPER_PRELOAD_ENV = 'VIDEOCUT_WHISPER_PRELOAD'
+
+# 并行识别的进程数和分段长度（秒），可通过环境变量调整
+TRANSCRIBE_WORKERS_ENV = 'VIDEOCUT_TRANSCRIBE_WORKERS'
+TRANSCRIBE_CHUNK_ENV = 'VIDEOCUT_TRANSCRIBE_CHUNK_SECONDS'
+DEFAULT_CHUNK_SECONDS = 180.0
+# 边识别边显示时第一段的长度（秒）：第一段很短，第一批字幕几秒内就能出现，其余分段长度不变
+STREAM_FIRST_CHUNK_ENV = 'VIDEOCUT_STREAM_FIRST_CHUNK_SECONDS'
+DEFAULT_STREAM_FIRST_CHUNK_SECONDS = 20.0
+# 边识别边显示时的分段上限（秒），未设置时与识别分段相同：
+# 缩短分段能让预览更新得更频繁，但会损失 Whisper 跨分段的上下文
+STREAM_CHUNK_ENV = 'VIDEOCUT_STREAM_CHUNK_SECONDS'
+
+# 并行识别进程池空闲多久（秒）后关闭，释放各进程中的模型；设为 0 时不自动关闭
+POOL_IDLE_ENV = 'VIDEOCUT_TRANSCRIBE_POOL_IDLE_SECONDS'
+DEFAULT_POOL_IDLE_SECONDS = 300.0
+
+# 设置为 0 时关闭识别前的语音检测
+VAD_ENV = 'VIDEOCUT_VAD'
+
+# 片段边缘未被父视频识别结果覆盖的区域短于该值（秒）时不再单独识别
+MIN_EDGE_SECONDS = 0.3
+
+# 相邻分段边界处文字相同、间隔小于该值（秒）时视为重复
+DUPLICATE_GAP = 1.0
+
+def model_key(model_size: str, backend: str = None) -> tuple:
+    """模型注册表的键：(识别引擎, 模型大小)"""
+    return (get_backend(backend).name, model_size)
+
+def load_asr_model(key: tuple):
+    """从磁盘加载 (识别引擎, 模型大小) 对应的模型"""
+    backend, model_size = key
+    return get_backend(backend).load(model_size)
+
+# 进程内共享的识别模型，每个 (引擎, 模型大小) 只加载一次
+whisper_models = ModelRegistry(
+    load_asr_model,
+    int(float(os.environ.get(WHISPER_MEMORY_BUDGET_ENV, DEFAULT_WHISPER_MEMORY_MB)) * 1024 * 1024),
+    estimate=estimate_model_memory,
+    name="Whisper模型"
+)
+
+def preload_whisper_from_env():
+    """按环境变量 VIDEOCUT_WHISPER_PRELOAD 在后台预加载默认引擎的模型，未设置时不做任何事"""
+    model_size = os.environ.get(WHISPER_PRELOAD_ENV, '').strip()
+    if model_size:
+        return whisper_models.preload(model_key(model_size))
+    return None
+
+def default_workers() -> int:
+    """并行识别的进程数：默认每 4 个核心一个进程，最多 8 个"""
+    if os.environ.get(TRANSCRIBE_WORKERS_ENV):
+        return max(1, int(os.environ[TRANSCRIBE_WORKERS_ENV]))
+    return max(1, min(8, (os.cpu_count() or 1) // 4))
+
+# --- 工作进程 ---
+_worker_backend = None
+_worker_model = None
+
+def _init_worker(key: tuple, threads: int):
+    """工作进程初始化：限制推理线程数并加载一次模型"""
+    global _worker_backend, _worker_model
+    backend, model_size = key
+    _worker_backend = get_backend(backend)
+    _worker_model = _worker_backend.load(model_size, threads)
+
+def _transcribe_chunk(audio, options: dict) -> dict:
+    """在工作进程中识别一个分段，只返回合并需要的字段"""
+    result = _worker_backend.transcribe(_worker_model, audio, options)
+    return {'language': result['language'], 'segments': result['segments']}
+
+# --- 进程池 ---
+# 每个 (引擎, 模型大小) 一个进程池：{key: {'pool', 'workers', 'reserved', 'users', 'last_used'}}
+# 工作进程中的模型计入 whisper_models 的内存预算；正在使用的进程池不会被其他任务关闭
+_pools = {}
+_pool_lock = threading.Lock()
+_idle_timer = None
+
+def _shutdown_pool_entry(key: tuple):
+    """关闭进程池并归还预留的模型内存（调用方持有 _pool_lock）"""
+    entry = _pools.pop(key)
+    entry['pool'].shutdown(wait=False, cancel_futures=True)
+    whisper_models.release(('pool', key))
+    print(f"已关闭并行识别进程池: {key}")
+
+def budget_workers(key: tuple, workers: int) -> int:
+    """按模型内存预算限制进程数：每个工作进程各自加载一份模型，与其他正在使用的进程池共用预算"""
+    per_worker = get_backend(key[0]).estimate_memory(key[1])
+    if not per_worker:
+        return workers
+    with _pool_lock:
+        busy = sum(entry['reserved'] for other, entry in _pools.items() if other != key and entry['users'])
+    return max(1, min(workers, (whisper_models.budget_bytes - busy) // per_worker))
+
+def _acquire_pool(key: tuple, workers: int) -> ProcessPoolExecutor:
+    """获取（必要时创建）加载了指定模型的进程池并登记一个使用者；进程常驻，模型只在每个进程中加载一次"""
+    with _pool_lock:
+        entry = _pools.get(key)
+        if entry is not None and not entry['users'] and entry['workers'] != workers:
+            _shutdown_pool_entry(key)
+            entry = None
+        if entry is None:
+            # 关闭其他模型的空闲进程池，把内存留给当前模型
+            for other in [k for k, e in _pools.items() if not e['users']]:
+                _shutdown_pool_entry(other)
+            threads = max(1, (os.cpu_count() or 1) // workers)
+            reserved = get_backend(key[0]).estimate_memory(key[1]) * workers
+            whisper_models.reserve(('pool', key), reserved)
+            # 使用 spawn，避免在已初始化 torch 线程的进程中 fork
+            pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(key, threads)
+            )
+            entry = {'pool': pool, 'workers': workers, 'reserved': reserved, 'users': 0, 'last_used': time.monotonic()}
+            _pools[key] = entry
+        entry['users'] += 1
+        return entry['pool']
+
+def _release_pool(key: tuple):
+    """登记的使用者结束，进程池空闲后按 VIDEOCUT_TRANSCRIBE_POOL_IDLE_SECONDS 定时关闭"""
+    global _idle_timer
+    with _pool_lock:
+        entry = _pools.get(key)
+        if entry is None:
+            return
+        entry['users'] -= 1
+        entry['last_used'] = time.monotonic()
+        idle = float(os.environ.get(POOL_IDLE_ENV, DEFAULT_POOL_IDLE_SECONDS))
+        if entry['users'] or idle <= 0:
+            return
+        if _idle_timer is not None:
+            _idle_timer.cancel()
+        _idle_timer = threading.Timer(idle, _shutdown_idle_pools, args=(idle,))
+        _idle_timer.daemon = True
+        _idle_timer.start()
+
+def _shutdown_idle_pools(idle: float):
+    """关闭空闲超过 idle 秒的进程池"""
+    with _pool_lock:
+        now = time.monotonic()
+        for key in [k for k, e in _pools.items() if not e['users'] and now - e['last_used'] >= idle]:
+            _shutdown_pool_entry(key)
+
+@contextlib.contextmanager
+def use_pool(key: tuple, workers: int):
+    """在识别任务期间使用进程池，任务结束前其他任务不会关闭它"""
+    pool = _acquire_pool(key, workers)
+    try:
+        yield pool
+    finally:
+        _release_pool(key)
+
+def shutdown_pool():
+    """关闭所有并行识别进程池"""
+    with _pool_lock:
+        for key in list(_pools):
+            _shutdown_pool_entry(key)
+
+def _normalize_text(text: str) -> str:
+    return re.sub(r'\W+', '', text.lower())
+
+def merge_chunk_segments(chunk_results: list) -> list:
+    """
+    合并各分段的识别结果：chunk_results 为 [(起始秒, 结束秒, segments), ...]。
+    时间戳加上分段偏移并限制在分段范围内，去掉边界处重复的句子和重叠部分。
+    """
+    merged = []
+    for offset, chunk_end, segments in sorted(chunk_results, key=lambda c: c[0]):
+        for segment in segments:
+            text = segment['text'].strip()
+            start = segment['start'] + offset
+            end = min(segment['end'] + offset, chunk_end)
+            if not text or end <= start:
+                continue
+
+            if merged:
+                last = merged[-1]
+                # 边界两侧重复识别出的同一句话
+                if _normalize_text(text) == _normalize_text(last['text']) and start - last['end'] < DUPLICATE_GAP:
+                    last['end'] = max(last['end'], end)
+                    continue
+                # 与上一句重叠时从上一句结束处开始
+                if start < last['end']:
+                    start = last['end']
+                    if end <= start:
+                        continue
+
+            merged.append({'start': start, 'end': end, 'text': text})
+    return merged
+
+def _report_chunks(results: list, done_chunks: int, done_samples: int, total_samples: int, chunk_count: int,
+                   on_progress):
+    """
+    报告识别进度；on_progress(已合并的句子, 百分比) 可用于提前显示已完成部分，
+    results 为从音频开头起连续完成的分段，预览中不会出现空缺。
+    """
+    percent = done_samples / max(1, total_samples) * 100
+    print(f"语音识别进度: {done_chunks}/{chunk_count} 段")
+    if on_progress:
+        on_progress(merge_chunk_segments(results), percent)
+    else:
+        report_progress("语音识别", percent)
+
+def transcribe_parallel(audio, key: tuple, chunks: list, workers: int, options: dict,
+                        on_progress=None) -> dict:
+    """在进程池中并行识别各分段并合并结果"""
+    with use_pool(key, workers) as pool:
+        futures = {
+            pool.submit(_transcribe_chunk, audio[start:end], options): (start, end)
+            for start, end in chunks
+        }
+
+        # 分段按完成顺序返回，预览只显示从开头起连续完成的部分
+        finished = {}
+        languages = {}
+        done_samples = 0
+        pending = set(futures)
+        try:
+            while pending:
+                done, pending = wait(pending, timeout=1.0, return_when=FIRST_COMPLETED)
+                check_cancelled()
+                for future in done:
+                    chunk_result = future.result()
+                    start, end = futures[future]
+                    finished[start] = (start / WHISPER_SAMPLE_RATE, end / WHISPER_SAMPLE_RATE, chunk_result['segments'])
+                    languages[start] = chunk_result['language']
+                    done_samples += end - start
+                if done:
+                    prefix = []
+                    for start, _ in chunks:
+                        if start not in finished:
+                            break
+                        prefix.append(finished[start])
+                    _report_chunks(prefix, len(finished), done_samples, len(audio), len(chunks), on_progress)
+        except JobCancelled:
+            for future in pending:
+                future.cancel()
+            raise
+
+    results = [finished[start] for start, _ in chunks]
+    # 语言取第一个识别出语言的分段，与按顺序识别时一致
+    language = next((languages[start] for start, _ in chunks if languages[start]), None)
+    segments = merge_chunk_segments(results)
+    return {
+        'text': ' '.join(s['text'] for s in segments),
+        'segments': segments,
+        'language': language,
+    }
+
+def transcribe_windows(audio, key: tuple, chunks: list, options: dict, on_progress=None) -> dict:
+    """在当前进程中按分段依次识别，每完成一段就报告已识别的句子"""
+    backend = get_backend(key[0])
+    results = []
+    language = None
+    done_samples = 0
+    for start, end in chunks:
+        check_cancelled()
+        with whisper_models.use(key) as model:
+            chunk_result = backend.transcribe(model, audio[start:end], options)
+        results.append((start / WHISPER_SAMPLE_RATE, end / WHISPER_SAMPLE_RATE, chunk_result['segments']))
+        language = language or chunk_result.get('language')
+        done_samples += end - start
+        _report_chunks(results, len(results), done_samples, len(audio), len(chunks), on_progress)
+
+    segments = merge_chunk_segments(results)
+    return {
+        'text': ' '.join(s['text'] for s in segments),
+        'segments': segments,
+        'language': language,
+    }
+
+def vad_enabled() -> bool:
+    return os.environ.get(VAD_ENV, '1').strip().lower() not in ('0', 'false', 'no', 'off')
+
+def transcribe(audio, model_size: str, options: dict = None, workers: int = None,
+               chunk_seconds: float = None, vad: bool = None, use_cache: bool = True,
+               on_progress=None, backend: str = None) -> dict:
+    """
+    识别 16kHz 单声道音频数组。
+    结果按音频指纹、模型大小和识别选项缓存在磁盘上，同一段音频再次生成字幕时无需重新识别；
+    识别前先去掉音乐、静音等非语音部分（结果中的 vad_skip_ratio 为跳过的比例），时间戳换算回原始时间轴；
+    长音频在静音处切分后由多个进程并行识别；短音频、单核或使用 GPU 时在当前进程中识别。
+    提供 on_progress(已识别的句子, 百分比) 时每完成一个分段回调一次：第一段缩短（见 VIDEOCUT_STREAM_FIRST_CHUNK_SECONDS），
+    其余分段长度不变（见 VIDEOCUT_STREAM_CHUNK_SECONDS）。
+    backend 为识别引擎名称（whisper、faster-whisper），为空时使用默认引擎。
+    """
+    options = options or {}
+    if vad is None:
+        vad = vad_enabled()
+    key = model_key(model_size, backend)
+
+    cache_key = None
+    if use_cache:
+        cache_key = transcript_cache.make_key(audio_fingerprint(audio), model_size, _cache_options(options, vad, key))
+        cached = transcript_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+    result = _transcribe_audio(audio, key, options, workers, chunk_seconds, vad, on_progress)
+    if cache_key is not None:
+        transcript_cache.put(cache_key, result)
+    return result
+
+def _cache_options(options: dict, vad: bool, key: tuple) -> dict:
+    """参与识别结果缓存键的选项：识别选项 + 是否语音检测 + 识别引擎"""
+    return dict(options, vad=vad, backend=key[0])
+
+def _find_parent_transcript(video_path: str, model_size: str, options: dict):
+    """沿片段来源查找已缓存的祖先识别结果，返回 (结果, 片段在祖先中的起点, 终点或 None)"""
+    for fingerprint, start, end in clip_ancestors(video_path):
+        parent_audio = lookup_audio_fingerprint(fingerprint)
+        if parent_audio is None:
+            continue
+        result = transcript_cache.get(transcript_cache.make_key(parent_audio, model_size, options))
+        if result is not None:
+            return result, start, end
+    return None
+
+def slice_parent_transcript(audio, parent_result: dict, start: float, end: float,
+                            key: tuple, options: dict, vad: bool) -> dict:
+    """
+    从父视频的识别结果中截取片段 [start, end) 并换算到片段时间轴。
+    跨越片段首尾边界的句子无法截取，只对这两处未覆盖的区域单独识别。
+    """
+    duration = len(audio) / WHISPER_SAMPLE_RATE
+    end = start + duration if end is None else min(end, start + duration)
+
+    inner = []
+    head_end = 0.0
+    tail_start = duration
+    for segment in parent_result['segments']:
+        seg_start = segment['start'] - start
+        seg_end = segment['end'] - start
+        if seg_end <= 0 or seg_start >= duration:
+            continue
+        if seg_start < 0:
+            head_end = max(head_end, seg_end)
+        elif seg_end > duration:
+            tail_start = min(tail_start, seg_start)
+        else:
+            inner.append({'start': seg_start, 'end': seg_end, 'text': segment['text']})
+
+    for edge_start, edge_end in ((0.0, head_end), (tail_start, duration)):
+        if edge_end - edge_start < MIN_EDGE_SECONDS:
+            continue
+        print(f"识别片段边缘未覆盖区域: {edge_start:.1f}s - {edge_end:.1f}s")
+        edge_audio = audio[int(edge_start * WHISPER_SAMPLE_RATE):int(edge_end * WHISPER_SAMPLE_RATE)]
+        edge_result = transcribe(edge_audio, key[1], options, workers=1, vad=vad, use_cache=False, backend=key[0])
+        inner.extend(
+            {'start': s['start'] + edge_start, 'end': min(s['end'] + edge_start, edge_end), 'text': s['text']}
+            for s in edge_result['segments']
+        )
+
+    segments = merge_chunk_segments([(0.0, duration, sorted(inner, key=lambda s: s['start']))])
+    return {
+        'text': ' '.join(s['text'] for s in segments),
+        'segments': segments,
+        'language': parent_result.get('language'),
+    }
+
+def transcribe_file(video_path: str, audio, model_size: str, options: dict = None, on_progress=None,
+                    backend: str = None) -> dict:
+    """
+    识别视频文件的音频。
+    该视频是从已识别过的视频中提取的片段时，直接截取父视频的识别结果，只识别首尾未覆盖的部分；
+    识别后记录视频对应的音频指纹，供之后从它提取的片段复用。
+    """
+    options = options or {}
+    vad = vad_enabled()
+    key = model_key(model_size, backend)
+    cache_options = _cache_options(options, vad, key)
+    fingerprint = audio_fingerprint(audio)
+    record_audio_fingerprint(video_path, fingerprint)
+
+    cache_key = transcript_cache.make_key(fingerprint, model_size, cache_options)
+    cached = transcript_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    parent = _find_parent_transcript(video_path, model_size, cache_options)
+    if parent is not None:
+        parent_result, start, end = parent
+        print(f"复用父视频的识别结果（片段起点 {start:.2f} 秒）")
+        result = slice_parent_transcript(audio, parent_result, start, end, key, options, vad)
+    else:
+        result = _transcribe_audio(audio, key, options, None, None, vad, on_progress)
+    transcript_cache.put(cache_key, result)
+    return result
+
+def _transcribe_audio(audio, key: tuple, options: dict, workers: int,
+                      chunk_seconds: float, vad: bool, on_progress=None) -> dict:
+    """实际执行语音识别（不经过缓存），key 为 (识别引擎, 模型大小)"""
+    # 语音检测依赖 numpy，只在识别时才导入
+    from utils.audio_vad import split_on_silence, compress_non_speech
+    backend = get_backend(key[0])
+    workers = workers or default_workers()
+    chunk_seconds = chunk_seconds or float(os.environ.get(TRANSCRIBE_CHUNK_ENV, DEFAULT_CHUNK_SECONDS))
+    first_chunk_seconds = None
+    if on_progress:
+        if os.environ.get(STREAM_CHUNK_ENV):
+            chunk_seconds = min(chunk_seconds, float(os.environ[STREAM_CHUNK_ENV]))
+        first_chunk_seconds = min(chunk_seconds, float(os.environ.get(STREAM_FIRST_CHUNK_ENV,
+                                                                      DEFAULT_STREAM_FIRST_CHUNK_SECONDS)))
+
+    timeline = None
+    if vad:
+        audio, timeline = compress_non_speech(audio, WHISPER_SAMPLE_RATE)
+        print(f"语音检测: 保留 {timeline.kept_seconds:.1f} 秒，跳过 {timeline.skip_ratio:.0%} 的非语音音频")
+        if len(audio) == 0:
+            return {'text': '', 'segments': [], 'language': None, 'vad_skip_ratio': 1.0}
+
+    report = None
+    if on_progress:
+        # 回调收到的时间戳已换算回原始时间轴
+        def report(segments, percent):
+            on_progress(timeline.remap_segments(segments) if timeline else segments, percent)
+
+    chunks = split_on_silence(audio, WHISPER_SAMPLE_RATE, chunk_seconds, first_chunk_seconds=first_chunk_seconds)
+    workers = budget_workers(key, min(workers, len(chunks)))
+    if workers > 1 and not backend.gpu_available():
+        print(f"并行语音识别（{backend.name}）: {len(chunks)} 段，{workers} 个进程")
+        result = transcribe_parallel(audio, key, chunks, workers, options, report)
+    elif report and len(chunks) > 1:
+        result = transcribe_windows(audio, key, chunks, options, report)
+    else:
+        # 同一个模型同时只允许一个识别任务使用
+        with whisper_models.use(key) as model:
+            result = backend.transcribe(model, audio, options)
+
+    if timeline is not None:
+        result['segments'] = timeline.remap_segments(result['segments'])
+        result['vad_skip_ratio'] = timeline.skip_ratio
+    return result
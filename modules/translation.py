@@ -0,0 +1,169 @@
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from utils.cache_utils import get_cache_dir
+from utils.model_registry import ModelRegistry
+from utils.job_scheduler import report_progress
+
+# 各语言对使用的本地 seq2seq 翻译模型（首次使用时下载到 Hugging Face 缓存）
+TRANSLATION_MODELS = {
+    ('en', 'zh'): 'Helsinki-NLP/opus-mt-en-zh',
+    ('zh', 'en'): 'Helsinki-NLP/opus-mt-zh-en',
+    ('ja', 'zh'): 'Helsinki-NLP/opus-mt-ja-zh',
+}
+# 覆盖默认模型，格式为 "en-zh=模型名或本地路径,ja-zh=..."
+TRANSLATION_MODEL_ENV = 'VIDEOCUT_TRANSLATION_MODELS'
+
+# 每批翻译的句子数和单句最大长度（token）
+TRANSLATION_BATCH_ENV = 'VIDEOCUT_TRANSLATION_BATCH'
+DEFAULT_BATCH_SIZE = 32
+MAX_LENGTH = 256
+
+# 翻译模型内存预算（MB）
+TRANSLATION_MEMORY_MB = 2 * 1024
+
+# 翻译结果缓存：每个语言对保存为一个 JSON 文件，最多保留的条目数
+MAX_CACHED_TRANSLATIONS = 50000
+
+def model_overrides() -> dict:
+    """环境变量 VIDEOCUT_TRANSLATION_MODELS 指定的模型 {"en-zh": 模型名或本地路径}"""
+    overrides = {}
+    for item in os.environ.get(TRANSLATION_MODEL_ENV, '').split(','):
+        if '=' in item:
+            pair, name = item.split('=', 1)
+            overrides[pair.strip()] = name.strip()
+    return overrides
+
+def model_name(source_lang: str, target_lang: str) -> str:
+    """语言对对应的翻译模型"""
+    pair = f"{source_lang}-{target_lang}"
+    return model_overrides().get(pair) or TRANSLATION_MODELS.get((source_lang, target_lang)) or f"Helsinki-NLP/opus-mt-{pair}"
+
+def cache_bucket(source_lang: str, target_lang: str) -> str:
+    """翻译缓存的分组名：语言对 + 模型，换用其他模型后不会返回旧模型的译文"""
+    name = model_name(source_lang, target_lang)
+    return f"{source_lang}-{target_lang}-{hashlib.sha1(name.encode('utf-8')).hexdigest()[:12]}"
+
+def load_translation_model(name: str):
+    """加载翻译模型，返回 (tokenizer, model)"""
+    # transformers 和 torch 加载很慢，只在真正需要翻译时才导入
+    from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
+    tokenizer = AutoTokenizer.from_pretrained(name)
+    model = AutoModelForSeq2SeqLM.from_pretrained(name)
+    model.eval()
+    return tokenizer, model
+
+# 进程内共享的翻译模型
+translation_models = ModelRegistry(
+    load_translation_model,
+    TRANSLATION_MEMORY_MB * 1024 * 1024,
+    estimate=lambda loaded: sum(p.numel() * p.element_size() for p in loaded[1].parameters()),
+    name="翻译模型"
+)
+
+def batch_size() -> int:
+    return max(1, int(os.environ.get(TRANSLATION_BATCH_ENV, DEFAULT_BATCH_SIZE)))
+
+def translate_with_model(tokenizer, model, texts: list) -> list:
+    """用已加载的模型翻译一组句子：按长度排序后分批补齐，减少无效的填充计算"""
+    import torch
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+    results = [None] * len(texts)
+    size = batch_size()
+    with torch.inference_mode():
+        for start in range(0, len(order), size):
+            indices = order[start:start + size]
+            inputs = tokenizer([texts[i] for i in indices], return_tensors='pt', padding=True,
+                               truncation=True, max_length=MAX_LENGTH)
+            outputs = model.generate(**inputs, num_beams=1, max_new_tokens=MAX_LENGTH)
+            for i, text in zip(indices, tokenizer.batch_decode(outputs, skip_special_tokens=True)):
+                results[i] = text.strip()
+    return results
+
+class TranslationCache:
+    """
+    按 (原文, 分组) 缓存翻译结果，分组为语言对 + 模型（见 cache_bucket），
+    每个分组一个 JSON 文件，超出条目上限时淘汰最久未用的
+    """
+
+    def __init__(self, cache_dir: str = None, max_entries: int = MAX_CACHED_TRANSLATIONS):
+        self._cache_dir = cache_dir
+        self.max_entries = max_entries
+        self._pairs = {}
+        self._lock = threading.Lock()
+
+    def _path(self, pair: str) -> str:
+        if self._cache_dir is None:
+            self._cache_dir = get_cache_dir('translations')
+        return os.path.join(self._cache_dir, f"{pair}.json")
+
+    def _entries(self, pair: str) -> OrderedDict:
+        if pair not in self._pairs:
+            entries = OrderedDict()
+            try:
+                with open(self._path(pair), 'r', encoding='utf-8') as f:
+                    entries.update(json.load(f))
+            except (OSError, ValueError):
+                pass
+            self._pairs[pair] = entries
+        return self._pairs[pair]
+
+    def get_many(self, pair: str, texts: list) -> dict:
+        """返回已缓存的翻译 {原文: 译文}"""
+        with self._lock:
+            entries = self._entries(pair)
+            found = {}
+            for text in texts:
+                if text in entries:
+                    entries.move_to_end(text)
+                    found[text] = entries[text]
+            return found
+
+    def put_many(self, pair: str, translations: dict):
+        """保存新的翻译并写回磁盘（先写临时文件再原子替换）"""
+        with self._lock:
+            entries = self._entries(pair)
+            entries.update(translations)
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+            path = self._path(pair)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(entries, f, ensure_ascii=False)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                print(f"保存翻译缓存失败: {e}")
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+# 全局翻译缓存实例
+translation_cache = TranslationCache()
+
+def translate_texts(texts: list, source_lang: str = 'en', target_lang: str = 'zh') -> list:
+    """
+    批量翻译句子，返回与输入一一对应的译文。
+    相同句子只翻译一次，已翻译过的直接使用缓存。
+    只在当前进程中加载一份翻译模型，不分给识别进程，避免每个进程各占一份模型内存。
+    """
+    if source_lang == target_lang:
+        return list(texts)
+
+    name = model_name(source_lang, target_lang)
+    bucket = cache_bucket(source_lang, target_lang)
+    unique = list(dict.fromkeys(t for t in texts if t and t.strip()))
+    translations = translation_cache.get_many(bucket, unique)
+    missing = [t for t in unique if t not in translations]
+
+    if missing:
+        print(f"翻译 {len(missing)} 句（缓存命中 {len(unique) - len(missing)} 句），模型: {name}")
+        report_progress("正在翻译字幕")
+        with translation_models.use(name) as (tokenizer, model):
+            results = translate_with_model(tokenizer, model, missing)
+        new = dict(zip(missing, results))
+        translation_cache.put_many(bucket, new)
+        translations.update(new)
+
+    return [translations.get(t, '') if t and t.strip() else '' for t in texts]
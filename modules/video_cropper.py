@@ -1,9 +1,16 @@
 import os
+import json
+import hashlib
 import tempfile
-import cv2
-import numpy as np
-from utils.ffmpeg_utils import get_video_info, run_ffmpeg_command
-from utils.person_tracker import PersonTracker
+from utils.chunked_encoder import encode_chunked
+from utils.media_probe import probe_media
+from utils.media_index import get_media_index
+from utils.render_cache import render_cache
+from utils.cache_utils import get_cache_dir, file_identity
+from utils.provenance import record_clip
+from utils.video_frames import analysis_settings
+from modules.edit_pipeline import EditSpec, render_edit_spec, crop_box_pixels, pad_box, escape_filter_path
+from utils.job_scheduler import check_cancelled, report_progress
 
 def calculate_crop_box(video_width: int, video_height: int, aspect_ratio: str, center_x: float = 0.5, center_y: float = 0.5, scale: float = 0.8) -> dict:
     """计算裁切框的参数"""
@@ -41,48 +48,26 @@ def calculate_crop_box(video_width: int, video_height: int, aspect_ratio: str, c
         'height': crop_height
     }
 
+def relative_crop_box(input_path: str, aspect_ratio: str, center_x: float = 0.5, center_y: float = 0.5, scale: float = 0.8) -> tuple:
+    """按框中心位置和缩放计算相对坐标裁切框 (x, y, 宽, 高)"""
+    media_info = probe_media(input_path)
+    crop_box = calculate_crop_box(media_info.width, media_info.height, aspect_ratio, center_x, center_y, scale)
+    return (
+        crop_box['x'] / media_info.width,
+        crop_box['y'] / media_info.height,
+        crop_box['width'] / media_info.width,
+        crop_box['height'] / media_info.height,
+    )
+
 def crop_video_with_tracking(input_path: str, aspect_ratio: str, crop_x: float, crop_y: float, crop_width: float, crop_height: float):
-    """智能裁切视频，支持人物跟踪和动态调整"""
+    """智能裁切视频，9:16 的黑边与裁切在同一次编码中完成"""
     try:
         if not input_path or not os.path.exists(input_path):
             raise ValueError("请先选择视频文件")
         
-        # 获取视频信息
-        video_info = get_video_info(input_path)
-        original_width = video_info['width']
-        original_height = video_info['height']
-        
-        # 计算裁切区域
-        crop_x_pixels = int(crop_x * original_width)
-        crop_y_pixels = int(crop_y * original_height)
-        crop_w_pixels = int(crop_width * original_width)
-        crop_h_pixels = int(crop_height * original_height)
-        
-        # 确保裁切区域不超出视频边界
-        crop_x_pixels = max(0, min(crop_x_pixels, original_width - crop_w_pixels))
-        crop_y_pixels = max(0, min(crop_y_pixels, original_height - crop_h_pixels))
-        crop_w_pixels = min(crop_w_pixels, original_width - crop_x_pixels)
-        crop_h_pixels = min(crop_h_pixels, original_height - crop_y_pixels)
-        
-        # 创建临时输出文件
-        tmp_dir = tempfile.gettempdir()
-        output_path = os.path.join(tmp_dir, f"cropped_{aspect_ratio}_{int(crop_x*100)}_{int(crop_y*100)}.mp4")
-        
-        # 构建 FFmpeg 命令
-        cmd = [
-            'ffmpeg', '-i', input_path,
-            '-vf', f'crop={crop_w_pixels}:{crop_h_pixels}:{crop_x_pixels}:{crop_y_pixels}',
-            '-c:v', 'libx264',
-            '-c:a', 'aac',
-            '-preset', 'ultrafast',
-            '-crf', '23',
-            '-y', output_path
-        ]
-        
-        # 执行裁切
-        success = run_ffmpeg_command(cmd, "裁切命令")
-        if not success:
-            raise ValueError("视频裁切失败")
+        # 裁切和黑边编译为一条滤镜链，相同输入和参数直接返回缓存结果
+        spec = EditSpec(input_path).with_crop(aspect_ratio, (crop_x, crop_y, crop_width, crop_height))
+        output_path = render_edit_spec(spec)
         
         print(f"视频裁切成功: {output_path}")
         return output_path, ""
@@ -92,130 +77,171 @@ def crop_video_with_tracking(input_path: str, aspect_ratio: str, crop_x: float,
         print(error_msg)
         return None, error_msg
 
+def track_cache_path(input_path: str, crop_box: tuple) -> str:
+    """人物跟踪分析结果的缓存文件：由视频身份、初始裁切框和分析画面的尺寸、帧率决定"""
+    payload = json.dumps([list(file_identity(input_path)), [int(v) for v in crop_box], list(analysis_settings())])
+    digest = hashlib.sha1(payload.encode('utf-8')).hexdigest()
+    return os.path.join(get_cache_dir('person_tracks'), f"{digest}.npy")
+
+def crop_trajectory(centers: 'np.ndarray', crop_box: tuple, video_width: int, video_height: int) -> 'np.ndarray':
+    """
+    由每帧人物中心计算裁切框轨迹，返回 (帧数, 4) 的 int32 数组，每行为 (x, y, 宽, 高)。
+    裁切框大小不变，以人物为中心且不超出画面；跟丢的帧沿用上一帧的位置，
+    第一次检测到人物之前使用初始裁切框。
+    """
+    # numpy 只在人物跟踪时才导入，应用启动和固定位置裁切不需要
+    import numpy as np
+    crop_w, crop_h, crop_x, crop_y = crop_box
+    valid = ~np.isnan(centers[:, 0])
+    # 向前填充：每帧取最近一次有效检测的位置
+    last_valid = np.maximum.accumulate(np.where(valid, np.arange(len(centers)), -1))
+    filled = np.where(last_valid[:, None] >= 0, centers[np.maximum(last_valid, 0)],
+                      np.array([crop_x + crop_w / 2, crop_y + crop_h / 2], dtype=np.float32))
+    
+    trajectory = np.empty((len(centers), 4), dtype=np.int32)
+    trajectory[:, 0] = np.clip(np.rint(filled[:, 0] - crop_w / 2), 0, video_width - crop_w)
+    trajectory[:, 1] = np.clip(np.rint(filled[:, 1] - crop_h / 2), 0, video_height - crop_h)
+    trajectory[:, 2] = crop_w
+    trajectory[:, 3] = crop_h
+    return trajectory
+
+def resample_centers(sample_times: 'np.ndarray', centers: 'np.ndarray', frame_times: 'np.ndarray') -> 'np.ndarray':
+    """
+    把抽帧分析得到的人物中心线性插值到源视频的每一帧，返回 (帧数, 2)；
+    第一次检测到人物之前的帧为 NaN，最后一次检测之后沿用最后的位置。
+    """
+    import numpy as np
+    result = np.full((len(frame_times), 2), np.nan, dtype=np.float32)
+    valid = ~np.isnan(centers[:, 0])
+    if not valid.any():
+        return result
+    times = sample_times[valid]
+    tracked = frame_times >= times[0]
+    for axis in (0, 1):
+        result[tracked, axis] = np.interp(frame_times[tracked], times, centers[valid, axis])
+    return result
+
+def analyze_person_track(input_path: str, crop_x: float, crop_y: float, crop_width: float, crop_height: float) -> 'np.ndarray':
+    """
+    分析阶段：跟踪人物并返回每帧裁切框轨迹（见 crop_trajectory）。
+    结果按视频和初始裁切框缓存在磁盘上，只改变输出设置重新渲染时不再重复检测。
+    """
+    import numpy as np
+    media_info = probe_media(input_path)
+    crop_w, crop_h, x, y = crop_box_pixels(media_info.width, media_info.height, crop_x, crop_y, crop_width, crop_height)
+    cache_path = track_cache_path(input_path, (crop_w, crop_h, x, y))
+    try:
+        trajectory = np.load(cache_path)
+        print(f"人物跟踪分析缓存命中: {os.path.basename(cache_path)}")
+        return trajectory
+    except (OSError, ValueError):
+        pass
+    
+    # OpenCV 只在需要人物跟踪时才加载
+    from utils.person_tracker import track_person_centers
+    
+    def on_progress(frame_index, total_frames):
+        check_cancelled()
+        if total_frames:
+            report_progress("人物跟踪分析", frame_index / total_frames * 100)
+            print(f"处理进度: {frame_index}/{total_frames} ({frame_index / total_frames * 100:.1f}%)")
+    
+    print(f"开始人物跟踪分析: {input_path}")
+    sample_times, samples = track_person_centers(input_path, (x, y, crop_w, crop_h), on_progress)
+    if not len(samples):
+        raise ValueError("无法读取视频帧")
+    # 检测在低帧率的采样上进行，裁切框轨迹仍逐帧给出
+    frame_times = frame_timestamps(input_path, media_info)
+    centers = resample_centers(sample_times, samples, frame_times)
+    trajectory = crop_trajectory(centers, (crop_w, crop_h, x, y), media_info.width, media_info.height)
+    
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp.npy"
+    try:
+        np.save(tmp_path, trajectory)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        print(f"保存人物跟踪分析结果失败: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return trajectory
+
+def frame_timestamps(input_path: str, media_info, frame_count: int = None) -> 'np.ndarray':
+    """
+    源视频每帧的显示时间（秒），优先使用媒体索引；
+    没有索引或帧数与 frame_count 不一致时按帧率推算。
+    """
+    import numpy as np
+    index = get_media_index(input_path)
+    if index is not None and index.frame_times and frame_count in (None, len(index.frame_times)):
+        return np.sort(np.array(index.frame_times, dtype=np.float64))
+    fps = media_info.fps or 30.0
+    if frame_count is None:
+        frame_count = max(1, int(round(media_info.duration * fps)))
+    return np.arange(frame_count, dtype=np.float64) / fps
+
+def write_crop_commands(trajectory: 'np.ndarray', frame_times: 'np.ndarray', fps: float, commands_path: str) -> int:
+    """
+    把裁切框轨迹写成 sendcmd 命令文件：只在裁切框移动的帧发送 crop 的 x/y 命令，
+    命令时间提前半帧，避免时间戳舍入误差导致晚一帧生效。返回命令条数。
+    """
+    import numpy as np
+    moved = np.flatnonzero(np.any(np.diff(trajectory[:, :2], axis=0) != 0, axis=1)) + 1
+    half_frame = 0.5 / fps if fps else 0.0
+    with open(commands_path, 'w', encoding='utf-8') as f:
+        for i in moved:
+            x, y = trajectory[i, :2]
+            f.write(f"{max(0.0, frame_times[i] - half_frame):.6f} crop@track x {x}, crop@track y {y};\n")
+    return len(moved)
+
+def render_tracked_crop(input_path: str, trajectory: 'np.ndarray', aspect_ratio: str, output_path: str) -> bool:
+    """
+    渲染阶段：由 ffmpeg 按轨迹逐帧移动裁切框（sendcmd 定时发送 crop 命令），
+    视频帧不经过 Python；9:16 的黑边在同一条滤镜链中完成，音频保留。
+    """
+    media_info = probe_media(input_path)
+    frame_times = frame_timestamps(input_path, media_info, len(trajectory))
+    x, y, crop_w, crop_h = (int(v) for v in trajectory[0])
+    
+    commands_fd, commands_path = tempfile.mkstemp(suffix='.cmd', dir=get_cache_dir('person_tracks'))
+    os.close(commands_fd)
+    try:
+        command_count = write_crop_commands(trajectory, frame_times, media_info.fps, commands_path)
+        print(f"人物跟踪渲染: {len(trajectory)} 帧，裁切框移动 {command_count} 次")
+        filters = [
+            f"sendcmd=f='{escape_filter_path(commands_path)}'",
+            f"crop@track={crop_w}:{crop_h}:{x}:{y}",
+        ]
+        pad = pad_box(crop_w, crop_h, aspect_ratio)
+        if pad:
+            filters.append('pad={}:{}:{}:{}:black'.format(*pad))
+        # 分段并行编码时各段保持原始时间轴，sendcmd 的时间无需换算
+        return encode_chunked(input_path, output_path, ','.join(filters), "人物跟踪裁切命令")
+    finally:
+        os.remove(commands_path)
+
 def crop_with_person_tracking(input_path: str, aspect_ratio: str, crop_x: float, crop_y: float, crop_width: float, crop_height: float):
-    """使用人物跟踪进行智能裁切"""
+    """
+    使用人物跟踪进行智能裁切：先分析出每帧的裁切框轨迹，再交给 ffmpeg 渲染。
+    相同输入和参数直接返回渲染缓存中的结果。
+    """
     try:
         if not input_path or not os.path.exists(input_path):
             raise ValueError("请先选择视频文件")
         
-        # 获取视频信息
-        video_info = get_video_info(input_path)
-        original_width = video_info['width']
-        original_height = video_info['height']
-        fps = video_info['fps']
-        
-        # 打开视频
-        cap = cv2.VideoCapture(input_path)
-        if not cap.isOpened():
-            raise ValueError("无法打开视频文件")
-        
-        # 获取总帧数
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        print(f"开始人物跟踪裁切，总帧数: {total_frames}")
-        
-        # 初始化人物跟踪器
-        tracker = PersonTracker()
-        
-        # 创建临时输出文件
-        tmp_dir = tempfile.gettempdir()
-        output_path = os.path.join(tmp_dir, f"tracked_{aspect_ratio}.mp4")
-        final_output = os.path.join(tmp_dir, f"final_tracked_{aspect_ratio}.mp4")
-        
-        # 准备视频写入器
-        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-        out = cv2.VideoWriter(output_path, fourcc, fps, (int(crop_width * original_width), int(crop_height * original_height)))
+        def render(output_path):
+            trajectory = analyze_person_track(input_path, crop_x, crop_y, crop_width, crop_height)
+            report_progress("正在渲染人物跟踪裁切")
+            return render_tracked_crop(input_path, trajectory, aspect_ratio, output_path)
         
-        frame_count = 0
-        initialized = False
+        params = {'aspect_ratio': aspect_ratio, 'crop': [crop_x, crop_y, crop_width, crop_height]}
+        output_path = render_cache.render(input_path, 'person_track_crop', params, '.mp4', render)
+        if not output_path:
+            raise ValueError("输出文件未生成")
+        # 裁切不改变时间轴和音频，派生片段可复用源视频的识别结果
+        record_clip(output_path, input_path)
         
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-            
-            frame_count += 1
-            
-            # 显示进度
-            if frame_count % 30 == 0:
-                progress = frame_count / total_frames * 100
-                print(f"处理进度: {frame_count}/{total_frames} ({progress:.1f}%)")
-            
-            # 第一帧初始化跟踪器
-            if not initialized:
-                # 计算初始裁切区域
-                crop_box = calculate_crop_box(original_width, original_height, aspect_ratio, crop_x, crop_y, crop_width, crop_height)
-                
-                # 在初始区域内检测人物
-                x, y, w, h = crop_box['x'], crop_box['y'], crop_box['width'], crop_box['height']
-                roi = frame[y:y+h, x:x+w]
-                person_bbox = tracker.detect_person(roi)
-                
-                if person_bbox:
-                    # 调整检测框到全局坐标
-                    px, py, pw, ph = person_bbox
-                    global_bbox = (x + px, y + py, pw, ph)
-                    tracker.initialize_tracker(frame, global_bbox)
-                    print(f"人物跟踪器初始化成功，帧 {frame_count}")
-                else:
-                    # 如果没有检测到人物，使用初始裁切区域
-                    tracker.last_bbox = (x, y, w, h)
-                
-                initialized = True
-            
-            # 跟踪人物位置
-            bbox = tracker.track_person(frame)
-            if bbox:
-                x, y, w, h = bbox
-                
-                # 确保裁切区域不超出视频边界
-                x = max(0, min(x, original_width - w))
-                y = max(0, min(y, original_height - h))
-                w = min(w, original_width - x)
-                h = min(h, original_height - y)
-                
-                # 裁切当前帧
-                cropped_frame = frame[y:y+h, x:x+w]
-                
-                # 调整到目标尺寸
-                target_width = int(crop_width * original_width)
-                target_height = int(crop_height * original_height)
-                resized_frame = cv2.resize(cropped_frame, (target_width, target_height))
-                
-                out.write(resized_frame)
-            else:
-                # 如果跟踪失败，使用上一帧的裁切区域
-                if tracker.last_bbox:
-                    x, y, w, h = tracker.last_bbox
-                    cropped_frame = frame[y:y+h, x:x+w]
-                    target_width = int(crop_width * original_width)
-                    target_height = int(crop_height * original_height)
-                    resized_frame = cv2.resize(cropped_frame, (target_width, target_height))
-                    out.write(resized_frame)
-        
-        # 释放资源
-        cap.release()
-        out.release()
-        
-        # 使用FFmpeg重新编码以确保兼容性
-        cmd = [
-            'ffmpeg', '-i', output_path,
-            '-c:v', 'libx264',
-            '-c:a', 'aac',
-            '-preset', 'ultrafast',
-            '-crf', '23',
-            '-y', final_output
-        ]
-        
-        success = run_ffmpeg_command(cmd, "人物跟踪裁切命令")
-        if success:
-            # 删除临时文件
-            if os.path.exists(output_path):
-                os.remove(output_path)
-            print(f"人物跟踪裁切成功: {final_output}")
-            return final_output, ""
-        else:
-            print(f"人物跟踪裁切成功: {output_path}")
-            return output_path, ""
+        print(f"人物跟踪裁切成功: {output_path}")
+        return output_path, ""
         
     except Exception as e:
         error_msg = f"人物跟踪裁切时出错: {str(e)}"
@@ -228,9 +254,9 @@ def create_crop_preview_image(video_path: str, aspect_ratio: str, crop_x: float,
         from PIL import Image, ImageDraw, ImageFont
         
         # 获取视频信息
-        video_info = get_video_info(video_path)
-        original_width = video_info['width']
-        original_height = video_info['height']
+        media_info = probe_media(video_path)
+        original_width = media_info.width
+        original_height = media_info.height
         
         # 计算裁切区域
         crop_box = calculate_crop_box(original_width, original_height, aspect_ratio, crop_x, crop_y, crop_width, crop_height)
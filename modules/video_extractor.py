@@ -1,13 +1,66 @@
 import os
+import re
 import tempfile
 import subprocess
 from utils.time_utils import time_to_seconds, seconds_to_ffmpeg_time
-from utils.ffmpeg_utils import get_video_duration, run_ffmpeg_command
+from utils.ffmpeg_utils import run_ffmpeg_command
+from utils.media_probe import probe_media
+from utils.render_cache import render_cache
+from utils.media_index import get_media_index
+from utils.provenance import record_clip
+from utils.smart_render import SMART_CUT_CODECS, SMART_RENDER_VERSION, plan_smart_cut, render_smart_cut
 
-def extract_segment(input_path: str, start_str: str, end_str: str):
+def smart_cut_segment(input_path: str, start: float, end: float, out_path: str) -> bool:
+    """
+    智能切割：只重编码首尾不完整的 GOP，中间完整的 GOP 直接流复制。
+    不满足条件（编码不支持、区间内没有完整 GOP）时返回 False，由调用方回退到完整重编码。
+    """
+    media_info = probe_media(input_path)
+    if media_info.codec not in SMART_CUT_CODECS:
+        print(f"视频编码 {media_info.codec} 不支持智能切割，使用完整重编码")
+        return False
+
+    index = get_media_index(input_path)
+    if index is None or not index.keyframe_times:
+        return False
+
+    pieces = plan_smart_cut(index.frame_times, index.keyframe_times, start, end)
+    if not any(piece['mode'] == 'copy' for piece in pieces):
+        print("片段内没有完整的 GOP，使用完整重编码")
+        return False
+
+    print(f"智能切割规划: {[(p['mode'], round(p['start'], 3), p['frames']) for p in pieces]}")
+    return render_smart_cut(input_path, pieces, out_path, start, end, media_info.video)
+
+def precise_cut_segment(input_path: str, start: float, end: float, out_path: str) -> bool:
+    """完整重编码的精确切割"""
+    # 转换为 FFmpeg 时间格式
+    start_time = seconds_to_ffmpeg_time(start)
+    duration = end - start
+    
+    # 使用 FFmpeg 提取片段 - 使用精确切割模式
+    cmd_precise = [
+        'ffmpeg', '-i', input_path,
+        '-ss', start_time,
+        '-t', str(duration),
+        '-c:v', 'libx264',  # 重新编码视频以确保精确切割
+        '-c:a', 'aac',      # 重新编码音频
+        '-preset', 'ultrafast',  # 最快编码预设
+        '-crf', '23',       # 保持良好质量
+        '-avoid_negative_ts', 'make_zero',
+        '-fflags', '+genpts',  # 生成新的时间戳
+        '-y',  # 覆盖输出文件
+        out_path
+    ]
+    
+    # 执行 FFmpeg 命令
+    return run_ffmpeg_command(cmd_precise, "精确切割 FFmpeg 命令")
+
+def extract_segment(input_path: str, start_str: str, end_str: str, smart_cut: bool = True):
     """
     使用 FFmpeg 从 input_path 中根据 start_str 和 end_str 提取视频片段。
     这种方法比 MoviePy 快很多，CPU 使用率也低很多。
+    smart_cut 为 True 时优先使用智能切割，只重编码首尾 GOP。
     """
     try:
         # 检查输入文件是否存在
@@ -22,41 +75,26 @@ def extract_segment(input_path: str, start_str: str, end_str: str):
             raise ValueError("结束时间必须大于开始时间")
         
         # 检查视频时长
-        video_duration = get_video_duration(input_path)
+        video_duration = probe_media(input_path).duration
         if video_duration > 0 and end > video_duration:
             raise ValueError(f"结束时间 ({end_str}) 超过了视频总时长 ({video_duration:.1f} 秒)")
         
-        # 创建临时输出文件
-        tmp_dir = tempfile.gettempdir()
-        out_path = os.path.join(tmp_dir, f"segment_ffmpeg_{int(start*100)}_{int(end*100)}.mp4")
+        def render(out_path):
+            # 智能切割成功则直接返回，否则回退到完整重编码
+            if smart_cut and smart_cut_segment(input_path, start, end, out_path):
+                print("智能切割成功")
+                return True
+            return precise_cut_segment(input_path, start, end, out_path)
         
-        # 转换为 FFmpeg 时间格式
-        start_time = seconds_to_ffmpeg_time(start)
-        duration = end - start
-        
-        # 使用 FFmpeg 提取片段 - 使用精确切割模式
-        cmd_precise = [
-            'ffmpeg', '-i', input_path,
-            '-ss', start_time,
-            '-t', str(duration),
-            '-c:v', 'libx264',  # 重新编码视频以确保精确切割
-            '-c:a', 'aac',      # 重新编码音频
-            '-preset', 'ultrafast',  # 最快编码预设
-            '-crf', '23',       # 保持良好质量
-            '-avoid_negative_ts', 'make_zero',
-            '-fflags', '+genpts',  # 生成新的时间戳
-            '-y',  # 覆盖输出文件
-            out_path
-        ]
-        
-        # 执行 FFmpeg 命令
-        success = run_ffmpeg_command(cmd_precise, "精确切割 FFmpeg 命令")
-        if not success:
+        # 相同输入和时间范围直接返回渲染缓存中的结果
+        params = {'start': start, 'end': end, 'smart_cut': bool(smart_cut)}
+        if smart_cut:
+            params['smart_render'] = SMART_RENDER_VERSION
+        out_path = render_cache.render(input_path, 'extract', params, '.mp4', render)
+        if not out_path:
             raise ValueError("FFmpeg 处理失败")
-        
-        # 检查输出文件是否存在
-        if not os.path.exists(out_path):
-            raise ValueError("输出文件未生成")
+        # 记录片段来源，之后为片段生成字幕时可复用源视频的识别结果
+        record_clip(out_path, input_path, start, end)
         
         print(f"视频片段提取成功: {out_path}")
         return out_path, "", out_path  # 返回视频路径、空错误消息和状态
@@ -64,4 +102,145 @@ def extract_segment(input_path: str, start_str: str, end_str: str):
     except Exception as e:
         error_msg = f"提取视频片段时出错: {str(e)}"
         print(error_msg)
-        return None, error_msg, None  # 返回 None、错误消息和状态 
\ No newline at end of file
+        return None, error_msg, None  # 返回 None、错误消息和状态
+
+def plan_batch_passes(ranges: list, max_outputs_per_pass: int = 8, max_gap: float = 30.0) -> list:
+    """
+    将多个提取区间分组为若干次 FFmpeg 解码：
+    相互重叠或间隔不超过 max_gap 秒的区间共用一次解码，每次最多输出 max_outputs_per_pass 个文件。
+    ranges 中每项的前两个元素为开始、结束时间（单位：秒），其余元素原样保留，返回分组后的列表。
+    """
+    passes = []
+    current = []
+    current_end = None
+    for item in sorted(ranges, key=lambda r: (r[0], r[1])):
+        start, end = item[0], item[1]
+        if current and (start - current_end > max_gap or len(current) >= max_outputs_per_pass):
+            passes.append(current)
+            current = []
+        if not current:
+            current_end = end
+        current.append(item)
+        current_end = max(current_end, end)
+    if current:
+        passes.append(current)
+    return passes
+
+def build_batch_command(input_path: str, group: list, output_paths: list, has_audio: bool) -> list:
+    """为一组区间构建单次解码、多路输出的 FFmpeg 命令"""
+    pass_start = min(item[0] for item in group)
+    pass_end = max(item[1] for item in group)
+    count = len(group)
+
+    # 只解码本组覆盖的时间范围，视频和音频各 split 一次分发给所有输出
+    filters = [f"[0:v]split={count}" + ''.join(f"[v{i}]" for i in range(count))]
+    if has_audio:
+        filters.append(f"[0:a]asplit={count}" + ''.join(f"[a{i}]" for i in range(count)))
+    for i, item in enumerate(group):
+        rel_start = item[0] - pass_start
+        rel_end = item[1] - pass_start
+        filters.append(f"[v{i}]trim=start={rel_start:.3f}:end={rel_end:.3f},setpts=PTS-STARTPTS[vout{i}]")
+        if has_audio:
+            filters.append(f"[a{i}]atrim=start={rel_start:.3f}:end={rel_end:.3f},asetpts=PTS-STARTPTS[aout{i}]")
+
+    cmd = [
+        'ffmpeg', '-ss', seconds_to_ffmpeg_time(pass_start),
+        '-t', str(pass_end - pass_start),
+        '-i', input_path,
+        '-filter_complex', ';'.join(filters)
+    ]
+    for i, out_path in enumerate(output_paths):
+        cmd += ['-map', f'[vout{i}]']
+        if has_audio:
+            cmd += ['-map', f'[aout{i}]', '-c:a', 'aac']
+        cmd += [
+            '-c:v', 'libx264',
+            '-preset', 'ultrafast',
+            '-crf', '23',
+            '-y', out_path
+        ]
+    return cmd
+
+def extract_segments(input_path: str, ranges: list, max_outputs_per_pass: int = 8, max_gap: float = 30.0):
+    """
+    从同一个视频中批量提取多个片段。
+    ranges 为 [(start_str, end_str, name), ...]，名称可以为空。
+    共享的解码区域只解码一次，所有片段由一次或少数几次 FFmpeg 调用输出；
+    已在渲染缓存中的片段直接复用。
+    返回 (输出文件列表, 状态信息)。
+    """
+    try:
+        if not input_path or not os.path.exists(input_path):
+            raise ValueError("请先上传视频文件")
+
+        media_info = probe_media(input_path)
+        video_duration = media_info.duration
+
+        # 解析并校验所有区间，跳过空行
+        parsed = []
+        for i, row in enumerate(ranges or []):
+            start_str, end_str, name = (list(row) + ['', '', ''])[:3]
+            if not str(start_str or '').strip() and not str(end_str or '').strip():
+                continue
+            start = time_to_seconds(str(start_str))
+            end = time_to_seconds(str(end_str))
+            if end <= start:
+                raise ValueError(f"第 {i + 1} 行：结束时间必须大于开始时间")
+            if video_duration > 0 and end > video_duration:
+                raise ValueError(f"第 {i + 1} 行：结束时间 ({end_str}) 超过了视频总时长 ({video_duration:.1f} 秒)")
+            name = re.sub(r'[^\w\-]+', '_', str(name or '').strip()) or f"clip_{i + 1:02d}"
+            parsed.append((start, end, name))
+
+        if not parsed:
+            raise ValueError("请至少填写一个时间区间")
+
+        # 与单片段提取（完整重编码）共用缓存键，已有结果直接复用
+        keys = [
+            render_cache.make_key(input_path, 'extract', {'start': start, 'end': end, 'smart_cut': False})
+            for start, end, _ in parsed
+        ]
+        # 相同区间的多行共用一个缓存键，只渲染一次，导出时再按各自的名称分发
+        cached = {}
+        pending = {}
+        for (start, end, name), key in zip(parsed, keys):
+            if key in cached or key in pending:
+                continue
+            hit = render_cache.lookup(key, '.mp4')
+            if hit:
+                cached[key] = hit
+            else:
+                pending[key] = (start, end, name, key)
+
+        passes = plan_batch_passes(list(pending.values()), max_outputs_per_pass, max_gap)
+        print(f"批量提取 {len(parsed)} 个片段，缓存命中 {len(cached)} 个，共 {len(passes)} 次解码")
+
+        for group in passes:
+            group_outputs = [render_cache.partial_path(key, '.mp4') for _, _, _, key in group]
+            cmd = build_batch_command(input_path, group, group_outputs, media_info.has_audio)
+            try:
+                if not run_ffmpeg_command(cmd, "批量切割 FFmpeg 命令"):
+                    raise ValueError("FFmpeg 处理失败")
+                for (_, _, _, key), partial in zip(group, group_outputs):
+                    if os.path.exists(partial):
+                        cached[key] = render_cache.publish(key, '.mp4', partial)
+            finally:
+                for partial in group_outputs:
+                    if os.path.exists(partial):
+                        os.remove(partial)
+
+        # 以用户指定的名称导出（硬链接，不复制数据）
+        tmp_dir = tempfile.gettempdir()
+        output_paths = []
+        for (start, end, name), key in zip(parsed, keys):
+            if key in cached:
+                record_clip(cached[key], input_path, start, end)
+                dest = os.path.join(tmp_dir, f"{name}_{int(start*100)}_{int(end*100)}.mp4")
+                output_paths.append(render_cache.export(cached[key], dest))
+
+        print(f"批量提取完成: {len(output_paths)}/{len(parsed)} 个片段")
+        return output_paths, f"批量提取完成！共生成 {len(output_paths)} 个片段"
+
+    except Exception as e:
+        error_msg = f"批量提取视频片段时出错: {str(e)}"
+        print(error_msg)
+        return [], error_msg
@@ -0,0 +1,36 @@
+import pytest
+from utils.subtitle_io import Cue, SUBTITLE_FORMATS, iter_cues, load_subtitles, subtitles_to_string, write_subtitles
+from utils.time_utils import timecode_to_seconds
+
+CUES = [
+    Cue(0.0, 1.5, "Hello {world}"),
+    Cue(1.5, 3.25, "Two lines\n第二行 {\\an8} 不是标签"),
+    Cue(3661.57, 3662.0, "Braces } and { alone"),
+]
+
+@pytest.mark.parametrize('fmt', SUBTITLE_FORMATS)
+def test_round_trip(tmp_path, fmt):
+    """写入后再读回，时间和文本（包括花括号）保持不变"""
+    path = tmp_path / f"cues.{fmt}"
+    assert write_subtitles(CUES, str(path)) == len(CUES)
+    loaded = load_subtitles(str(path))
+    assert [c.text for c in loaded] == [c.text for c in CUES]
+    for cue, original in zip(loaded, CUES):
+        assert cue.start == pytest.approx(original.start, abs=0.01)
+        assert cue.end == pytest.approx(original.end, abs=0.01)
+
+def test_ass_override_tags_are_stripped():
+    """ASS 文件中真正的样式覆盖标签被去掉，转义的花括号保留"""
+    text = subtitles_to_string([], 'ass') + "Dialogue: 0,0:00:01.00,0:00:02.00,Default,,0,0,0,,{\\an8}Top \\{x\\}\n"
+    cues = list(iter_cues(text.splitlines(), 'ass'))
+    assert [c.text for c in cues] == ["Top {x}"]
+
+@pytest.mark.parametrize('value, seconds', [
+    ('90', 90.0),
+    ('00:01:30.500', 90.5),
+    ('00:01:30,500', 90.5),
+    ('01:30.500', 90.5),
+    ('1:00:00.25', 3600.25),
+])
+def test_timecode_to_seconds(value, seconds):
+    assert timecode_to_seconds(value) == pytest.approx(seconds)
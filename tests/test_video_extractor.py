@@ -0,0 +1,36 @@
+import os
+from modules import video_extractor
+from utils.media_probe import MediaInfo, StreamInfo
+from utils.render_cache import RenderCache
+
+def test_extract_segments_renders_duplicate_rows_once(tmp_path, monkeypatch):
+    """相同区间的多行只渲染到一个未完成文件，再按各自的名称导出"""
+    monkeypatch.setenv('VIDEOCUT_CACHE_DIR', str(tmp_path / 'cache'))
+    monkeypatch.setattr(video_extractor, 'render_cache', RenderCache(str(tmp_path / 'renders')))
+    source = tmp_path / 'source.mp4'
+    source.write_bytes(b'source')
+    info = MediaInfo(str(source), 6, duration=60.0, streams=[StreamInfo(0, 'video', 'h264')])
+    monkeypatch.setattr(video_extractor, 'probe_media', lambda path: info)
+
+    commands = []
+
+    def fake_ffmpeg(cmd, description):
+        outputs = [arg for arg in cmd if arg.endswith('.mp4') and arg != str(source)]
+        commands.append(outputs)
+        for i, out_path in enumerate(outputs):
+            with open(out_path, 'wb') as f:
+                f.write(f"clip {i}".encode())
+        return True
+
+    monkeypatch.setattr(video_extractor, 'run_ffmpeg_command', fake_ffmpeg)
+
+    ranges = [('0:10', '0:20', 'a'), ('0:10', '0:20', 'b'), ('0:30', '0:40', 'c'), ('0:10', '0:20', 'a')]
+    output_paths, status = video_extractor.extract_segments(str(source), ranges)
+
+    assert output_paths, status
+    rendered = [out for outputs in commands for out in outputs]
+    assert len(rendered) == len(set(rendered)) == 2
+    assert len(output_paths) == 4
+    by_name = {os.path.basename(path).split('_')[0]: path for path in output_paths}
+    with open(by_name['a'], 'rb') as f_a, open(by_name['b'], 'rb') as f_b:
+        assert f_a.read() == f_b.read()
@@ -0,0 +1,60 @@
+import threading
+import subprocess
+from collections import deque
+
+# Whisper 使用的采样率
+WHISPER_SAMPLE_RATE = 16000
+
+# 每次从管道读取的字节数
+PIPE_READ_SIZE = 1 << 20
+
+# 解码失败时保留的 stderr 末尾行数
+STDERR_TAIL_LINES = 20
+
+def decode_audio(input_path: str, sample_rate: int = WHISPER_SAMPLE_RATE):
+    """
+    通过 FFmpeg 标准输出管道把第一条音轨解码为单声道 float32 数组（取值 -1~1），不写临时文件。
+    没有音轨或解码失败时抛出 ValueError。
+    """
+    # numpy 只在真正解码时才导入，不拖慢应用启动
+    import numpy as np
+
+    cmd = [
+        'ffmpeg', '-nostdin', '-v', 'error',
+        '-i', input_path,
+        '-map', '0:a:0',
+        '-vn',
+        '-ac', '1',
+        '-ar', str(sample_rate),
+        '-f', 'f32le',
+        '-acodec', 'pcm_f32le',
+        'pipe:1'
+    ]
+    process = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    # 后台线程持续读取 stderr，避免输出过多时管道写满导致 FFmpeg 阻塞
+    stderr_tail = deque(maxlen=STDERR_TAIL_LINES)
+    def drain_stderr():
+        for line in process.stderr:
+            stderr_tail.append(line.decode('utf-8', errors='replace').rstrip())
+    stderr_thread = threading.Thread(target=drain_stderr, daemon=True)
+    stderr_thread.start()
+
+    # 读入可写缓冲区，转换为数组时无需再复制一份
+    buffer = bytearray()
+    while True:
+        chunk = process.stdout.read(PIPE_READ_SIZE)
+        if not chunk:
+            break
+        buffer.extend(chunk)
+    returncode = process.wait()
+    stderr_thread.join()
+    stderr = '\n'.join(stderr_tail)
+    if returncode != 0:
+        raise ValueError(f"音频解码失败: {stderr.strip() or input_path}")
+
+    usable = len(buffer) - len(buffer) % 4
+    if usable == 0:
+        raise ValueError("视频中没有可识别的音频")
+    del buffer[usable:]
+    return np.frombuffer(buffer, dtype=np.float32)
@@ -0,0 +1,186 @@
+import numpy as np
+
+# 能量分析的帧长（秒）
+FRAME_SECONDS = 0.03
+
+# 寻找切分点时对能量做平滑的窗口（秒），避免切在单词内部的短暂停顿上
+SMOOTH_SECONDS = 0.3
+
+def frame_energy(audio: np.ndarray, sample_rate: int, frame_seconds: float = FRAME_SECONDS) -> np.ndarray:
+    """按固定帧长计算每帧的 RMS 能量"""
+    frame = max(1, int(sample_rate * frame_seconds))
+    count = len(audio) // frame
+    if count == 0:
+        return np.zeros(0, dtype=np.float32)
+    frames = audio[:count * frame].reshape(count, frame)
+    return np.sqrt(np.einsum('ij,ij->i', frames, frames) / frame)
+
+def split_on_silence(audio: np.ndarray, sample_rate: int, chunk_seconds: float,
+                     search_seconds: float = 10.0, first_chunk_seconds: float = None) -> list:
+    """
+    把音频切成约 chunk_seconds 长的分段，切分点选在目标位置前后 search_seconds 内能量最低处。
+    指定 first_chunk_seconds 时第一段按该长度切分（搜索范围不超过其一半），用于尽早得到第一批结果。
+    返回 [(起始样本, 结束样本), ...]，覆盖整段音频。
+    """
+    total = len(audio)
+    chunk = int(chunk_seconds * sample_rate)
+    first = int(first_chunk_seconds * sample_rate) if first_chunk_seconds else chunk
+    if chunk <= 0 or first <= 0 or total <= min(chunk, first) * 1.5:
+        return [(0, total)] if total else []
+
+    frame = max(1, int(sample_rate * FRAME_SECONDS))
+    energy = frame_energy(audio, sample_rate)
+    smooth = max(1, int(SMOOTH_SECONDS / FRAME_SECONDS))
+    energy = np.convolve(energy, np.ones(smooth) / smooth, mode='same')
+
+    chunks = []
+    start = 0
+    size = first
+    while total - start > size * 1.5:
+        search = int(min(search_seconds, size / sample_rate / 2) / FRAME_SECONDS)
+        target = (start + size) // frame
+        lo = max(start // frame + 1, target - search)
+        hi = min(len(energy), target + search + 1)
+        split_frame = lo + int(np.argmin(energy[lo:hi])) if hi > lo else target
+        split = split_frame * frame
+        chunks.append((start, split))
+        start = split
+        size = chunk
+    chunks.append((start, total))
+    return chunks
+
+# 语音检测参数：能量低于 ABS_MIN_DB 的帧一律视为非语音，
+# 其余帧需比底噪高出 NOISE_MARGIN_DB，且频谱平坦度低于 FLATNESS_MAX（噪声、静音的频谱接近平坦）
+ABS_MIN_DB = -50.0
+NOISE_MARGIN_DB = 10.0
+NOISE_PERCENTILE = 10
+FLATNESS_MAX = 0.5
+
+# 计算频谱平坦度时只看语音频段（Hz）
+SPEECH_BAND = (100, 4000)
+
+# 语音区域前后各保留的时长、可以被删掉的最短非语音时长、最短语音时长（秒）
+SPEECH_PAD_SECONDS = 0.3
+MIN_GAP_SECONDS = 1.0
+MIN_SPEECH_SECONDS = 0.2
+
+# 一次做 FFT 的帧数，限制长音频的内存占用
+FFT_BLOCK_FRAMES = 4096
+
+def spectral_flatness(audio: np.ndarray, sample_rate: int, frame_seconds: float = FRAME_SECONDS) -> np.ndarray:
+    """按帧计算语音频段内的频谱平坦度（几何平均 / 算术平均，取值 0~1，越接近 1 越像噪声）"""
+    frame = max(1, int(sample_rate * frame_seconds))
+    count = len(audio) // frame
+    if count == 0:
+        return np.zeros(0, dtype=np.float32)
+
+    freqs = np.fft.rfftfreq(frame, 1.0 / sample_rate)
+    band = (freqs >= SPEECH_BAND[0]) & (freqs <= SPEECH_BAND[1])
+    window = np.hanning(frame).astype(np.float32)
+    frames = audio[:count * frame].reshape(count, frame)
+
+    flatness = np.empty(count, dtype=np.float32)
+    for start in range(0, count, FFT_BLOCK_FRAMES):
+        block = frames[start:start + FFT_BLOCK_FRAMES] * window
+        power = np.abs(np.fft.rfft(block, axis=1)[:, band]) ** 2 + 1e-12
+        flatness[start:start + len(block)] = np.exp(np.log(power).mean(axis=1)) / power.mean(axis=1)
+    return flatness
+
+def _runs(mask: np.ndarray) -> list:
+    """返回布尔数组中连续 True 的区间 [(起始, 结束), ...]"""
+    padded = np.concatenate(([False], mask, [False]))
+    edges = np.flatnonzero(padded[1:] != padded[:-1])
+    return list(zip(edges[::2], edges[1::2]))
+
+def detect_speech(audio: np.ndarray, sample_rate: int) -> list:
+    """
+    用帧能量和频谱平坦度检测语音区域，返回 [(起始样本, 结束样本), ...]。
+    区域前后留有余量，间隔很短的区域会合并，宁可多留也不误删语音。
+    """
+    frame = max(1, int(sample_rate * FRAME_SECONDS))
+    energy = frame_energy(audio, sample_rate)
+    if len(energy) == 0:
+        return []
+
+    energy_db = 20 * np.log10(energy + 1e-10)
+    threshold = max(ABS_MIN_DB, np.percentile(energy_db, NOISE_PERCENTILE) + NOISE_MARGIN_DB)
+    speech = (energy_db > threshold) & (spectral_flatness(audio, sample_rate) < FLATNESS_MAX)
+
+    # 去掉过短的语音片段（咔嗒声等）
+    min_speech = max(1, int(MIN_SPEECH_SECONDS / FRAME_SECONDS))
+    runs = [(s, e) for s, e in _runs(speech) if e - s >= min_speech]
+    if not runs:
+        return []
+
+    # 前后加余量，并合并间隔小于 MIN_GAP_SECONDS 的区域
+    pad = int(SPEECH_PAD_SECONDS / FRAME_SECONDS)
+    min_gap = int(MIN_GAP_SECONDS / FRAME_SECONDS)
+    regions = []
+    for s, e in runs:
+        s, e = max(0, s - pad), min(len(energy), e + pad)
+        if regions and s - regions[-1][1] < min_gap:
+            regions[-1] = (regions[-1][0], e)
+        else:
+            regions.append((s, e))
+
+    total = len(audio)
+    result = [(int(s) * frame, min(total, int(e) * frame)) for s, e in regions]
+    # 末尾不足一帧的样本归入最后一个区域
+    if result and regions[-1][1] == len(energy):
+        result[-1] = (result[-1][0], total)
+    return result
+
+class SpeechTimeline:
+    """
+    压缩后音频与原始音频之间的时间映射：只保留语音区域并首尾相接，
+    识别结果的时间戳通过 to_original 换算回原始时间轴。
+    """
+
+    def __init__(self, regions: list, sample_rate: int, total_samples: int):
+        self.sample_rate = sample_rate
+        self.total_samples = total_samples
+        self.original_starts = np.array([s for s, _ in regions], dtype=np.float64) / sample_rate
+        lengths = np.array([e - s for s, e in regions], dtype=np.float64) / sample_rate
+        self.lengths = lengths
+        self.compressed_starts = np.concatenate(([0.0], np.cumsum(lengths)[:-1])) if len(regions) else np.zeros(0)
+
+    @property
+    def kept_seconds(self) -> float:
+        return float(self.lengths.sum())
+
+    @property
+    def skip_ratio(self) -> float:
+        """被跳过的非语音时长占总时长的比例"""
+        if self.total_samples == 0:
+            return 0.0
+        return 1.0 - self.kept_seconds * self.sample_rate / self.total_samples
+
+    def to_original(self, t: float, is_end: bool = False) -> float:
+        """把压缩音频中的时间换算为原始时间；恰好落在区域边界上的结束时间归到前一个区域"""
+        if len(self.compressed_starts) == 0:
+            return t
+        side = 'left' if is_end else 'right'
+        index = max(0, int(np.searchsorted(self.compressed_starts, t, side=side)) - 1)
+        offset = min(max(0.0, t - self.compressed_starts[index]), self.lengths[index])
+        return float(self.original_starts[index] + offset)
+
+    def remap_segments(self, segments: list) -> list:
+        """把识别结果中各句的起止时间换算回原始时间轴"""
+        remapped = []
+        for segment in segments:
+            segment = dict(segment)
+            segment['start'] = self.to_original(segment['start'])
+            segment['end'] = self.to_original(segment['end'], is_end=True)
+            if segment['end'] > segment['start']:
+                remapped.append(segment)
+        return remapped
+
+def compress_non_speech(audio: np.ndarray, sample_rate: int):
+    """去掉音频中的非语音部分，返回 (压缩后的音频, SpeechTimeline)"""
+    regions = detect_speech(audio, sample_rate)
+    timeline = SpeechTimeline(regions, sample_rate, len(audio))
+    if len(regions) == 1 and regions[0] == (0, len(audio)):
+        return audio, timeline
+    if not regions:
+        return audio[:0], timeline
+    return np.concatenate([audio[s:e] for s, e in regions]), timeline
@@ -0,0 +1,22 @@
+import os
+import hashlib
+import tempfile
+
+# 缓存根目录环境变量，默认放在系统临时目录下
+CACHE_ROOT_ENV = 'VIDEOCUT_CACHE_DIR'
+
+def get_cache_dir(name: str) -> str:
+    """获取（并创建）指定名称的缓存子目录"""
+    root = os.environ.get(CACHE_ROOT_ENV) or os.path.join(tempfile.gettempdir(), 'videocut_cache')
+    path = os.path.join(root, name)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def file_identity(path: str) -> tuple:
+    """文件身份：(绝对路径, 大小, 修改时间)，任意一项变化都视为不同的文件"""
+    stat = os.stat(path)
+    return (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+
+def path_hash(path: str) -> str:
+    """绝对路径的哈希，用作缓存文件名"""
+    return hashlib.sha1(os.path.abspath(path).encode('utf-8')).hexdigest()
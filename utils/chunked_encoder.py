@@ -0,0 +1,213 @@
+import os
+import shutil
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from utils.time_utils import seconds_to_ffmpeg_time
+from utils.ffmpeg_utils import run_ffmpeg_command
+from utils.media_index import get_media_index, count_frames, TIME_EPSILON
+from utils.media_probe import probe_media, MediaProbeError
+from utils.job_scheduler import current_job, current_threads, job_context, JobCancelled
+
+# 每个分段编码进程使用的线程数，可通过环境变量调整
+CHUNK_THREADS_ENV = 'VIDEOCUT_CHUNK_THREADS'
+DEFAULT_CHUNK_THREADS = 2
+
+# 短于该时长的视频直接单进程编码；分段不短于 MIN_CHUNK_SECONDS
+MIN_PARALLEL_DURATION = 60.0
+MIN_CHUNK_SECONDS = 15.0
+
+# 每个并行进程平均分到的分段数，分段略多于进程数可以平衡各段编码速度的差异
+CHUNKS_PER_WORKER = 2
+
+def plan_chunks(frame_times: list, keyframe_times: list, chunk_count: int,
+                min_chunk_seconds: float = MIN_CHUNK_SECONDS) -> list:
+    """
+    在关键帧处把时间轴切成约 chunk_count 段。
+    返回分段列表，每项包含 start（起始关键帧时间）和 frames（该段帧数）。
+    """
+    if not frame_times or not keyframe_times or chunk_count < 2:
+        return []
+
+    total = frame_times[-1] - frame_times[0]
+    target = max(min_chunk_seconds, total / chunk_count)
+
+    # 第一段从第一帧开始，之后每隔约 target 秒取一个关键帧作为分段点，最后一段不能太短
+    boundaries = [frame_times[0]]
+    for t in keyframe_times:
+        if t - boundaries[-1] >= target and frame_times[-1] - t >= min_chunk_seconds / 2:
+            boundaries.append(t)
+
+    chunks = []
+    for i, start in enumerate(boundaries):
+        end = boundaries[i + 1] if i + 1 < len(boundaries) else frame_times[-1] + 1.0
+        chunks.append({'start': start, 'frames': count_frames(frame_times, start, end)})
+    return chunks
+
+def _count_video_packets(path: str):
+    """统计文件中视频流的数据包数，用于检查分段边界是否多帧或丢帧"""
+    cmd = [
+        'ffprobe', '-v', 'error', '-select_streams', 'v:0',
+        '-count_packets', '-show_entries', 'stream=nb_read_packets',
+        '-of', 'csv=p=0', path
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    try:
+        return int(result.stdout.strip().split(',')[0])
+    except ValueError:
+        return None
+
+def _single_pass_command(input_path: str, output_path: str, video_filter: str, preset: str, crf: str) -> list:
+    """不分段时使用的普通编码命令"""
+    cmd = ['ffmpeg', '-i', input_path]
+    if video_filter:
+        cmd += ['-vf', video_filter]
+    cmd += [
+        '-c:v', 'libx264',
+        '-c:a', 'aac',
+        '-preset', preset,
+        '-crf', crf,
+        '-y', output_path
+    ]
+    return cmd
+
+def _chunk_command(input_path: str, chunk: dict, first: bool, half_frame: float, part_path: str,
+                   video_filter: str, preset: str, crf: str, threads: int) -> list:
+    """单个分段的编码命令"""
+    cmd = ['ffmpeg']
+    if not first:
+        # 解码端会丢弃早于 seek 点的帧，分段恰好从起始关键帧开始
+        cmd += ['-ss', seconds_to_ffmpeg_time(max(0, chunk['start'] - half_frame))]
+    cmd += ['-i', input_path, '-map', '0:v:0']
+
+    # 先恢复原始时间轴，使字幕等依赖时间戳的滤镜与整段编码时一致，再归零以便拼接
+    filters = [f"setpts=PTS-STARTPTS+{chunk['start']:.6f}/TB"]
+    if video_filter:
+        filters.append(video_filter)
+    filters.append('setpts=PTS-STARTPTS')
+
+    cmd += [
+        '-vf', ','.join(filters),
+        '-frames:v', str(chunk['frames']),
+        '-c:v', 'libx264',
+        '-threads', str(threads),
+        '-preset', preset,
+        '-crf', crf,
+        '-an',
+        '-f', 'mpegts',
+        '-y', part_path
+    ]
+    return cmd
+
+def _encode_in_chunks(input_path: str, output_path: str, chunks: list, fps: float, has_audio: bool,
+                      video_filter: str, preset: str, crf: str, workers: int, threads: int,
+                      description: str) -> bool:
+    """并行编码各分段，检查接缝处帧数后用 concat 分离器拼接"""
+    work_dir = tempfile.mkdtemp(prefix='chunked_')
+    job = current_job()
+    half_frame = 0.5 / fps if fps else TIME_EPSILON
+    total_duration = sum(chunk['frames'] for chunk in chunks) / fps
+    chunk_times = {}
+    lock = threading.Lock()
+
+    def report(i, progress):
+        if job is None or progress.get('out_time') is None:
+            return
+        with lock:
+            chunk_times[i] = min(progress['out_time'], chunks[i]['frames'] / fps)
+            done = sum(chunk_times.values())
+        job.report_progress({**progress, 'description': description,
+                             'percent': min(100.0, done / total_duration * 100)})
+
+    def encode_chunk(i):
+        part_path = os.path.join(work_dir, f"chunk_{i:03d}.ts")
+        cmd = _chunk_command(input_path, chunks[i], i == 0, half_frame, part_path,
+                             video_filter, preset, crf, threads)
+        with job_context(job):
+            if not run_ffmpeg_command(cmd, f"{description}（第 {i + 1}/{len(chunks)} 段）",
+                                      progress_callback=lambda p: report(i, p)):
+                return None
+        return part_path
+
+    def encode_audio():
+        audio_path = os.path.join(work_dir, "audio.m4a")
+        cmd = ['ffmpeg', '-i', input_path, '-map', '0:a:0', '-vn', '-c:a', 'aac', '-y', audio_path]
+        with job_context(job):
+            if not run_ffmpeg_command(cmd, f"{description}（音频）", progress_callback=lambda p: None):
+                return None
+        return audio_path
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            audio_future = pool.submit(encode_audio) if has_audio else None
+            part_futures = [pool.submit(encode_chunk, i) for i in range(len(chunks))]
+            part_paths = [future.result() for future in part_futures]
+            audio_path = audio_future.result() if audio_future else None
+
+        if not all(part_paths):
+            print(f"{description}: 分段编码失败")
+            return False
+
+        # 接缝检查：每段帧数必须与规划一致，否则拼接后会出现重复帧或丢帧
+        for i, (chunk, part_path) in enumerate(zip(chunks, part_paths)):
+            packets = _count_video_packets(part_path)
+            if packets != chunk['frames']:
+                print(f"{description}: 第 {i + 1} 段帧数不符（期望 {chunk['frames']}，实际 {packets}）")
+                return False
+
+        list_path = os.path.join(work_dir, "concat.txt")
+        with open(list_path, 'w', encoding='utf-8') as f:
+            for part_path in part_paths:
+                f.write(f"file '{part_path}'\n")
+
+        concat_cmd = ['ffmpeg', '-f', 'concat', '-safe', '0', '-i', list_path]
+        if audio_path:
+            concat_cmd += ['-i', audio_path, '-map', '0:v:0', '-map', '1:a:0']
+        concat_cmd += ['-c', 'copy', '-movflags', '+faststart', '-y', output_path]
+        if not run_ffmpeg_command(concat_cmd, f"{description}（拼接）"):
+            return False
+
+        # 拼接结果总帧数也要一致
+        expected = sum(chunk['frames'] for chunk in chunks)
+        packets = _count_video_packets(output_path)
+        if packets != expected:
+            print(f"{description}: 拼接后帧数不符（期望 {expected}，实际 {packets}）")
+            return False
+        return True
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def encode_chunked(input_path: str, output_path: str, video_filter: str = None,
+                   description: str = "分段并行编码", preset: str = 'ultrafast', crf: str = '23') -> bool:
+    """
+    在关键帧处分段并行重编码整个视频（video_filter 不能改变帧数，如 crop/pad/scale/ass）。
+    视频太短、无法建立索引、分段检查失败时自动退回单进程编码。
+    """
+    budget = current_threads() or os.cpu_count() or 1
+    threads = max(1, int(os.environ.get(CHUNK_THREADS_ENV, DEFAULT_CHUNK_THREADS)))
+    workers = budget // threads
+
+    chunks = []
+    try:
+        media_info = probe_media(input_path)
+        if workers >= 2 and media_info.duration >= MIN_PARALLEL_DURATION and media_info.fps:
+            index = get_media_index(input_path)
+            if index is not None:
+                chunks = plan_chunks(index.frame_times, index.keyframe_times, workers * CHUNKS_PER_WORKER)
+    except MediaProbeError as e:
+        print(f"{description}: 读取媒体信息失败，使用单进程编码: {e}")
+
+    if len(chunks) >= 2:
+        print(f"{description}: 分 {len(chunks)} 段并行编码，{workers} 个进程 × {threads} 线程")
+        try:
+            if _encode_in_chunks(input_path, output_path, chunks, media_info.fps, media_info.has_audio,
+                                 video_filter, preset, crf, min(workers, len(chunks)), threads, description):
+                return True
+        except JobCancelled:
+            raise
+        except Exception as e:
+            print(f"{description}: 分段编码出错: {e}")
+        print(f"{description}: 分段编码未通过检查，改用单进程编码")
+
+    return run_ffmpeg_command(_single_pass_command(input_path, output_path, video_filter, preset, crf), description)
@@ -1,46 +1,14 @@
 import subprocess
-import json
+import threading
 import os
-from .time_utils import seconds_to_ffmpeg_time
+from collections import deque
+from .time_utils import seconds_to_ffmpeg_time, timecode_to_seconds
+from .media_index import get_media_index
+from .media_probe import probe_media, MediaProbeError
+from .job_scheduler import current_job, current_threads, JobCancelled
 
-def get_video_duration(input_path: str) -> float:
-    """使用 FFmpeg 获取视频时长"""
-    try:
-        cmd = [
-            'ffprobe', '-v', 'quiet', '-show_entries', 'format=duration',
-            '-of', 'json', input_path
-        ]
-        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-        data = json.loads(result.stdout)
-        return float(data['format']['duration'])
-    except Exception as e:
-        print(f"获取视频时长失败: {e}")
-        return 0
-
-def get_video_info(input_path: str) -> dict:
-    """获取视频信息（分辨率、帧率等）"""
-    try:
-        cmd = [
-            'ffprobe', '-v', 'quiet', '-select_streams', 'v:0',
-            '-show_entries', 'stream=width,height,r_frame_rate',
-            '-of', 'json', input_path
-        ]
-        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-        data = json.loads(result.stdout)
-        stream = data['streams'][0]
-        
-        # 解析帧率
-        fps_parts = stream['r_frame_rate'].split('/')
-        fps = float(fps_parts[0]) / float(fps_parts[1])
-        
-        return {
-            'width': int(stream['width']),
-            'height': int(stream['height']),
-            'fps': fps
-        }
-    except Exception as e:
-        print(f"获取视频信息失败: {e}")
-        return {'width': 1920, 'height': 1080, 'fps': 30}
+# 保留的 stderr 末尾行数，失败时用于显示错误原因
+STDERR_TAIL_LINES = 200
 
 def extract_video_frame(video_path: str, time_seconds: float = 0) -> str:
     """从视频中提取指定时间的帧作为预览图"""
@@ -49,9 +17,19 @@ def extract_video_frame(video_path: str, time_seconds: float = 0) -> str:
         tmp_dir = tempfile.gettempdir()
         frame_path = os.path.join(tmp_dir, f"preview_frame_{int(time_seconds*100)}.jpg")
         
-        cmd = [
-            'ffmpeg', '-i', video_path,
-            '-ss', seconds_to_ffmpeg_time(time_seconds),
+        # 已有媒体索引时先跳到最近的关键帧，只解码该关键帧之后的少量帧；
+        # 没有索引时不为一帧预览扫描整个文件，直接在输入端 seek
+        index = get_media_index(video_path, build=False)
+        keyframe = index.keyframe_before(time_seconds) if index else None
+        if keyframe is not None:
+            cmd = [
+                'ffmpeg', '-ss', seconds_to_ffmpeg_time(keyframe),
+                '-i', video_path,
+                '-ss', seconds_to_ffmpeg_time(max(0, time_seconds - keyframe)),
+            ]
+        else:
+            cmd = ['ffmpeg', '-ss', seconds_to_ffmpeg_time(time_seconds), '-i', video_path]
+        cmd += [
             '-vframes', '1',
             '-q:v', '2',
             '-y', frame_path
@@ -66,18 +44,179 @@ def extract_video_frame(video_path: str, time_seconds: float = 0) -> str:
         print(f"提取视频帧失败: {e}")
         return None
 
-def run_ffmpeg_command(cmd: list, description: str = "FFmpeg命令") -> bool:
-    """执行FFmpeg命令的通用函数"""
+def apply_thread_budget(cmd: list, threads: int) -> list:
+    """为命令中每个 libx264 输出加上线程数限制（已显式指定 -threads 的命令不改动）"""
+    if not threads or '-threads' in cmd:
+        return cmd
+    result = []
+    for i, arg in enumerate(cmd):
+        result.append(arg)
+        if arg == 'libx264' and i > 0 and cmd[i - 1] in ('-c:v', '-vcodec'):
+            result += ['-threads', str(threads)]
+    return result
+
+def ffmpeg_output_paths(cmd: list) -> list:
+    """命令中的输出文件路径（约定每个输出前都有 -y）"""
+    outputs = [cmd[i + 1] for i, arg in enumerate(cmd[:-1]) if arg == '-y']
+    if cmd and cmd[-1] not in outputs:
+        outputs.append(cmd[-1])
+    return outputs
+
+def guess_output_duration(cmd: list):
+    """根据命令参数估计输出时长（用于计算进度百分比），无法估计时返回 None"""
+    try:
+        if '-t' in cmd:
+            return timecode_to_seconds(cmd[cmd.index('-t') + 1])
+        if '-i' not in cmd or 'concat' in cmd:
+            return None
+        input_index = cmd.index('-i')
+        media_info = probe_media(cmd[input_index + 1])
+        if '-frames:v' in cmd and media_info.video and media_info.fps:
+            return int(cmd[cmd.index('-frames:v') + 1]) / media_info.fps
+        seek = 0.0
+        if '-ss' in cmd[:input_index]:
+            seek = timecode_to_seconds(cmd[cmd.index('-ss') + 1])
+        return max(0.0, media_info.duration - seek) or None
+    except (MediaProbeError, ValueError, IndexError):
+        return None
+
+class FFmpegProcess:
+    """
+    通过 -progress 管道运行 FFmpeg：
+    逐块解析进度输出，stderr 写入有界环形缓冲区，可随时取消并删除未完成的输出。
+    """
+
+    def __init__(self, cmd: list, duration: float = None):
+        self.cmd = cmd[:1] + ['-progress', 'pipe:1', '-nostats'] + cmd[1:]
+        self.outputs = ffmpeg_output_paths(cmd)
+        self.duration = duration if duration is not None else guess_output_duration(cmd)
+        self.stderr_tail = deque(maxlen=STDERR_TAIL_LINES)
+        self.process = None
+        self.returncode = None
+        self.cancelled = False
+        self._lock = threading.Lock()
+        self._stderr_thread = None
+
+    @property
+    def stderr_text(self) -> str:
+        return '\n'.join(self.stderr_tail)
+
+    def start(self):
+        with self._lock:
+            if self.cancelled or self.process is not None:
+                return
+            self.process = subprocess.Popen(
+                self.cmd, stdin=subprocess.DEVNULL,
+                stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                text=True, errors='replace'
+            )
+        self._stderr_thread = threading.Thread(target=self._drain_stderr, daemon=True)
+        self._stderr_thread.start()
+
+    def _drain_stderr(self):
+        for line in self.process.stderr:
+            self.stderr_tail.append(line.rstrip())
+
+    def _parse_block(self, block: dict) -> dict:
+        """将一个 key=value 进度块转换为进度字典"""
+        progress = {'frame': None, 'fps': None, 'speed': None, 'out_time': None, 'percent': None,
+                    'done': block.get('progress') == 'end'}
+        try:
+            progress['frame'] = int(block.get('frame', ''))
+        except ValueError:
+            pass
+        try:
+            progress['fps'] = float(block.get('fps', ''))
+        except ValueError:
+            pass
+        try:
+            progress['speed'] = float(block.get('speed', '').rstrip('x'))
+        except ValueError:
+            pass
+        # out_time_ms 实际单位也是微秒
+        out_time_us = block.get('out_time_us') or block.get('out_time_ms')
+        try:
+            progress['out_time'] = max(0.0, int(out_time_us) / 1e6)
+        except (TypeError, ValueError):
+            pass
+        if self.duration and progress['out_time'] is not None:
+            progress['percent'] = min(100.0, progress['out_time'] / self.duration * 100)
+        if progress['done']:
+            progress['percent'] = 100.0
+        return progress
+
+    def progress(self):
+        """生成器：启动进程并在每个进度块到达时产出一次进度字典，进程结束后返回"""
+        self.start()
+        if self.process is None:
+            return
+        block = {}
+        for line in self.process.stdout:
+            key, _, value = line.strip().partition('=')
+            if not key:
+                continue
+            block[key] = value.strip()
+            if key == 'progress':
+                yield self._parse_block(block)
+                block = {}
+        self.returncode = self.process.wait()
+        self._stderr_thread.join(timeout=1)
+
+    def cancel(self):
+        """终止进程并删除未完成的输出文件"""
+        with self._lock:
+            self.cancelled = True
+            process = self.process
+        if process is not None and process.poll() is None:
+            process.kill()
+            process.wait()
+        for path in self.outputs:
+            if os.path.isfile(path):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+def run_ffmpeg_command(cmd: list, description: str = "FFmpeg命令", duration: float = None,
+                       progress_callback=None) -> bool:
+    """
+    执行FFmpeg命令的通用函数。
+    在调度器中运行时，进度会报告给当前任务，任务被取消时终止进程并抛出 JobCancelled。
+    """
+    job = current_job()
     try:
+        # 在调度器中运行时，按分配的线程数限制编码器，避免并发任务互相抢占 CPU
+        cmd = apply_thread_budget(cmd, current_threads())
         print(f"执行{description}: {' '.join(cmd)}")
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        
-        if result.returncode == 0:
+        process = FFmpegProcess(cmd, duration)
+
+        if job:
+            job.add_cancel_callback(process.cancel)
+            if job.cancel_event.is_set():
+                process.cancel()
+        try:
+            for progress in process.progress():
+                progress['description'] = description
+                # 指定回调时由调用者汇总进度（如分段并行编码），否则直接报告给当前任务
+                if progress_callback:
+                    progress_callback(progress)
+                elif job:
+                    job.report_progress(progress)
+        finally:
+            if job:
+                job.remove_cancel_callback(process.cancel)
+
+        if process.cancelled:
+            raise JobCancelled(f"{description}已取消")
+        if process.returncode == 0:
             print(f"{description}成功！")
             return True
         else:
-            print(f"{description}失败: {result.stderr}")
+            print(f"{description}失败: {process.stderr_text}")
             return False
+    except JobCancelled:
+        print(f"{description}已取消")
+        raise
     except Exception as e:
         print(f"{description}执行错误: {e}")
-        return False 
\ No newline at end of file
+        return False
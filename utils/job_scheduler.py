@@ -0,0 +1,261 @@
+import os
+import time
+import heapq
+import asyncio
+import itertools
+import functools
+import threading
+import contextlib
+from concurrent.futures import Future
+
+# 任务优先级，数值越小越先执行
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 10
+PRIORITY_LOW = 20
+
+# 各资源类别默认的并发上限，可通过环境变量覆盖
+RESOURCE_LIMIT_ENV = {
+    'ffmpeg': 'VIDEOCUT_FFMPEG_JOBS',
+    'whisper': 'VIDEOCUT_WHISPER_JOBS',
+    'tracking': 'VIDEOCUT_TRACKING_JOBS',
+}
+
+def default_limits(cpu_count: int) -> dict:
+    """根据 CPU 核数给出各资源类别的默认并发上限"""
+    limits = {
+        'ffmpeg': max(1, cpu_count // 4),
+        'whisper': 1,
+        'tracking': max(1, cpu_count // 8),
+    }
+    for resource, env in RESOURCE_LIMIT_ENV.items():
+        if os.environ.get(env):
+            limits[resource] = max(1, int(os.environ[env]))
+    return limits
+
+# 当前线程正在执行的任务
+_local = threading.local()
+
+def current_job():
+    """返回当前工作线程正在执行的任务，不在调度器中运行时返回 None"""
+    return getattr(_local, 'job', None)
+
+def current_threads():
+    """当前任务分配到的编码线程数，不在调度器中运行时返回 None"""
+    job = current_job()
+    return job.threads if job else None
+
+@contextlib.contextmanager
+def job_context(job):
+    """在其他线程中以指定任务的身份运行，使任务内部再并行的子进程也能被取消"""
+    previous = current_job()
+    _local.job = job
+    try:
+        yield
+    finally:
+        _local.job = previous
+
+class JobCancelled(Exception):
+    """任务已被取消"""
+
+def check_cancelled():
+    """当前任务已被取消时抛出 JobCancelled，供长时间循环定期调用"""
+    job = current_job()
+    if job and job.cancel_event.is_set():
+        raise JobCancelled("任务已取消")
+
+def report_progress(description: str, percent: float = None, **extra):
+    """
+    向当前任务报告进度（不在调度器中运行时忽略）。
+    extra 中的 preview 为已完成部分的结果，由 streamed 在界面上提前显示。
+    """
+    job = current_job()
+    if job:
+        job.report_progress(dict(extra, description=description, percent=percent))
+
+class Job:
+    """调度器中的一个任务，记录最新进度并支持取消"""
+
+    def __init__(self, job_id: int, resource: str, priority: int, fn, args, kwargs, threads: int):
+        self.id = job_id
+        self.resource = resource
+        self.priority = priority
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.threads = threads
+        self.future = Future()
+        self.progress = {}
+        self.started_at = None
+        self.cancel_event = threading.Event()
+        self._cancel_callbacks = []
+        self._lock = threading.Lock()
+
+    def run(self):
+        if not self.future.set_running_or_notify_cancel():
+            return
+        if self.cancel_event.is_set():
+            self.future.set_exception(JobCancelled("任务已取消"))
+            return
+        _local.job = self
+        self.started_at = time.time()
+        try:
+            self.future.set_result(self.fn(*self.args, **self.kwargs))
+        except BaseException as e:
+            self.future.set_exception(e)
+        finally:
+            _local.job = None
+
+    def report_progress(self, progress: dict):
+        """记录最新进度（由 run_ffmpeg_command 等在工作线程中调用）"""
+        self.progress = progress
+
+    def add_cancel_callback(self, callback):
+        with self._lock:
+            self._cancel_callbacks.append(callback)
+
+    def remove_cancel_callback(self, callback):
+        with self._lock:
+            if callback in self._cancel_callbacks:
+                self._cancel_callbacks.remove(callback)
+
+    def cancel(self):
+        """取消任务：未开始的直接移出队列，运行中的终止其子进程"""
+        self.cancel_event.set()
+        if self.future.cancel():
+            return
+        with self._lock:
+            callbacks = list(self._cancel_callbacks)
+        for callback in callbacks:
+            callback()
+
+    def eta_seconds(self):
+        """按已用时间和进度百分比估算剩余秒数，无法估算时返回 None"""
+        percent = self.progress.get('percent')
+        if not percent or percent >= 100 or self.started_at is None:
+            return None
+        elapsed = time.time() - self.started_at
+        return elapsed * (100 - percent) / percent
+
+    def status_text(self) -> str:
+        """供界面显示的进度文字"""
+        if not self.future.running():
+            return "⏳ 排队等待中..."
+        progress = self.progress
+        if not progress:
+            return "⚙️ 处理中..."
+        parts = [progress.get('description', '处理中')]
+        if progress.get('percent') is not None:
+            parts.append(f"{progress['percent']:.1f}%")
+            eta = self.eta_seconds()
+            if eta is not None:
+                parts.append(f"剩余约 {int(eta // 60)}:{int(eta % 60):02d}")
+        if progress.get('fps'):
+            parts.append(f"{progress['fps']:.0f} fps")
+        if progress.get('speed'):
+            parts.append(f"{progress['speed']:.2f}x")
+        return "⚙️ " + " | ".join(parts)
+
+class JobScheduler:
+    """
+    按资源类别限制并发的任务调度器：
+    每个类别（ffmpeg 编码、Whisper 识别、人物跟踪）有独立的工作线程和优先级队列，
+    并为每个任务分配编码线程数，使并发任务平分 CPU 核心而不是互相抢占。
+    """
+
+    def __init__(self, limits: dict = None, cpu_count: int = None):
+        self.cpu_count = cpu_count or os.cpu_count() or 1
+        self.limits = limits or default_limits(self.cpu_count)
+        self._queues = {resource: [] for resource in self.limits}
+        self._conditions = {resource: threading.Condition() for resource in self.limits}
+        self._workers = {resource: [] for resource in self.limits}
+        self._counter = itertools.count()
+
+    def threads_for(self, resource: str) -> int:
+        """同类任务满载并发时，每个任务可用的线程数"""
+        return max(1, self.cpu_count // self.limits[resource])
+
+    def _ensure_workers(self, resource: str):
+        workers = self._workers[resource]
+        while len(workers) < self.limits[resource]:
+            worker = threading.Thread(
+                target=self._worker_loop, args=(resource,),
+                name=f"videocut-{resource}-{len(workers)}", daemon=True
+            )
+            workers.append(worker)
+            worker.start()
+
+    def _worker_loop(self, resource: str):
+        queue = self._queues[resource]
+        condition = self._conditions[resource]
+        while True:
+            with condition:
+                while not queue:
+                    condition.wait()
+                _, _, job = heapq.heappop(queue)
+            job.run()
+
+    def submit(self, resource: str, fn, *args, priority: int = PRIORITY_NORMAL, **kwargs) -> Future:
+        """提交任务，返回 Future"""
+        return self.submit_job(resource, fn, *args, priority=priority, **kwargs).future
+
+    def submit_job(self, resource: str, fn, *args, priority: int = PRIORITY_NORMAL, **kwargs) -> Job:
+        """提交任务，返回 Job 对象（可查询进度或取消）"""
+        if resource not in self.limits:
+            raise ValueError(f"未知的资源类别: {resource}")
+        job_id = next(self._counter)
+        job = Job(job_id, resource, priority, fn, args, kwargs, self.threads_for(resource))
+        condition = self._conditions[resource]
+        with condition:
+            heapq.heappush(self._queues[resource], (priority, job_id, job))
+            self._ensure_workers(resource)
+            condition.notify()
+        return job
+
+    def run(self, resource: str, fn, *args, priority: int = PRIORITY_NORMAL, **kwargs):
+        """提交任务并阻塞等待结果"""
+        return self.submit(resource, fn, *args, priority=priority, **kwargs).result()
+
+    async def run_async(self, resource: str, fn, *args, priority: int = PRIORITY_NORMAL, **kwargs):
+        """提交任务并异步等待结果，不占用事件循环"""
+        return await asyncio.wrap_future(self.submit(resource, fn, *args, priority=priority, **kwargs))
+
+    def pending(self, resource: str) -> int:
+        """某类别中排队等待的任务数"""
+        with self._conditions[resource]:
+            return len(self._queues[resource])
+
+# 全局调度器实例
+scheduler = JobScheduler()
+
+def scheduled(resource: str, fn, priority: int = PRIORITY_NORMAL):
+    """把阻塞函数包装为通过调度器执行的异步函数，供 Gradio 事件直接使用"""
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        return await scheduler.run_async(resource, fn, *args, priority=priority, **kwargs)
+    return wrapper
+
+def streamed(resource: str, fn, status_index: int, output_count: int, placeholder,
+             priority: int = PRIORITY_NORMAL, interval: float = 0.5, preview_index: int = None):
+    """
+    把阻塞函数包装为异步生成器，供 Gradio 流式更新界面：
+    任务运行期间在第 status_index 个输出显示进度，指定 preview_index 时在该输出显示任务报告的 preview，
+    其余输出用 placeholder() 保持不变；结束后输出函数的最终结果。
+    生成器被关闭（客户端断开或点击取消）时取消任务。
+    """
+    @functools.wraps(fn)
+    async def wrapper(*args):
+        job = scheduler.submit_job(resource, fn, *args, priority=priority)
+        done = asyncio.wrap_future(job.future)
+        try:
+            while not done.done():
+                updates = [placeholder() for _ in range(output_count)]
+                updates[status_index] = job.status_text()
+                if preview_index is not None and job.progress.get('preview') is not None:
+                    updates[preview_index] = job.progress['preview']
+                yield tuple(updates)
+                await asyncio.wait({done}, timeout=interval)
+            yield done.result()
+        finally:
+            if not done.done():
+                job.cancel()
+    return wrapper
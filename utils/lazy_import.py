@@ -0,0 +1,68 @@
+import os
+import time
+import importlib
+import threading
+
+# 各功能依赖的重量级模块，用于按需预热和启动基准测试
+FEATURE_MODULES = {
+    'ui': ['gradio'],
+    'extract': ['modules.video_extractor'],
+    'crop': ['modules.video_cropper', 'PIL.Image'],
+    'track': ['cv2', 'utils.person_tracker'],
+    'subtitle': ['modules.subtitle_generator', 'whisper', 'torch'],
+    'translate': ['modules.translation', 'transformers'],
+}
+
+# 后台预热的功能列表（逗号分隔，all 表示全部），默认不预热
+WARMUP_ENV = 'VIDEOCUT_WARMUP'
+
+class LazyModule:
+    """模块代理：首次访问属性时才真正导入，用于推迟加载 OpenCV 等重量级依赖"""
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    started = time.perf_counter()
+                    module = importlib.import_module(self._name)
+                    print(f"已加载 {self._name}，耗时 {time.perf_counter() - started:.2f} 秒")
+                    self._module = module
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+def lazy_module(name: str) -> LazyModule:
+    """返回延迟导入的模块代理"""
+    return LazyModule(name)
+
+def warm_up(features: list, delay: float = 0.0) -> threading.Thread:
+    """在后台线程中预先导入指定功能的依赖，导入失败只打印提示"""
+    def run():
+        if delay:
+            time.sleep(delay)
+        for feature in features:
+            for name in FEATURE_MODULES.get(feature, []):
+                started = time.perf_counter()
+                try:
+                    importlib.import_module(name)
+                    print(f"预热 {feature}: {name} 已加载，耗时 {time.perf_counter() - started:.2f} 秒")
+                except Exception as e:
+                    print(f"预热 {feature}: 加载 {name} 失败: {e}")
+
+    thread = threading.Thread(target=run, name="videocut-warmup", daemon=True)
+    thread.start()
+    return thread
+
+def warm_up_from_env(delay: float = 2.0):
+    """按环境变量 VIDEOCUT_WARMUP 的设置启动后台预热，未设置时不做任何事"""
+    value = os.environ.get(WARMUP_ENV, '').strip()
+    if not value or value == '0':
+        return None
+    features = list(FEATURE_MODULES) if value == 'all' else [f.strip() for f in value.split(',') if f.strip()]
+    return warm_up(features, delay)
@@ -0,0 +1,231 @@
+import os
+import struct
+import tempfile
+import threading
+import subprocess
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from utils.cache_utils import get_cache_dir, file_identity, path_hash
+from utils.media_probe import probe_media
+
+# 索引文件格式：文件头 + 路径 + 流信息 + 数据包数组（pts、字节偏移、标志）
+INDEX_MAGIC = b'VCIX'
+INDEX_VERSION = 1
+HEADER_FORMAT = '=4sHqqdIII'
+STREAM_FORMAT = '=IcII'
+
+# 数据包标志位
+FLAG_KEYFRAME = 1
+
+# 时间戳比较容差（秒）
+TIME_EPSILON = 1e-3
+
+# 进程内缓存，避免同一文件重复读取索引；按最近使用保留 MAX_CACHED_INDEXES 个
+MAX_CACHED_INDEXES = 32
+_index_cache = OrderedDict()
+_index_cache_lock = threading.Lock()
+
+def _read_exact(f, size: int) -> bytes:
+    """读取 size 字节，文件被截断时抛出 ValueError"""
+    data = f.read(size)
+    if len(data) != size:
+        raise ValueError("索引文件不完整")
+    return data
+
+def count_frames(frame_times: list, start: float, end: float) -> int:
+    """统计显示时间落在 [start, end) 内的帧数（frame_times 已排序）"""
+    return bisect_left(frame_times, end - TIME_EPSILON) - bisect_left(frame_times, start - TIME_EPSILON)
+
+class MediaIndex:
+    """单个媒体文件的关键帧/数据包索引，支持 O(log n) 查询最近关键帧"""
+
+    def __init__(self, path, size, mtime_ns, start_time, video_stream, streams, pts, pos, flags):
+        self.path = os.path.abspath(path)
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.start_time = start_time
+        self.video_stream = video_stream
+        # streams: [(index, codec_type, time_base_num, time_base_den), ...]
+        self.streams = streams
+        self.pts = pts
+        self.pos = pos
+        self.flags = flags
+
+        num, den = self.time_base
+        # 以文件起点为 0 的显示时间，与 ffmpeg -ss 的时间轴一致
+        self.frame_times = [p * num / den - start_time for p in pts]
+        self.keyframe_indices = [i for i, f in enumerate(flags) if f & FLAG_KEYFRAME]
+        self.keyframe_times = [self.frame_times[i] for i in self.keyframe_indices]
+
+    @property
+    def time_base(self) -> tuple:
+        """视频流时间基 (分子, 分母)"""
+        for index, _, num, den in self.streams:
+            if index == self.video_stream:
+                return num, den
+        return 1, 1
+
+    def matches(self, identity: tuple) -> bool:
+        """判断索引是否仍对应当前文件（路径、大小、修改时间一致）"""
+        return identity == (self.path, self.size, self.mtime_ns)
+
+    def keyframe_before(self, t: float):
+        """返回不晚于 t 的最近关键帧时间，没有则返回 None"""
+        i = bisect_right(self.keyframe_times, t + TIME_EPSILON) - 1
+        return self.keyframe_times[i] if i >= 0 else None
+
+    def keyframe_after(self, t: float):
+        """返回不早于 t 的最近关键帧时间，没有则返回 None"""
+        i = bisect_left(self.keyframe_times, t - TIME_EPSILON)
+        return self.keyframe_times[i] if i < len(self.keyframe_times) else None
+
+    def keyframe_offset_before(self, t: float):
+        """返回不晚于 t 的最近关键帧在文件中的字节偏移"""
+        i = bisect_right(self.keyframe_times, t + TIME_EPSILON) - 1
+        return self.pos[self.keyframe_indices[i]] if i >= 0 else None
+
+    def count_frames(self, start: float, end: float) -> int:
+        """统计显示时间落在 [start, end) 内的帧数"""
+        return count_frames(self.frame_times, start, end)
+
+    def save(self, index_path: str):
+        """以紧凑的二进制格式保存索引（先写临时文件再原子替换）"""
+        path_bytes = self.path.encode('utf-8')
+        # 临时文件名唯一，同一进程内多个线程同时保存也不会互相覆盖
+        fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(index_path) + '.', suffix='.tmp',
+                                        dir=os.path.dirname(index_path))
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(struct.pack(HEADER_FORMAT, INDEX_MAGIC, INDEX_VERSION, self.size, self.mtime_ns,
+                                    self.start_time, self.video_stream, len(self.streams), len(self.pts)))
+                f.write(struct.pack('=I', len(path_bytes)))
+                f.write(path_bytes)
+                for index, codec_type, num, den in self.streams:
+                    f.write(struct.pack(STREAM_FORMAT, index, codec_type[:1].encode('ascii'), num, den))
+                f.write(self.pts.tobytes())
+                f.write(self.pos.tobytes())
+                f.write(self.flags.tobytes())
+            os.replace(tmp_path, index_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    @classmethod
+    def load(cls, index_path: str):
+        """读取二进制索引文件；文件被截断、长度或内容不一致时抛出 ValueError"""
+        with open(index_path, 'rb') as f:
+            header = _read_exact(f, struct.calcsize(HEADER_FORMAT))
+            magic, version, size, mtime_ns, start_time, video_stream, n_streams, n_packets = struct.unpack(HEADER_FORMAT, header)
+            if magic != INDEX_MAGIC or version != INDEX_VERSION:
+                raise ValueError("索引文件格式不匹配")
+
+            (path_len,) = struct.unpack('=I', _read_exact(f, 4))
+            path = _read_exact(f, path_len).decode('utf-8')
+
+            streams = []
+            stream_size = struct.calcsize(STREAM_FORMAT)
+            for _ in range(n_streams):
+                index, codec_type, num, den = struct.unpack(STREAM_FORMAT, _read_exact(f, stream_size))
+                if not den:
+                    raise ValueError("索引文件中的时间基无效")
+                streams.append((index, codec_type.decode('ascii'), num, den))
+            if not any(index == video_stream for index, _, _, _ in streams):
+                raise ValueError("索引文件中没有视频流信息")
+
+            # 三个数组的类型固定（8 字节整数、8 字节整数、1 字节标志），长度都是 n_packets
+            pts = array('q')
+            pos = array('q')
+            flags = array('B')
+            if (pts.itemsize, pos.itemsize, flags.itemsize) != (8, 8, 1):
+                raise ValueError("当前平台的数组类型与索引文件不一致")
+            pts.frombytes(_read_exact(f, n_packets * pts.itemsize))
+            pos.frombytes(_read_exact(f, n_packets * pos.itemsize))
+            flags.frombytes(_read_exact(f, n_packets * flags.itemsize))
+            if f.read(1):
+                raise ValueError("索引文件末尾有多余数据")
+            if any(a > b for a, b in zip(pts, pts[1:])):
+                raise ValueError("索引文件中的时间戳未排序")
+
+        return cls(path, size, mtime_ns, start_time, video_stream, streams, pts, pos, flags)
+
+def build_media_index(input_path: str) -> MediaIndex:
+    """扫描一次文件，记录视频流的关键帧时间戳、数据包偏移以及所有流的时间基"""
+    identity = file_identity(input_path)
+
+    media_info = probe_media(input_path)
+    streams = []
+    for stream in media_info.streams:
+        num, den = (stream.time_base or '1/1').split('/')
+        streams.append((stream.index, stream.codec_type[:1], int(num), int(den)))
+    if media_info.video is None:
+        raise ValueError("文件中没有视频流")
+    video_stream = media_info.video.index
+    start_time = media_info.start_time
+
+    # 只读取数据包头，不解码，速度接近顺序读文件
+    cmd = [
+        'ffprobe', '-v', 'quiet', '-select_streams', str(video_stream),
+        '-show_entries', 'packet=pts,pos,flags',
+        '-of', 'csv=p=0', input_path
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+
+    packets = []
+    for line in result.stdout.splitlines():
+        parts = line.strip().split(',')
+        if len(parts) < 3 or parts[0] in ('', 'N/A'):
+            continue
+        packet_pos = int(parts[1]) if parts[1] not in ('', 'N/A') else -1
+        packets.append((int(parts[0]), packet_pos, FLAG_KEYFRAME if 'K' in parts[2] else 0))
+    packets.sort()
+
+    pts = array('q', (p[0] for p in packets))
+    pos = array('q', (p[1] for p in packets))
+    flags = array('B', (p[2] for p in packets))
+
+    _, size, mtime_ns = identity
+    return MediaIndex(input_path, size, mtime_ns, start_time, video_stream, streams, pts, pos, flags)
+
+def get_media_index(input_path: str, build: bool = True):
+    """
+    获取文件的媒体索引：优先使用内存和磁盘缓存，文件变化后自动重建；失败时返回 None。
+    build 为 False 时只使用已有的索引，没有时返回 None 而不扫描文件（用于预览等需要立即返回的场景）。
+    """
+    try:
+        identity = file_identity(input_path)
+        with _index_cache_lock:
+            index = _index_cache.get(identity[0])
+            if index is not None and index.matches(identity):
+                _index_cache.move_to_end(identity[0])
+                return index
+
+        index_path = os.path.join(get_cache_dir('index'), f"{path_hash(input_path)}.idx")
+        index = None
+        if os.path.exists(index_path):
+            try:
+                index = MediaIndex.load(index_path)
+                if not index.matches(identity):
+                    index = None
+            except Exception as e:
+                print(f"读取媒体索引失败，将重新生成: {e}")
+                index = None
+
+        if index is None:
+            if not build:
+                return None
+            print(f"正在生成媒体索引: {input_path}")
+            index = build_media_index(input_path)
+            index.save(index_path)
+            print(f"媒体索引生成完成: {len(index.keyframe_times)} 个关键帧, {len(index.pts)} 个数据包")
+
+        with _index_cache_lock:
+            _index_cache[identity[0]] = index
+            _index_cache.move_to_end(identity[0])
+            while len(_index_cache) > MAX_CACHED_INDEXES:
+                _index_cache.popitem(last=False)
+        return index
+    except Exception as e:
+        print(f"获取媒体索引失败: {e}")
+        return None
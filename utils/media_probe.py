@@ -0,0 +1,229 @@
+import os
+import json
+import hashlib
+import threading
+import subprocess
+from collections import OrderedDict
+from dataclasses import dataclass, field, asdict
+from typing import List, Optional
+from utils.cache_utils import get_cache_dir, file_identity
+
+# 进程内缓存条目数与磁盘缓存条目数上限
+MEMORY_CACHE_SIZE = 128
+DISK_CACHE_SIZE = 2000
+
+# 缓存格式版本，字段变化时递增
+PROBE_CACHE_VERSION = 2
+
+class MediaProbeError(Exception):
+    """ffprobe 无法读取媒体信息"""
+
+@dataclass
+class StreamInfo:
+    """单个流的元数据"""
+    index: int
+    codec_type: str
+    codec_name: Optional[str] = None
+    time_base: Optional[str] = None
+    duration: Optional[float] = None
+    width: Optional[int] = None
+    height: Optional[int] = None
+    fps: Optional[float] = None
+    pix_fmt: Optional[str] = None
+    profile: Optional[str] = None
+    level: Optional[int] = None
+    refs: Optional[int] = None
+    sample_rate: Optional[int] = None
+    channels: Optional[int] = None
+
+@dataclass
+class MediaInfo:
+    """一次 ffprobe 得到的完整媒体元数据"""
+    path: str
+    size: int
+    format_name: Optional[str] = None
+    duration: float = 0.0
+    start_time: float = 0.0
+    bit_rate: Optional[int] = None
+    streams: List[StreamInfo] = field(default_factory=list)
+
+    @property
+    def video(self) -> Optional[StreamInfo]:
+        """第一个视频流"""
+        return next((s for s in self.streams if s.codec_type == 'video'), None)
+
+    @property
+    def audio(self) -> Optional[StreamInfo]:
+        """第一个音频流"""
+        return next((s for s in self.streams if s.codec_type == 'audio'), None)
+
+    @property
+    def has_audio(self) -> bool:
+        return self.audio is not None
+
+    @property
+    def width(self) -> int:
+        return self._require_video().width
+
+    @property
+    def height(self) -> int:
+        return self._require_video().height
+
+    @property
+    def fps(self) -> float:
+        return self._require_video().fps
+
+    @property
+    def codec(self) -> Optional[str]:
+        return self._require_video().codec_name
+
+    @property
+    def pix_fmt(self) -> Optional[str]:
+        return self._require_video().pix_fmt
+
+    def _require_video(self) -> StreamInfo:
+        if self.video is None:
+            raise MediaProbeError(f"文件中没有视频流: {self.path}")
+        return self.video
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'MediaInfo':
+        streams = [StreamInfo(**s) for s in data.pop('streams', [])]
+        return cls(streams=streams, **data)
+
+def _parse_rate(rate: str) -> Optional[float]:
+    """解析 ffprobe 的分数形式帧率，如 30000/1001"""
+    try:
+        num, den = rate.split('/')
+        return float(num) / float(den) if float(den) else None
+    except (AttributeError, ValueError):
+        return None
+
+def _optional(value, cast):
+    """ffprobe 用 N/A 或缺省表示未知值"""
+    if value in (None, '', 'N/A'):
+        return None
+    try:
+        return cast(value)
+    except (TypeError, ValueError):
+        return None
+
+def _run_ffprobe(input_path: str, size: int) -> MediaInfo:
+    """调用一次 ffprobe 获取所有流和封装格式信息"""
+    cmd = [
+        'ffprobe', '-v', 'error',
+        '-show_format', '-show_streams',
+        '-of', 'json', input_path
+    ]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True)
+    except OSError as e:
+        raise MediaProbeError(f"无法执行 ffprobe: {e}")
+    if result.returncode != 0:
+        raise MediaProbeError(f"ffprobe 读取失败: {result.stderr.strip() or input_path}")
+
+    data = json.loads(result.stdout or '{}')
+    fmt = data.get('format', {})
+    streams = []
+    for s in data.get('streams', []):
+        streams.append(StreamInfo(
+            index=int(s['index']),
+            codec_type=s.get('codec_type', 'data'),
+            codec_name=s.get('codec_name'),
+            time_base=s.get('time_base'),
+            duration=_optional(s.get('duration'), float),
+            width=_optional(s.get('width'), int),
+            height=_optional(s.get('height'), int),
+            fps=(_parse_rate(s.get('avg_frame_rate')) or _parse_rate(s.get('r_frame_rate'))) if s.get('codec_type') == 'video' else None,
+            pix_fmt=s.get('pix_fmt'),
+            profile=s.get('profile'),
+            level=_optional(s.get('level'), int),
+            refs=_optional(s.get('refs'), int),
+            sample_rate=_optional(s.get('sample_rate'), int),
+            channels=_optional(s.get('channels'), int),
+        ))
+    if not streams:
+        raise MediaProbeError(f"文件中没有可用的媒体流: {input_path}")
+
+    return MediaInfo(
+        path=os.path.abspath(input_path),
+        size=size,
+        format_name=fmt.get('format_name'),
+        duration=_optional(fmt.get('duration'), float) or 0.0,
+        start_time=_optional(fmt.get('start_time'), float) or 0.0,
+        bit_rate=_optional(fmt.get('bit_rate'), int),
+        streams=streams,
+    )
+
+class MediaProbeCache:
+    """按文件身份缓存 ffprobe 结果：进程内 LRU + 磁盘 LRU"""
+
+    def __init__(self, memory_size: int = MEMORY_CACHE_SIZE, disk_size: int = DISK_CACHE_SIZE):
+        self.memory_size = memory_size
+        self.disk_size = disk_size
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _disk_path(self, identity: tuple) -> str:
+        key = hashlib.sha1(repr((PROBE_CACHE_VERSION,) + identity).encode('utf-8')).hexdigest()
+        return os.path.join(get_cache_dir('probe'), f"{key}.json")
+
+    def _remember(self, identity: tuple, info: MediaInfo):
+        with self._lock:
+            self._memory[identity] = info
+            self._memory.move_to_end(identity)
+            while len(self._memory) > self.memory_size:
+                self._memory.popitem(last=False)
+
+    def _evict_disk(self, cache_dir: str):
+        """磁盘条目超出上限时，按最近使用时间淘汰最旧的条目"""
+        entries = [os.path.join(cache_dir, name) for name in os.listdir(cache_dir) if name.endswith('.json')]
+        if len(entries) <= self.disk_size:
+            return
+        entries.sort(key=lambda p: os.path.getmtime(p))
+        for path in entries[:len(entries) - self.disk_size]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def get(self, input_path: str) -> MediaInfo:
+        identity = file_identity(input_path)
+
+        with self._lock:
+            info = self._memory.get(identity)
+            if info is not None:
+                self._memory.move_to_end(identity)
+                return info
+
+        disk_path = self._disk_path(identity)
+        if os.path.exists(disk_path):
+            try:
+                with open(disk_path, 'r', encoding='utf-8') as f:
+                    info = MediaInfo.from_dict(json.load(f))
+                os.utime(disk_path)  # 记录最近使用时间
+                self._remember(identity, info)
+                return info
+            except Exception as e:
+                print(f"读取媒体信息缓存失败，将重新探测: {e}")
+
+        info = _run_ffprobe(input_path, identity[1])
+        self._remember(identity, info)
+
+        try:
+            tmp_path = f"{disk_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(asdict(info), f, ensure_ascii=False)
+            os.replace(tmp_path, disk_path)
+            self._evict_disk(os.path.dirname(disk_path))
+        except OSError as e:
+            print(f"写入媒体信息缓存失败: {e}")
+        return info
+
+_probe_cache = MediaProbeCache()
+
+def probe_media(input_path: str) -> MediaInfo:
+    """获取媒体元数据（带缓存）。文件不存在或 ffprobe 失败时抛出 MediaProbeError"""
+    if not input_path or not os.path.exists(input_path):
+        raise MediaProbeError(f"文件不存在: {input_path}")
+    return _probe_cache.get(input_path)
@@ -0,0 +1,121 @@
+import threading
+import contextlib
+from collections import OrderedDict
+
+def model_memory_bytes(model) -> int:
+    """估算已加载模型占用的内存：PyTorch 模型按参数和缓冲区大小计算，其他模型返回 0"""
+    total = 0
+    for attr in ('parameters', 'buffers'):
+        tensors = getattr(model, attr, None)
+        if callable(tensors):
+            try:
+                total += sum(t.numel() * t.element_size() for t in tensors())
+            except Exception:
+                pass
+    return total
+
+class ModelRegistry:
+    """
+    进程内共享的模型注册表：
+    每个键（如模型大小）只加载一次，总内存超出预算时按最近使用时间淘汰；
+    加载和使用都加锁，同一个模型同时只有一个线程在推理。
+    其他地方（如工作进程）占用的内存可以用 reserve 计入预算，淘汰时一并考虑。
+    """
+
+    def __init__(self, loader, budget_bytes: int, estimate=None, name: str = "模型"):
+        self.loader = loader
+        self.budget_bytes = budget_bytes
+        self.estimate = estimate or model_memory_bytes
+        self.name = name
+        self._models = OrderedDict()  # key -> (model, bytes)
+        self._guard = threading.Lock()
+        self._load_locks = {}
+        self._use_locks = {}
+        self._reserved = {}  # 名称 -> 预留字节数
+
+    def _lock_for(self, locks: dict, key) -> threading.Lock:
+        with self._guard:
+            return locks.setdefault(key, threading.Lock())
+
+    def get(self, key):
+        """返回已加载的模型，未加载时加载（同一个键的并发请求只加载一次）"""
+        with self._guard:
+            if key in self._models:
+                self._models.move_to_end(key)
+                return self._models[key][0]
+
+        with self._lock_for(self._load_locks, key):
+            with self._guard:
+                if key in self._models:
+                    self._models.move_to_end(key)
+                    return self._models[key][0]
+
+            print(f"正在加载{self.name}: {key}")
+            model = self.loader(key)
+            size = self.estimate(model)
+            print(f"{self.name}加载完成: {key}（约 {size / 1024 / 1024:.0f} MB）")
+
+            with self._guard:
+                self._models[key] = (model, size)
+                self._evict(keep=key)
+            return model
+
+    @contextlib.contextmanager
+    def use(self, key):
+        """独占使用某个模型，避免多个线程同时在同一个模型上推理"""
+        model = self.get(key)
+        with self._lock_for(self._use_locks, key):
+            yield model
+
+    def _evict(self, keep=None):
+        """超出内存预算时淘汰最久未使用的模型（正在使用的线程仍持有引用，用完后释放）"""
+        total = sum(size for _, size in self._models.values()) + sum(self._reserved.values())
+        for key in list(self._models):
+            if total <= self.budget_bytes:
+                break
+            if key == keep:
+                continue
+            _, size = self._models.pop(key)
+            total -= size
+            print(f"{self.name}超出内存预算，已卸载: {key}")
+
+    def reserve(self, name, size: int):
+        """在预算中预留 size 字节（如工作进程中加载的模型），必要时淘汰当前进程中的模型"""
+        with self._guard:
+            self._reserved[name] = size
+            self._evict()
+
+    def release(self, name):
+        """归还 reserve 预留的内存"""
+        with self._guard:
+            self._reserved.pop(name, None)
+
+    def reserved_bytes(self, exclude=None) -> int:
+        """已预留的内存（字节），exclude 的预留不计入"""
+        with self._guard:
+            return sum(size for name, size in self._reserved.items() if name != exclude)
+
+    def loaded(self) -> list:
+        """当前已加载的键，按最近使用排序"""
+        with self._guard:
+            return list(self._models)
+
+    def unload(self, key=None):
+        """卸载指定模型，key 为 None 时全部卸载"""
+        with self._guard:
+            if key is None:
+                self._models.clear()
+            else:
+                self._models.pop(key, None)
+
+    def preload(self, key) -> threading.Thread:
+        """在后台线程中预先加载模型"""
+        def run():
+            try:
+                self.get(key)
+            except Exception as e:
+                print(f"预加载{self.name}失败: {key}: {e}")
+
+        thread = threading.Thread(target=run, name=f"preload-{key}", daemon=True)
+        thread.start()
+        return thread
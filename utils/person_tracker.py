@@ -1,5 +1,10 @@
 import cv2
 import numpy as np
+from utils.media_probe import probe_media
+from utils.video_frames import analysis_settings, analysis_frame_size, iter_video_frames
+
+# 尚未检测到人物时，每隔多少秒重新检测一次
+DETECT_RETRY_SECONDS = 0.5
 
 class PersonTracker:
     def __init__(self):
@@ -88,4 +93,55 @@ class PersonTracker:
         except Exception as e:
             print(f"人物跟踪失败: {e}")
             # 如果检测失败，使用上一帧的位置
-            return self.last_bbox 
\ No newline at end of file
+            return self.last_bbox
+
+def track_person_centers(input_path: str, roi: tuple, on_progress=None) -> tuple:
+    """
+    分析阶段：在 FFmpeg 缩小、抽帧后的画面上跟踪人物（尺寸和帧率见 utils.video_frames），
+    返回 (采样时间, 人物中心)：采样时间形状为 (采样数,)，人物中心为源视频像素坐标 (x, y)，形状为 (采样数, 2)。
+    先在 roi (源视频像素 x, y, w, h) 内检测人物作为跟踪起点，检测到人物之前的采样为 NaN。
+    on_progress(已处理采样数, 总采样数) 每 30 个采样调用一次，可在其中抛出异常取消分析。
+    """
+    media_info = probe_media(input_path)
+    max_size, fps = analysis_settings()
+    fps = min(fps, media_info.fps) if media_info.fps else fps
+    frame_w, frame_h = analysis_frame_size(media_info.width, media_info.height, max_size)
+    scale_x = media_info.width / frame_w
+    scale_y = media_info.height / frame_h
+    total_samples = int(media_info.duration * fps)
+    print(f"人物跟踪分析: {frame_w}x{frame_h} @ {fps:g}fps，约 {total_samples} 帧")
+    
+    # 初始区域换算到分析画面的坐标
+    roi_x, roi_y = int(roi[0] / scale_x), int(roi[1] / scale_y)
+    roi_w, roi_h = int(round(roi[2] / scale_x)), int(round(roi[3] / scale_y))
+    tracker = PersonTracker()
+    initialized = False
+    next_detect = 0.0
+    times = []
+    centers = []
+    for t, frame in iter_video_frames(input_path, frame_w, frame_h, fps):
+        if on_progress and len(times) % 30 == 0:
+            on_progress(len(times), total_samples)
+        
+        bbox = None
+        if initialized:
+            bbox = tracker.track_person(frame)
+        elif t >= next_detect:
+            next_detect = t + DETECT_RETRY_SECONDS
+            # 在初始区域内检测人物，坐标换算回整帧
+            person_bbox = tracker.detect_person(frame[roi_y:roi_y + roi_h, roi_x:roi_x + roi_w])
+            if person_bbox:
+                px, py, pw, ph = person_bbox
+                bbox = (roi_x + px, roi_y + py, pw, ph)
+                initialized = tracker.initialize_tracker(frame, bbox)
+                if initialized:
+                    print(f"人物跟踪器初始化成功，{t:.2f} 秒")
+        
+        times.append(t)
+        if bbox:
+            x, y, w, h = bbox
+            centers.append(((x + w / 2) * scale_x, (y + h / 2) * scale_y))
+        else:
+            centers.append((np.nan, np.nan))
+    
+    return np.array(times, dtype=np.float64), np.array(centers, dtype=np.float32).reshape(-1, 2)
@@ -0,0 +1,99 @@
+import os
+import json
+import hashlib
+from utils.cache_utils import get_cache_dir
+
+# 计算内容指纹时读取文件头尾各多少字节
+FINGERPRINT_BYTES = 1 << 20
+
+# 沿派生关系向上查找的最大层数
+MAX_ANCESTORS = 8
+
+def content_fingerprint(path: str) -> str:
+    """
+    文件内容指纹：文件大小 + 头尾各 1MB 的哈希。
+    与路径无关，导出、上传产生的副本仍能对应到同一条记录。
+    """
+    size = os.path.getsize(path)
+    digest = hashlib.sha256(str(size).encode('ascii'))
+    with open(path, 'rb') as f:
+        digest.update(f.read(FINGERPRINT_BYTES))
+        if size > FINGERPRINT_BYTES:
+            f.seek(max(FINGERPRINT_BYTES, size - FINGERPRINT_BYTES))
+            digest.update(f.read(FINGERPRINT_BYTES))
+    return digest.hexdigest()
+
+def _record_path(kind: str, fingerprint: str) -> str:
+    return os.path.join(get_cache_dir('provenance'), f"{kind}-{fingerprint}.json")
+
+def _write_record(kind: str, fingerprint: str, record: dict):
+    path = _record_path(kind, fingerprint)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(record, f)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"保存来源记录失败: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def _read_record(kind: str, fingerprint: str):
+    try:
+        with open(_record_path(kind, fingerprint), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def record_clip(output_path: str, source_path: str, start: float = None, end: float = None):
+    """
+    记录输出文件来自 source_path 的 [start, end) 区间（片段时间 0 对应源视频的 start），
+    end 为 None 表示到源视频结尾。记录失败不影响输出本身。
+    """
+    try:
+        record = {
+            'source': content_fingerprint(source_path),
+            'start': float(start or 0.0),
+            'end': None if end is None else float(end),
+        }
+        _write_record('clip', content_fingerprint(output_path), record)
+    except OSError as e:
+        print(f"记录片段来源失败: {e}")
+
+def clip_ancestors(path: str) -> list:
+    """
+    沿派生关系向上列出祖先视频：[(内容指纹, 在祖先中的起点, 在祖先中的终点或 None), ...]，
+    由近到远排列；没有来源记录时返回空列表。
+    """
+    ancestors = []
+    fingerprint = content_fingerprint(path)
+    offset = 0.0
+    end = None
+    for _ in range(MAX_ANCESTORS):
+        record = _read_record('clip', fingerprint)
+        if record is None:
+            break
+        # 换算到上一级的时间轴：起点累加，终点取更窄的一侧
+        parent_end = record['end']
+        if end is not None:
+            end = end + record['start']
+            if parent_end is not None:
+                end = min(end, parent_end)
+        else:
+            end = parent_end
+        offset += record['start']
+        fingerprint = record['source']
+        ancestors.append((fingerprint, offset, end))
+    return ancestors
+
+def record_audio_fingerprint(path: str, audio_fingerprint: str):
+    """记录视频文件对应的解码音频指纹，供其派生片段查找识别结果缓存"""
+    try:
+        _write_record('audio', content_fingerprint(path), {'audio': audio_fingerprint})
+    except OSError as e:
+        print(f"记录音频指纹失败: {e}")
+
+def lookup_audio_fingerprint(fingerprint: str):
+    """按视频内容指纹查找已记录的音频指纹"""
+    record = _read_record('audio', fingerprint)
+    return record['audio'] if record else None
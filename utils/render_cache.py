@@ -0,0 +1,198 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import threading
+from utils.cache_utils import get_cache_dir, file_identity
+
+# 渲染缓存磁盘预算（MB），可通过环境变量调整
+RENDER_CACHE_BUDGET_ENV = 'VIDEOCUT_RENDER_CACHE_MB'
+DEFAULT_BUDGET_MB = 10 * 1024
+
+# 未完成文件的前缀；超过该时间仍未发布的视为残留，淘汰时清理
+PARTIAL_PREFIX = '.partial-'
+PARTIAL_MAX_AGE = 24 * 3600
+
+def _normalize(value):
+    """规范化操作参数，保证等价参数得到相同的缓存键"""
+    if isinstance(value, float):
+        return round(value, 6)
+    if isinstance(value, dict):
+        return {str(k): _normalize(v) for k, v in sorted(value.items())}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    return value
+
+class RenderCache:
+    """
+    内容寻址的渲染输出缓存：
+    键为输入文件身份 + 操作名 + 规范化参数的哈希；
+    输出先写入未完成文件，成功后原子发布，超出磁盘预算时按最近使用时间淘汰。
+    """
+
+    def __init__(self, cache_dir: str = None, budget_bytes: int = None):
+        self._cache_dir = cache_dir
+        if budget_bytes is None:
+            budget_mb = float(os.environ.get(RENDER_CACHE_BUDGET_ENV, DEFAULT_BUDGET_MB))
+            budget_bytes = int(budget_mb * 1024 * 1024)
+        self.budget_bytes = budget_bytes
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        self._evict_lock = threading.Lock()
+        # 渲染过的输入文件（绝对路径），导出时不允许覆盖
+        self._inputs = set()
+
+    @property
+    def cache_dir(self) -> str:
+        if self._cache_dir is None:
+            self._cache_dir = get_cache_dir('renders')
+        os.makedirs(self._cache_dir, exist_ok=True)
+        return self._cache_dir
+
+    def make_key(self, input_path: str, operation: str, params: dict) -> str:
+        """由输入文件身份和操作参数计算缓存键"""
+        identity = file_identity(input_path)
+        with self._locks_guard:
+            self._inputs.add(identity[0])
+        payload = {
+            'input': list(identity),
+            'operation': operation,
+            'params': _normalize(params or {}),
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+    def entry_path(self, key: str, suffix: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}{suffix}")
+
+    def partial_path(self, key: str, suffix: str) -> str:
+        """未完成输出的临时路径，保留扩展名以便 FFmpeg 推断封装格式"""
+        return os.path.join(self.cache_dir, f"{PARTIAL_PREFIX}{key}-{os.getpid()}-{threading.get_ident()}{suffix}")
+
+    def lookup(self, key: str, suffix: str):
+        """查找已发布的输出，命中时更新最近使用时间"""
+        path = self.entry_path(key, suffix)
+        if os.path.exists(path):
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+            return path
+        return None
+
+    def publish(self, key: str, suffix: str, src_path: str) -> str:
+        """将完整的输出原子地移动到缓存中，返回缓存路径"""
+        final_path = self.entry_path(key, suffix)
+        try:
+            os.replace(src_path, final_path)
+        except OSError:
+            # 跨文件系统时先复制为未完成文件，再原子替换
+            partial = self.partial_path(key, suffix)
+            shutil.copyfile(src_path, partial)
+            os.replace(partial, final_path)
+            os.remove(src_path)
+        self.evict(keep=final_path)
+        return final_path
+
+    def key_lock(self, key: str) -> threading.Lock:
+        """同一个键同时只允许一个渲染任务"""
+        with self._locks_guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def render(self, input_path: str, operation: str, params: dict, suffix: str, render_fn):
+        """
+        获取缓存输出，未命中时调用 render_fn(output_path) -> bool 渲染到未完成文件并发布。
+        渲染失败返回 None。
+        """
+        key = self.make_key(input_path, operation, params)
+        with self.key_lock(key):
+            cached = self.lookup(key, suffix)
+            if cached:
+                print(f"渲染缓存命中: {operation} -> {cached}")
+                return cached
+
+            partial = self.partial_path(key, suffix)
+            try:
+                if render_fn(partial) and os.path.exists(partial):
+                    return self.publish(key, suffix, partial)
+                return None
+            finally:
+                if os.path.exists(partial):
+                    os.remove(partial)
+
+    def adopt(self, input_path: str, operation: str, params: dict, suffix: str, produce_fn):
+        """
+        与 render 相同，但 produce_fn() 自行决定输出位置并返回生成的文件路径，
+        成功后将该文件移动进缓存。
+        """
+        def render_fn(partial):
+            produced = produce_fn()
+            if not produced or not os.path.exists(produced):
+                return False
+            shutil.move(produced, partial)
+            return True
+
+        return self.render(input_path, operation, params, suffix, render_fn)
+
+    def export(self, cached_path: str, dest_path: str) -> str:
+        """
+        以指定文件名导出缓存结果：优先硬链接（瞬时完成），失败时复制。
+        目标是渲染过的输入文件时抛出 ValueError，避免删除用户的源文件。
+        """
+        if os.path.abspath(cached_path) == os.path.abspath(dest_path):
+            return dest_path
+        with self._locks_guard:
+            inputs = set(self._inputs)
+        if os.path.abspath(dest_path) in inputs:
+            raise ValueError(f"导出路径与输入文件相同，拒绝覆盖: {dest_path}")
+        if os.path.exists(dest_path):
+            os.remove(dest_path)
+        try:
+            os.link(cached_path, dest_path)
+        except OSError:
+            shutil.copyfile(cached_path, dest_path)
+        return dest_path
+
+    def evict(self, keep: str = None):
+        """超出磁盘预算时按最近使用时间淘汰旧条目（keep 除外），并清理残留的未完成文件"""
+        with self._evict_lock:
+            now = time.time()
+            entries = []
+            total = 0
+            for name in os.listdir(self.cache_dir):
+                path = os.path.join(self.cache_dir, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                if name.startswith(PARTIAL_PREFIX):
+                    if now - stat.st_mtime > PARTIAL_MAX_AGE:
+                        os.remove(path)
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+
+            entries.sort()
+            for _, size, path in entries:
+                if total <= self.budget_bytes:
+                    break
+                if path == keep:
+                    continue
+                try:
+                    os.remove(path)
+                    total -= size
+                    print(f"渲染缓存淘汰: {os.path.basename(path)}")
+                except OSError:
+                    pass
+
+    def clear(self):
+        """清空渲染缓存"""
+        with self._evict_lock:
+            for name in os.listdir(self.cache_dir):
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                except OSError:
+                    pass
+
+# 全局渲染缓存实例
+render_cache = RenderCache()
@@ -0,0 +1,228 @@
+import os
+import shutil
+import tempfile
+import subprocess
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
+from utils.time_utils import seconds_to_ffmpeg_time
+from utils.ffmpeg_utils import run_ffmpeg_command
+from utils.media_index import count_frames, TIME_EPSILON
+from utils.media_probe import StreamInfo
+
+# 可以直接流复制、并与 libx264 重编码片段无缝拼接的视频编码
+SMART_CUT_CODECS = ('h264',)
+
+# MP4 中可以直接流复制的音频编码
+MP4_AUDIO_CODECS = ('aac', 'mp3', 'ac3', 'eac3', 'alac', 'opus')
+
+# 智能切割输出的版本，编码参数或拼接方式变化时递增，使渲染缓存中的旧结果失效
+SMART_RENDER_VERSION = 2
+
+# ffprobe 报告的 H.264 profile -> libx264 的 -profile:v
+X264_PROFILES = {
+    'constrained baseline': 'baseline',
+    'baseline': 'baseline',
+    'main': 'main',
+    'high': 'high',
+    'high 10': 'high10',
+    'high 4:2:2': 'high422',
+    'high 4:4:4 predictive': 'high444',
+}
+
+def x264_match_args(video: StreamInfo) -> list:
+    """
+    让 libx264 重编码的片段与源视频的 profile、level、像素格式、参考帧数和熵编码一致，
+    拼接后的码流在严格的解码器上也能连续解码。
+    """
+    args = ['-pix_fmt', video.pix_fmt or 'yuv420p']
+    profile = X264_PROFILES.get((video.profile or '').lower())
+    if profile:
+        args += ['-profile:v', profile]
+    if video.level and video.level > 0:
+        # ffprobe 以 10 倍整数报告 level（41 即 4.1），9 表示 1b
+        args += ['-level:v', '1b' if video.level == 9 else f"{video.level / 10:g}"]
+    if video.refs and video.refs > 1:
+        args += ['-refs', str(video.refs)]
+    # ultrafast 默认关闭 CABAC，非 baseline 的源视频使用 CABAC
+    args += ['-coder', 'cavlc' if profile == 'baseline' else 'cabac']
+    return args
+
+def count_packets(path: str) -> int:
+    """用 ffprobe 统计文件中视频流的数据包数（只读取数据包，不解码），失败时返回 -1"""
+    cmd = [
+        'ffprobe', '-v', 'error',
+        '-select_streams', 'v:0',
+        '-count_packets',
+        '-show_entries', 'stream=nb_read_packets',
+        '-of', 'csv=p=0', path
+    ]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        return int(result.stdout.strip().split(',')[0]) if result.returncode == 0 else -1
+    except (OSError, ValueError):
+        return -1
+
+def plan_smart_cut(frame_times: list, keyframe_times: list, start: float, end: float) -> list:
+    """
+    规划智能切割：
+    - 开头到第一个关键帧之间的不完整 GOP 重编码
+    - 中间完整的 GOP 直接流复制
+    - 最后一个关键帧到结尾之间的不完整 GOP 重编码
+    返回片段列表，每项包含 mode ('encode'/'copy')、start 和 frames。
+    """
+    first = bisect_left(keyframe_times, start - TIME_EPSILON)
+    last = bisect_right(keyframe_times, end + TIME_EPSILON)
+    inner_keyframes = keyframe_times[first:last]
+
+    # 区间内不足两个关键帧，没有完整的 GOP 可以复制
+    if len(inner_keyframes) < 2:
+        frames = count_frames(frame_times, start, end)
+        return [{'mode': 'encode', 'start': start, 'frames': frames}] if frames > 0 else []
+
+    copy_start = inner_keyframes[0]
+    copy_end = inner_keyframes[-1]
+    pieces = [
+        {'mode': 'encode', 'start': start, 'frames': count_frames(frame_times, start, copy_start)},
+        {'mode': 'copy', 'start': copy_start, 'frames': count_frames(frame_times, copy_start, copy_end)},
+        {'mode': 'encode', 'start': copy_end, 'frames': count_frames(frame_times, copy_end, end)},
+    ]
+    return [piece for piece in pieces if piece['frames'] > 0]
+
+def plan_partial_render(frame_times: list, keyframe_times: list, intervals: list, duration: float) -> list:
+    """
+    规划局部重编码：只有与 intervals（[(开始, 结束), ...]，如字幕显示区间）重叠的 GOP 需要重编码，
+    其余 GOP 直接流复制；相邻的同类 GOP 合并为一个片段。
+    返回与 plan_smart_cut 相同结构的片段列表。
+    """
+    intervals = sorted((s, e) for s, e in intervals if e > s)
+    interval_starts = [s for s, _ in intervals]
+    # 前 i 个区间中最晚的结束时间，用于 O(log n) 判断 GOP 是否与任一区间重叠
+    max_ends = list(accumulate((e for _, e in intervals), max))
+
+    boundaries = list(keyframe_times)
+    # 第一个关键帧之前的帧无法单独复制，并入重编码
+    if not boundaries or boundaries[0] > TIME_EPSILON:
+        boundaries.insert(0, 0.0)
+    boundaries.append(duration)
+
+    pieces = []
+    for gop_start, gop_end in zip(boundaries, boundaries[1:]):
+        frames = count_frames(frame_times, gop_start, gop_end)
+        if frames <= 0:
+            continue
+        i = bisect_left(interval_starts, gop_end)
+        overlaps = i > 0 and max_ends[i - 1] > gop_start
+        leading = not keyframe_times or gop_start < keyframe_times[0] - TIME_EPSILON
+        mode = 'encode' if overlaps or leading else 'copy'
+        if pieces and pieces[-1]['mode'] == mode:
+            pieces[-1]['frames'] += frames
+        else:
+            pieces.append({'mode': mode, 'start': gop_start, 'frames': frames})
+    return pieces
+
+def render_smart_cut(input_path: str, pieces: list, output_path: str, start: float, end: float,
+                     video: StreamInfo, copy_audio: bool = False) -> bool:
+    """
+    按规划结果渲染智能切割：各片段先输出为 MPEG-TS（每个关键帧前都带 SPS/PPS），
+    再用 concat 分离器无损拼接，音频整段单独编码后一起封装；
+    copy_audio 时音频直接流复制（用于整段输出、只局部重编码画面的场景，如局部烧录字幕）。
+    重编码片段按源视频的编码参数编码（见 x264_match_args），MP4 以 avc3 封装，
+    参数集保留在码流中，拼接处参数集变化时解码器能随之切换；拼接后用 ffprobe 核对帧数。
+    重编码片段可带 filter（视频滤镜），滤镜看到的时间戳从片段起点的源视频时间开始。
+    """
+    fps = video.fps
+    work_dir = tempfile.mkdtemp(prefix='smartcut_')
+    try:
+        # 用半帧的偏移避免浮点误差导致多取或少取一帧
+        half_frame = 0.5 / fps if fps else TIME_EPSILON
+        part_paths = []
+
+        for i, piece in enumerate(pieces):
+            part_path = os.path.join(work_dir, f"part_{i:03d}.ts")
+            if piece['mode'] == 'copy':
+                # 输入端 seek 会落在 start 之前最近的关键帧，也就是 start 本身
+                cmd = [
+                    'ffmpeg', '-ss', seconds_to_ffmpeg_time(piece['start'] + half_frame),
+                    '-i', input_path,
+                    '-map', '0:v:0',
+                    '-c:v', 'copy',
+                    '-bsf:v', 'h264_mp4toannexb',
+                    '-frames:v', str(piece['frames']),
+                    '-an',
+                    '-avoid_negative_ts', 'make_zero',
+                    '-f', 'mpegts',
+                    '-y', part_path
+                ]
+                description = "智能切割流复制"
+            else:
+                # 解码端会丢弃早于 seek 点的帧，从而精确到帧
+                cmd = [
+                    'ffmpeg', '-ss', seconds_to_ffmpeg_time(max(0, piece['start'] - half_frame)),
+                    '-i', input_path,
+                    '-map', '0:v:0',
+                ]
+                if piece.get('filter'):
+                    # 把时间戳平移到源视频时间轴上再应用滤镜（如字幕），之后归零
+                    cmd += ['-vf', f"setpts=PTS-STARTPTS+{piece['start']:.6f}/TB,{piece['filter']},setpts=PTS-STARTPTS"]
+                cmd += [
+                    '-c:v', 'libx264',
+                    '-preset', 'ultrafast',
+                    '-crf', '18',       # 首尾片段与原片相邻，使用较高质量
+                    *x264_match_args(video),
+                    '-frames:v', str(piece['frames']),
+                    '-an',
+                    '-f', 'mpegts',
+                    '-y', part_path
+                ]
+                description = "智能切割首尾重编码"
+
+            if not run_ffmpeg_command(cmd, description):
+                return False
+            part_paths.append(part_path)
+
+        if copy_audio:
+            # 整段输出时音频不需要切割，直接从源文件流复制
+            has_audio = True
+            audio_path = input_path
+            audio_map = '1:a:0?'
+        else:
+            # 音频整段重新编码，体积小、速度快，并保证音画同步
+            audio_path = os.path.join(work_dir, "audio.m4a")
+            audio_cmd = [
+                'ffmpeg', '-ss', seconds_to_ffmpeg_time(start),
+                '-i', input_path,
+                '-t', str(end - start),
+                '-map', '0:a:0',
+                '-vn',
+                '-c:a', 'aac',
+                '-y', audio_path
+            ]
+            has_audio = run_ffmpeg_command(audio_cmd, "智能切割音频编码")
+            audio_map = '1:a:0'
+
+        list_path = os.path.join(work_dir, "concat.txt")
+        with open(list_path, 'w', encoding='utf-8') as f:
+            for part_path in part_paths:
+                f.write(f"file '{part_path}'\n")
+
+        concat_cmd = ['ffmpeg', '-f', 'concat', '-safe', '0', '-i', list_path]
+        if has_audio:
+            concat_cmd += ['-i', audio_path, '-map', '0:v:0', '-map', audio_map]
+        concat_cmd += ['-c', 'copy']
+        if os.path.splitext(output_path)[1].lower() in ('.mp4', '.m4v', '.mov'):
+            # avc3：SPS/PPS 随码流传输，不只使用第一个片段的 avcC
+            concat_cmd += ['-tag:v', 'avc3']
+        concat_cmd += ['-movflags', '+faststart', '-y', output_path]
+
+        if not run_ffmpeg_command(concat_cmd, "智能切割拼接") or not os.path.exists(output_path):
+            return False
+        expected = sum(piece['frames'] for piece in pieces)
+        packets = count_packets(output_path)
+        if packets != expected:
+            print(f"智能切割结果校验失败: {packets}/{expected} 帧")
+            os.remove(output_path)
+            return False
+        return True
+
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
@@ -0,0 +1,171 @@
+import io
+import os
+import re
+from dataclasses import dataclass
+from typing import Iterable, Iterator, List, TextIO
+from utils.time_utils import (
+    seconds_to_ass_time, seconds_to_srt_time, seconds_to_vtt_time, timecode_to_seconds
+)
+
+# 支持的字幕格式（按扩展名）
+SUBTITLE_FORMATS = ('srt', 'vtt', 'ass')
+
+ASS_HEADER = """[Script Info]
+Title: Generated Subtitles
+ScriptType: v4.00+
+WrapStyle: 1
+ScaledBorderAndShadow: yes
+YCbCr Matrix: TV.601
+
+[V4+ Styles]
+Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, Alignment, MarginL, MarginR, MarginV, Encoding
+Style: Default,Arial,24,&H00FFFFFF,&H000000FF,&H00000000,&H00000000,0,0,0,0,100,100,0,0,1,2,2,2,10,10,10,1
+
+[Events]
+Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
+"""
+
+# SRT / WebVTT 的时间行，WebVTT 的结束时间后可以跟显示设置
+TIMING_PATTERN = re.compile(r'^\s*(\S+)\s+-->\s+(\S+)')
+# ASS 文本中的样式覆盖标签，如 {\an8}；\{ 和 \} 是转义的花括号，不属于标签
+ASS_OVERRIDE_PATTERN = re.compile(r'(?<!\\)\{[^}]*\}')
+
+@dataclass
+class Cue:
+    """一条字幕：起止时间（秒）和文本，多行文本用换行分隔"""
+    start: float
+    end: float
+    text: str
+
+def subtitle_format(path: str) -> str:
+    """按扩展名判断字幕格式"""
+    fmt = os.path.splitext(path)[1].lower().lstrip('.')
+    if fmt not in SUBTITLE_FORMATS:
+        raise ValueError(f"不支持的字幕格式: {path}（可选: {', '.join(SUBTITLE_FORMATS)}）")
+    return fmt
+
+# --- 写入：逐条写到文件句柄，内存占用与字幕条数无关 ---
+
+def write_srt(cues: Iterable[Cue], f: TextIO) -> int:
+    """写入 SRT 字幕，返回写入的条数"""
+    count = 0
+    for count, cue in enumerate(cues, 1):
+        f.write(f"{count}\n{seconds_to_srt_time(cue.start)} --> {seconds_to_srt_time(cue.end)}\n{cue.text}\n\n")
+    return count
+
+def write_vtt(cues: Iterable[Cue], f: TextIO) -> int:
+    """写入 WebVTT 字幕，返回写入的条数"""
+    f.write("WEBVTT\n\n")
+    count = 0
+    for count, cue in enumerate(cues, 1):
+        # 空行会提前结束一条字幕，文本中的 --> 会被当作时间行
+        text = '\n'.join(line for line in cue.text.split('\n') if line.strip()).replace('-->', '->')
+        f.write(f"{seconds_to_vtt_time(cue.start)} --> {seconds_to_vtt_time(cue.end)}\n{text}\n\n")
+    return count
+
+def write_ass(cues: Iterable[Cue], f: TextIO) -> int:
+    """写入 ASS 字幕（默认样式），返回写入的条数"""
+    f.write(ASS_HEADER)
+    count = 0
+    for count, cue in enumerate(cues, 1):
+        # 花括号会被当作样式覆盖标签，写为转义形式
+        text = cue.text.replace('{', '\\{').replace('}', '\\}').replace('\n', '\\N')
+        f.write(f"Dialogue: 0,{seconds_to_ass_time(cue.start)},{seconds_to_ass_time(cue.end)},Default,,0,0,0,,{text}\n")
+    return count
+
+WRITERS = {
+    'srt': write_srt,
+    'vtt': write_vtt,
+    'ass': write_ass,
+}
+
+def write_subtitles(cues: Iterable[Cue], path: str, fmt: str = None) -> int:
+    """按扩展名（或指定的格式）把字幕写入文件，返回写入的条数"""
+    with open(path, 'w', encoding='utf-8') as f:
+        return WRITERS[fmt or subtitle_format(path)](cues, f)
+
+def subtitles_to_string(cues: Iterable[Cue], fmt: str = 'srt') -> str:
+    """把字幕格式化为字符串，用于界面预览"""
+    buffer = io.StringIO()
+    WRITERS[fmt](cues, buffer)
+    return buffer.getvalue()
+
+# --- 解析：逐行读取，逐条产出 ---
+
+def _iter_blocks(lines: Iterable[str]) -> Iterator[list]:
+    """按空行切分为字幕块"""
+    block = []
+    for line in lines:
+        line = line.rstrip('\r\n')
+        if line.strip():
+            block.append(line)
+        elif block:
+            yield block
+            block = []
+    if block:
+        yield block
+
+def iter_srt(lines: Iterable[str]) -> Iterator[Cue]:
+    """解析 SRT / WebVTT 字幕：序号或标识行可有可无，时间行之后到空行为止是文本"""
+    for block in _iter_blocks(lines):
+        for i, line in enumerate(block[:2]):
+            match = TIMING_PATTERN.match(line)
+            if match:
+                break
+        else:
+            # WEBVTT 文件头、NOTE / STYLE 块等
+            continue
+        try:
+            start = timecode_to_seconds(match.group(1))
+            end = timecode_to_seconds(match.group(2))
+        except ValueError:
+            continue
+        yield Cue(start, end, '\n'.join(block[i + 1:]))
+
+def iter_ass(lines: Iterable[str]) -> Iterator[Cue]:
+    """解析 ASS / SSA 字幕的 [Events] 段，去掉样式覆盖标签"""
+    fields = None
+    in_events = False
+    for line in lines:
+        line = line.strip()
+        if line.startswith('['):
+            in_events = line.lower() == '[events]'
+            continue
+        if not in_events or ':' not in line:
+            continue
+        kind, value = line.split(':', 1)
+        if kind == 'Format':
+            fields = [field.strip().lower() for field in value.split(',')]
+        elif kind == 'Dialogue' and fields:
+            # Text 是最后一个字段，其中可以包含逗号
+            values = [v.strip() for v in value.split(',', len(fields) - 1)]
+            if len(values) != len(fields):
+                continue
+            event = dict(zip(fields, values))
+            try:
+                start = timecode_to_seconds(event['start'])
+                end = timecode_to_seconds(event['end'])
+            except (KeyError, ValueError):
+                continue
+            text = ASS_OVERRIDE_PATTERN.sub('', event.get('text', ''))
+            text = text.replace('\\N', '\n').replace('\\n', '\n').replace('\\h', ' ')
+            text = text.replace('\\{', '{').replace('\\}', '}')
+            yield Cue(start, end, text)
+
+def iter_cues(lines: Iterable[str], fmt: str) -> Iterator[Cue]:
+    """按格式逐条解析字幕"""
+    if fmt == 'ass':
+        return iter_ass(lines)
+    return iter_srt(lines)
+
+def parse_subtitles(text: str, fmt: str = None) -> List[Cue]:
+    """解析字幕文本，未指定格式时根据内容判断"""
+    if fmt is None:
+        fmt = 'ass' if '[Events]' in text else 'srt'
+    return list(iter_cues(text.splitlines(), fmt))
+
+def load_subtitles(path: str) -> List[Cue]:
+    """读取外部字幕文件（SRT、WebVTT 或 ASS），兼容带 BOM 的 UTF-8"""
+    fmt = subtitle_format(path)
+    with open(path, 'r', encoding='utf-8-sig', errors='replace') as f:
+        return list(iter_cues(f, fmt))
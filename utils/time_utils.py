@@ -37,11 +37,33 @@ def seconds_to_ffmpeg_time(seconds: float) -> str:
     secs = seconds % 60
     return f"{hours:02d}:{minutes:02d}:{secs:06.3f}"
 
+def _split_time(seconds: float, units_per_second: int):
+    """按给定精度四舍五入后拆分为 (时, 分, 秒, 小数部分)，避免浮点误差导致 0.57 秒变成 0.56 秒"""
+    units = max(0, int(round(seconds * units_per_second)))
+    whole, fraction = divmod(units, units_per_second)
+    return whole // 3600, whole % 3600 // 60, whole % 60, fraction
+
 def seconds_to_ass_time(seconds: float) -> str:
     """将秒数转换为ASS时间格式 (H:MM:SS.cc)"""
-    hours = int(seconds // 3600)
-    minutes = int((seconds % 3600) // 60)
-    secs = seconds % 60
-    centiseconds = int((secs % 1) * 100)
-    secs = int(secs)
-    return f"{hours}:{minutes:02d}:{secs:02d}.{centiseconds:02d}" 
\ No newline at end of file
+    hours, minutes, secs, centiseconds = _split_time(seconds, 100)
+    return f"{hours}:{minutes:02d}:{secs:02d}.{centiseconds:02d}"
+
+def seconds_to_srt_time(seconds: float) -> str:
+    """将秒数转换为SRT时间格式 (HH:MM:SS,mmm)"""
+    hours, minutes, secs, milliseconds = _split_time(seconds, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d},{milliseconds:03d}"
+
+def seconds_to_vtt_time(seconds: float) -> str:
+    """将秒数转换为WebVTT时间格式 (HH:MM:SS.mmm)"""
+    hours, minutes, secs, milliseconds = _split_time(seconds, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d}.{milliseconds:03d}"
+
+def timecode_to_seconds(value: str) -> float:
+    """
+    将时间码转换为秒，支持秒数、FFmpeg 时间参数 (HH:MM:SS.mmm)、SRT (HH:MM:SS,mmm)、
+    WebVTT (HH:MM:SS.mmm 或 MM:SS.mmm) 和 ASS (H:MM:SS.cc) 格式；格式无效时抛出 ValueError
+    """
+    seconds = 0.0
+    for part in str(value).strip().replace(',', '.').split(':'):
+        seconds = seconds * 60 + float(part)
+    return seconds
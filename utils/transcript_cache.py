@@ -0,0 +1,133 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from utils.cache_utils import get_cache_dir
+from utils.render_cache import _normalize, PARTIAL_PREFIX, PARTIAL_MAX_AGE
+
+# 识别结果缓存磁盘预算（MB），可通过环境变量调整
+TRANSCRIPT_CACHE_BUDGET_ENV = 'VIDEOCUT_TRANSCRIPT_CACHE_MB'
+DEFAULT_BUDGET_MB = 256
+
+# 缓存只保存生成字幕需要的字段
+RESULT_FIELDS = ('text', 'language', 'vad_skip_ratio')
+SEGMENT_FIELDS = ('start', 'end', 'text')
+
+def audio_fingerprint(audio) -> str:
+    """解码后音频数据的哈希（与容器、文件名、修改时间无关）"""
+    digest = hashlib.sha256()
+    digest.update(str(getattr(audio, 'dtype', '')).encode('ascii'))
+    digest.update(memoryview(audio).cast('B'))
+    return digest.hexdigest()
+
+class TranscriptCache:
+    """
+    语音识别结果的磁盘缓存：
+    文件名为 "音频指纹-参数哈希.json"，参数包括模型大小和识别选项；
+    同一段音频的所有结果可按指纹一起失效，超出磁盘预算时按最近使用时间淘汰。
+    """
+
+    def __init__(self, cache_dir: str = None, budget_bytes: int = None):
+        self._cache_dir = cache_dir
+        if budget_bytes is None:
+            budget_mb = float(os.environ.get(TRANSCRIPT_CACHE_BUDGET_ENV, DEFAULT_BUDGET_MB))
+            budget_bytes = int(budget_mb * 1024 * 1024)
+        self.budget_bytes = budget_bytes
+        self._lock = threading.Lock()
+
+    @property
+    def cache_dir(self) -> str:
+        if self._cache_dir is None:
+            self._cache_dir = get_cache_dir('transcripts')
+        os.makedirs(self._cache_dir, exist_ok=True)
+        return self._cache_dir
+
+    def make_key(self, fingerprint: str, model_size: str, options: dict) -> str:
+        """由音频指纹、模型大小和识别选项计算缓存键"""
+        payload = {'model_size': model_size, 'options': _normalize(options or {})}
+        params_hash = hashlib.sha256(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+        return f"{fingerprint}-{params_hash}"
+
+    def entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key: str):
+        """读取缓存的识别结果，未命中或文件损坏时返回 None"""
+        path = self.entry_path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                result = json.load(f)
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        print(f"识别结果缓存命中: {key[:12]}")
+        return result
+
+    def put(self, key: str, result: dict):
+        """保存识别结果（先写未完成文件再原子替换）"""
+        entry = {field: result[field] for field in RESULT_FIELDS if field in result}
+        entry['segments'] = [
+            {field: segment[field] for field in SEGMENT_FIELDS}
+            for segment in result.get('segments', [])
+        ]
+        partial = os.path.join(self.cache_dir, f"{PARTIAL_PREFIX}{key}-{os.getpid()}-{threading.get_ident()}.json")
+        try:
+            with open(partial, 'w', encoding='utf-8') as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(partial, self.entry_path(key))
+        except OSError as e:
+            print(f"保存识别结果缓存失败: {e}")
+            if os.path.exists(partial):
+                os.remove(partial)
+            return
+        self.evict(keep=self.entry_path(key))
+
+    def evict(self, keep: str = None):
+        """超出磁盘预算时按最近使用时间淘汰旧条目（keep 除外），并清理残留的未完成文件"""
+        with self._lock:
+            now = time.time()
+            entries = []
+            total = 0
+            for name in os.listdir(self.cache_dir):
+                path = os.path.join(self.cache_dir, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                if name.startswith(PARTIAL_PREFIX):
+                    if now - stat.st_mtime > PARTIAL_MAX_AGE:
+                        os.remove(path)
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+
+            entries.sort()
+            for _, size, path in entries:
+                if total <= self.budget_bytes:
+                    break
+                if path == keep:
+                    continue
+                try:
+                    os.remove(path)
+                    total -= size
+                    print(f"识别结果缓存淘汰: {os.path.basename(path)}")
+                except OSError:
+                    pass
+
+    def invalidate(self, fingerprint: str = None) -> int:
+        """删除指定音频指纹的所有缓存结果，fingerprint 为 None 时清空缓存；返回删除的条目数"""
+        removed = 0
+        with self._lock:
+            for name in os.listdir(self.cache_dir):
+                if fingerprint is not None and not name.startswith(f"{fingerprint}-"):
+                    continue
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                    removed += 1
+                except OSError:
+                    pass
+        return removed
+
+# 全局识别结果缓存实例
+transcript_cache = TranscriptCache()
@@ -0,0 +1,69 @@
+import os
+import subprocess
+
+# 画面分析（人物跟踪）使用的最长边像素和帧率，可通过环境变量调整
+ANALYSIS_SIZE_ENV = 'VIDEOCUT_TRACK_ANALYSIS_SIZE'
+ANALYSIS_FPS_ENV = 'VIDEOCUT_TRACK_ANALYSIS_FPS'
+DEFAULT_ANALYSIS_SIZE = 480
+DEFAULT_ANALYSIS_FPS = 8.0
+
+def analysis_settings() -> tuple:
+    """分析画面的 (最长边像素, 帧率)"""
+    max_size = int(os.environ.get(ANALYSIS_SIZE_ENV, DEFAULT_ANALYSIS_SIZE))
+    fps = float(os.environ.get(ANALYSIS_FPS_ENV, DEFAULT_ANALYSIS_FPS))
+    return max(64, max_size), max(0.1, fps)
+
+def analysis_frame_size(width: int, height: int, max_size: int) -> tuple:
+    """按最长边缩小后的画面尺寸 (宽, 高)，不放大，宽高取偶数"""
+    scale = min(1.0, max_size / max(width, height))
+    return max(2, int(round(width * scale / 2)) * 2), max(2, int(round(height * scale / 2)) * 2)
+
+def _read_frame(stream, view: memoryview) -> bool:
+    """从管道读满一帧，管道结束时返回 False"""
+    filled = 0
+    while filled < len(view):
+        count = stream.readinto(view[filled:])
+        if not count:
+            return False
+        filled += count
+    return True
+
+def iter_video_frames(input_path: str, width: int, height: int, fps: float):
+    """
+    通过 FFmpeg 标准输出管道读取缩放到 width×height、抽帧到 fps 的 BGR 画面（rawvideo），
+    逐帧产出 (时间秒, 形状为 (高, 宽, 3) 的 uint8 数组)，时间以视频起点为 0。
+    缩放、抽帧和色彩转换都在 FFmpeg 中完成，4K 视频也只有小画面经过管道。
+    各帧复用同一块缓冲区，需要保留画面时请自行 copy。解码失败时抛出 ValueError。
+    """
+    import numpy as np
+
+    cmd = [
+        'ffmpeg', '-nostdin', '-v', 'error',
+        '-i', input_path,
+        '-map', '0:v:0',
+        '-an', '-sn',
+        '-vf', f'fps={fps:g},scale={width}:{height}:flags=area',
+        '-pix_fmt', 'bgr24',
+        '-f', 'rawvideo',
+        'pipe:1'
+    ]
+    process = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    buffer = bytearray(width * height * 3)
+    view = memoryview(buffer)
+    frame = np.frombuffer(buffer, dtype=np.uint8).reshape(height, width, 3)
+    frame_index = 0
+    try:
+        while _read_frame(process.stdout, view):
+            yield frame_index / fps, frame
+            frame_index += 1
+        stderr = process.stderr.read().decode('utf-8', errors='replace')
+        if process.wait() != 0 and frame_index == 0:
+            raise ValueError(f"视频解码失败: {stderr.strip() or input_path}")
+    finally:
+        # 提前结束（取消、出错）时停止 FFmpeg
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        process.stdout.close()
+        process.stderr.close()